@@ -1,64 +1,169 @@
-import base64
+import functools
 import json
-from urllib.request import Request, urlopen
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
 
-from logger import logger
+from slackbot import coalesce
+from slackbot.blocks import Slot, Template
+from slackbot.claimcheck import ClaimCheck, get_store
+from slackbot.client import deadline
+from slackbot.installations import get_store as get_installations
+from slackbot.lazy import Lazy, get_queue
+from slackbot.logger import ContextThreadPoolExecutor, logger
+from slackbot.router import Router
+from slackbot.slack import Slack
+
+MAX_WORKERS = int(os.getenv("MAX_WORKERS") or 4)
+COALESCE_WINDOW_MS = os.getenv("COALESCE_WINDOW_MS")
+COALESCE_WINDOW = float(COALESCE_WINDOW_MS) / 1000 if COALESCE_WINDOW_MS else None
+
+claims = ClaimCheck(get_store())
+coalescer = coalesce.Coalescer(coalesce.get_store(), COALESCE_WINDOW)
+executor = ContextThreadPoolExecutor(max_workers=MAX_WORKERS)
+installations = get_installations()
+lazy = Lazy(get_queue())
+router = Router()
+slack = Slack()
+
+TEXT = "Choose a Slack OAuth scope to learn more"
+SCOPE = Template.message(
+    {
+        "replace_original": True,
+        "text": TEXT,
+        "blocks": [
+            {
+                "type": "section",
+                "text": {"type": "plain_text", "text": TEXT},
+            },
+            {
+                "block_id": "slack_oauth_scopes",
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "external_select",
+                        "action_id": "slack_oauth_scopes",
+                        "placeholder": {"type": "plain_text", "text": "Select scope"},
+                        "initial_option": Slot("scope", dict),
+                    },
+                    {
+                        "type": "button",
+                        "action_id": "open_slack_oauth_scope",
+                        "text": {"type": "plain_text", "text": "Open"},
+                        "url": f"https://api.slack.com/scopes/{Slot('value')}",
+                    },
+                ],
+            },
+        ],
+    }
+)
 
 
 @logger.bind
-def handler(event, _):
-    # Handle interaction
-    for action in iter_actions(event):
+@lazy.handler
+def handler(event, context=None):
+    # Acknowledge now and handle matched actions in a deferred invocation,
+    # passing on the claim-check pointer rather than the resolved event
+    response = {"statusCode": 200}
+    if not router.actions(claims.resolve(event)):
+        return response
+    with logger.timer("defer"):
+        return lazy.ack(response, "respond", event)
+
+
+@lazy("respond")
+def respond(event, context=None):
+    return dispatch(claims.resolve(event), deadline(context))
+
+
+def dispatch(event, until):
+    """
+    Run matched actions concurrently, each bounded by the ``until`` deadline.
+
+    Failures are collected rather than raised so one bad action doesn't cost
+    the others their response.
+    """
+    futures = [
+        (action.get("action_id"), executor.submit(handler, event, until))
+        for action, handler in router.actions(event)
+    ]
+    results = []
+    for action_id, future in futures:
+        result = {"action_id": action_id, "ok": True}
         try:
-            action(event)
-        except Exception as err:
-            print(err)
+            future.result(timeout=max(0, until - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            logger.error("ACTION %s TIMED OUT", action_id)
+            result.update(ok=False, error="Timeout: deadline exceeded")
+        except Exception as err:  # noqa: BLE001
+            logger.exception("ACTION %s FAILED", action_id)
+            result.update(ok=False, error=f"{type(err).__name__}: {err}")
+        results.append(result)
+    errors = [x for x in results if not x["ok"]]
+    if errors:
+        logger.error("ACTIONS %s", json.dumps(results))
+        logger.putMetric("action_errors", len(errors), "Count")
+    return results
 
-    # Respond
-    response = {"statusCode": 200}
-    return response
 
+def token(event):
+    """
+    Get bot token of the workspace (or organization) ``event`` came from.
+
+    Lookups are served from the installation store's in-process cache on
+    warm invocations.
+    """
+    team = event.get("team") or {}
+    enterprise = event.get("enterprise") or {}
+    with logger.timer("installation"):
+        return installations.token(team.get("id"), enterprise.get("id"))
 
-def iter_actions(event):
-    actions = event.get("actions") or []
-    for action in actions:
-        action_id = action.get("action_id")
-        if action_id == "slack_oauth_scopes":
-            yield slack_oauth_scopes_action
 
+def update(event, data, until):
+    """
+    Replace the message an action came from with ``data``.
+
+    Messages in a channel are updated with ``chat.update`` as the app, paced
+    per workspace; ephemeral messages (or workspaces without an
+    installation) are replaced via the ``response_url``.
+    """
+    container = event.get("container") or {}
+    bot_token = None if container.get("is_ephemeral") else token(event)
+    if bot_token and container.get("message_ts"):
+        message = json.loads(data)
+        message.pop("replace_original", None)
+        logger.info("POST /api/chat.update")
+        with logger.timer("chat_update"):
+            result = slack.api(
+                "chat.update",
+                team_id=(event.get("team") or {}).get("id"),
+                token=bot_token,
+                deadline=until,
+                json_body=True,
+                channel=container["channel_id"],
+                ts=container["message_ts"],
+                **message,
+            )
+        if result.get("ok"):
+            return
+        logger.warning("chat.update failed: %s", result.get("error"))
+    url = event["response_url"]
+    logger.info("POST %s", urlsplit(url).path)
+    with logger.timer("response_url"):
+        slack.respond(url, data, deadline=until)
 
-def slack_oauth_scopes_action(event):
+
+@router.action("slack_oauth_scopes")
+def slack_oauth_scopes_action(event, until):
     state = event["state"]["values"]
     block = state["slack_oauth_scopes"]["slack_oauth_scopes"]
     scope = block["selected_option"]
-    url = event["response_url"]
-    headers = {"content-type": "application/json; charset=utf-8"}
-    text = "Choose a Slack OAuth scope to learn more"
-    blocks = [
-        {
-            "type": "section",
-            "text": {"type": "plain_text", "text": text},
-        },
-        {
-            "block_id": "slack_oauth_scopes",
-            "type": "actions",
-            "elements": [
-                {
-                    "type": "external_select",
-                    "action_id": "slack_oauth_scopes",
-                    "placeholder": {"type": "plain_text", "text": "Select scope"},
-                    "initial_option": scope,
-                },
-                {
-                    "type": "button",
-                    "action_id": "open_slack_oauth_scope",
-                    "text": {"type": "plain_text", "text": "Open"},
-                    "url": f"https://api.slack.com/scopes/{scope['value']}",
-                },
-            ],
-        },
-    ]
-    message = {"replace_original": True, "text": text, "blocks": blocks}
-    data = json.dumps(message).encode()
-    req = Request(url, data, headers, method="POST")
-    urlopen(req)
+    data = SCOPE.render(scope=scope, value=scope["value"]).encode()
+
+    # Send only the latest of rapid updates to the same message
+    key = coalesce.update_key(event)
+    post = functools.partial(update, event, data, until)
+    if not coalescer.send(key, coalesce.version_of(event), post, until):
+        logger.info("COALESCED %s", key)
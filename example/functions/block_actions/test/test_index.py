@@ -0,0 +1,131 @@
+import json
+import time
+from unittest import mock
+
+import pytest
+
+import index
+
+URL = "https://hooks.slack.com/actions/T1/1/fizz"
+DATA = b'{"replace_original": true, "text": "fizz"}'
+
+
+def event(**container):
+    return {
+        "container": {"channel_id": "C1", "message_ts": "1.2", **container},
+        "response_url": URL,
+        "team": {"id": "T1"},
+    }
+
+
+@mock.patch("index.slack")
+@mock.patch("index.installations")
+class TestUpdate:
+    def test_chat_update(self, mock_installations, mock_slack):
+        mock_installations.token.return_value = "xoxb-fizz"
+        mock_slack.api.return_value = {"ok": True}
+        index.update(event(), DATA, 102.75)
+        mock_installations.token.assert_called_once_with("T1", None)
+        mock_slack.api.assert_called_once_with(
+            "chat.update",
+            team_id="T1",
+            token="xoxb-fizz",
+            deadline=102.75,
+            json_body=True,
+            channel="C1",
+            ts="1.2",
+            text="fizz",
+        )
+        mock_slack.respond.assert_not_called()
+
+    def test_chat_update_error(self, mock_installations, mock_slack):
+        mock_installations.token.return_value = "xoxb-fizz"
+        mock_slack.api.return_value = {"ok": False, "error": "message_not_found"}
+        index.update(event(), DATA, 102.75)
+        mock_slack.respond.assert_called_once_with(URL, DATA, deadline=102.75)
+
+    def test_not_installed(self, mock_installations, mock_slack):
+        mock_installations.token.return_value = None
+        index.update(event(), DATA, 102.75)
+        mock_slack.api.assert_not_called()
+        mock_slack.respond.assert_called_once_with(URL, DATA, deadline=102.75)
+
+    def test_ephemeral(self, mock_installations, mock_slack):
+        index.update(event(is_ephemeral=True), DATA, 102.75)
+        mock_installations.token.assert_not_called()
+        mock_slack.api.assert_not_called()
+        mock_slack.respond.assert_called_once_with(URL, DATA, deadline=102.75)
+
+
+class TestDispatch:
+    def setup_method(self):
+        self.router = mock.patch.object(index, "router", index.Router())
+        self.router.start()
+
+    def teardown_method(self):
+        self.router.stop()
+
+    def test_deadline(self):
+        @index.router.action("slow")
+        def slow(event, until):
+            time.sleep(until - time.monotonic() + 0.1)
+
+        @index.router.action("fast")
+        def fast(event, until):
+            pass
+
+        event = {"actions": [{"action_id": "slow"}, {"action_id": "fast"}]}
+        results = index.dispatch(event, time.monotonic() + 0.05)
+        assert results == [
+            {"action_id": "slow", "ok": False, "error": "Timeout: deadline exceeded"},
+            {"action_id": "fast", "ok": True},
+        ]
+
+    def test_error(self):
+        @index.router.action("fizz")
+        def fizz(event, until):
+            raise ValueError("buzz")
+
+        event = {"actions": [{"action_id": "fizz"}]}
+        results = index.dispatch(event, time.monotonic() + 1)
+        assert results == [
+            {"action_id": "fizz", "ok": False, "error": "ValueError: buzz"}
+        ]
+
+
+class TestHandler:
+    @pytest.fixture
+    def context(self):
+        context = mock.MagicMock()
+        context.get_remaining_time_in_millis.return_value = 3000
+        return context
+
+    @mock.patch("index.update")
+    def test_handler(self, mock_update, context):
+        option = {"value": "chat:write", "text": {"type": "plain_text", "text": "x"}}
+        select = {"slack_oauth_scopes": {"selected_option": option}}
+        body = {
+            **event(),
+            "actions": [{"action_id": "slack_oauth_scopes", "action_ts": "1.3"}],
+            "state": {"values": {"slack_oauth_scopes": select}},
+        }
+        assert index.handler(body, context) == {"statusCode": 200}
+        mock_update.assert_not_called()
+        with mock.patch("slackbot.client.time.monotonic", return_value=100):
+            (message,) = index.lazy.queue.messages
+            index.lazy.queue.messages.clear()
+            assert index.handler(message, context) == [
+                {"action_id": "slack_oauth_scopes", "ok": True}
+            ]
+        (call,) = mock_update.call_args_list
+        evt, data, until = call.args
+        assert evt == body
+        assert until == 102.75
+        message = json.loads(data)
+        assert message["replace_original"] is True
+        assert message["blocks"][1]["elements"][0]["initial_option"] == option
+
+    def test_handler_no_match(self, context):
+        event = {"actions": [{"action_id": "fizz"}]}
+        assert index.handler(event, context) == {"statusCode": 200}
+        assert index.lazy.queue.messages == []
@@ -1,38 +1,32 @@
-import base64
 import json
-import re
-from urllib.request import urlopen
 
-from logger import logger
+from slackbot.logger import logger
+from slackbot.router import Router
+
+from scopes import Catalog
+
+catalog = Catalog()
+router = Router()
 
 
 @logger.bind
 def handler(event, _):
-    action_id = event.get("action_id")
-    seachterm = event.get("value")
-
     # Get menu options
-    if action_id == "slack_oauth_scopes":
-        options = slack_oauth_scopes(seachterm)
-    else:
-        options = []
+    body = router.dispatch(event, default={"options": []})
 
     # Send response
     response = {
         "statusCode": 200,
-        "body": json.dumps({"options": options}),
+        "body": json.dumps(body),
     }
     return response
 
 
+@router.action("slack_oauth_scopes")
+def slack_oauth_scopes_menu(event):
+    return {"option_groups": slack_oauth_scopes(event.get("value") or "")}
+
+
 def slack_oauth_scopes(term):
-    url = "https://api.slack.com/scopes"
-    with urlopen(url) as res:
-        html = res.read().decode()
-    scopes = re.findall(r"&quot;name&quot;:&quot;(.*?)&quot;", html)
-    options = [
-        {"value": x, "text": {"type": "plain_text", "text": x}}
-        for x in scopes
-        if x.startswith(term)
-    ]
-    return options
+    with logger.timer("scopes_search"):
+        return catalog.option_groups(term)
@@ -0,0 +1,253 @@
+"""
+Slack OAuth scope catalog
+
+The list of scopes is scraped from https://api.slack.com/scopes at most once
+per TTL. It is kept in memory and in ``/tmp`` across warm invocations and
+revalidated with ``ETag``/``Last-Modified``, so keystroke lookups are served
+from a prebuilt index without any outbound request.
+"""
+
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from http.client import HTTPException
+from urllib.parse import urlsplit
+
+from slackbot.client import Client, HTTPError, Timeout
+from slackbot.logger import logger
+
+SCOPES_URL = "https://api.slack.com/scopes"
+SCOPES_PATH = "/tmp/slack-scopes.json"
+SCOPES_PATTERN = re.compile(r"&quot;name&quot;:&quot;(.*?)&quot;")
+SCOPES_RETRY = 60
+SCOPES_TIMEOUT = 2
+SCOPES_TTL = 3600
+
+MAX_OPTIONS = 100
+
+EXACT, PREFIX, WORD, SUBSTRING, FUZZY = range(5)
+
+
+class Index:
+    """
+    Prefix index with ranked substring and fuzzy fallback.
+
+    Matches are ranked exact, then prefix (found by bisecting the sorted
+    names), then prefix of a ``:``/``.``-separated word, then substring and
+    finally in-order subsequence. Ties are broken by length, then name.
+    Options are built once up front and results are memoized per term, so a
+    repeated keystroke costs a dict lookup.
+
+    :Example:
+
+    >>> Index(["channels:read", "chat:write"]).search("ch:w")
+    ['chat:write']
+    """
+
+    def __init__(self, scopes, maxsize=1024):
+        self.names = sorted(set(scopes))
+        self.lower = [x.lower() for x in self.names]
+        self.labels = [re.split(r"[:.]", x, maxsplit=1)[0] for x in self.names]
+        self.options = [
+            {"value": x, "text": {"type": "plain_text", "text": x}} for x in self.names
+        ]
+        self.haystack = "\n".join(self.lower)
+        self.offsets = {}
+        offset = 0
+        for i, name in enumerate(self.lower):
+            self.offsets[offset] = i
+            offset += len(name) + 1
+        self.maxsize = maxsize
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefixed(self, term):
+        """
+        Get range of indexes of names starting with ``term``.
+        """
+        i = bisect_left(self.lower, term)
+        j = i
+        while j < len(self.lower) and self.lower[j].startswith(term):
+            j += 1
+        return range(i, j)
+
+    def rank(self, i, term):
+        name = self.lower[i]
+        if name == term:
+            return EXACT
+        if name.startswith(term):
+            return PREFIX
+        if f":{term}" in name or f".{term}" in name:
+            return WORD
+        if term in name:
+            return SUBSTRING
+        return FUZZY
+
+    def key(self, i, term):
+        return self.rank(i, term), len(self.lower[i]), i
+
+    def find(self, term, limit=MAX_OPTIONS):
+        """
+        Get indexes of up to ``limit`` names matching ``term``, best first.
+        """
+        term = term.strip().lower()
+        try:
+            return self.cache[term, limit]
+        except KeyError:
+            pass
+        if not term:
+            matches = range(min(limit, len(self.names)))
+        else:
+            prefixed = self.prefixed(term)
+            matches = sorted(prefixed, key=lambda i: self.key(i, term))
+            if len(matches) < limit:
+                pattern = "[^\n]*?".join(map(re.escape, term))
+                pattern = re.compile(f"^[^\n]*?{pattern}", re.MULTILINE)
+                others = [
+                    self.offsets[x.start()] for x in pattern.finditer(self.haystack)
+                ]
+                others = [i for i in others if i not in prefixed]
+                matches += sorted(others, key=lambda i: self.key(i, term))
+            matches = matches[:limit]
+        if len(self.cache) >= self.maxsize:
+            self.cache.clear()
+        self.cache[term, limit] = matches
+        return matches
+
+    def search(self, term, limit=MAX_OPTIONS):
+        """
+        Get up to ``limit`` names matching ``term``, best first.
+        """
+        return [self.names[i] for i in self.find(term, limit)]
+
+    def option_groups(self, term):
+        """
+        Get matching options grouped by resource (``chat:write`` → ``chat``),
+        keeping the groups in order of their best match.
+        """
+        groups = {}
+        for i in self.find(term):
+            groups.setdefault(self.labels[i], []).append(self.options[i])
+        return [
+            {"label": {"type": "plain_text", "text": label[:75]}, "options": options}
+            for label, options in groups.items()
+        ]
+
+
+class Catalog:
+    """
+    Scope catalog cached in memory and on disk with HTTP revalidation.
+
+    If revalidating fails the stale catalog is served, and the fetch is only
+    retried after ``retry`` seconds rather than on every keystroke.
+    """
+
+    def __init__(
+        self,
+        url=SCOPES_URL,
+        path=SCOPES_PATH,
+        ttl=SCOPES_TTL,
+        retry=SCOPES_RETRY,
+        clock=None,
+    ):
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.retry = retry
+        self.clock = clock or time.time
+        self.client = Client(url)
+        self.index = None
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0
+
+    def get(self):
+        """
+        Get scope index, loading or revalidating it if it is stale.
+        """
+        if self.index is None:
+            self.load()
+        if self.index is None or self.clock() - self.fetched_at >= self.ttl:
+            self.refresh()
+        return self.index
+
+    def search(self, term, limit=MAX_OPTIONS):
+        return self.get().search(term, limit)
+
+    def option_groups(self, term):
+        return self.get().option_groups(term)
+
+    def load(self):
+        """
+        Load catalog from disk.
+        """
+        try:
+            with open(self.path) as stream:
+                data = json.load(stream)
+        except (OSError, ValueError):
+            return False
+        self.index = Index(data["scopes"])
+        self.etag = data.get("etag")
+        self.last_modified = data.get("last_modified")
+        self.fetched_at = data.get("fetched_at", 0)
+        return True
+
+    def save(self):
+        data = {
+            "scopes": self.index.names,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+        }
+        tmp = f"{self.path}.{os.getpid()}"
+        try:
+            with open(tmp, "w") as stream:
+                json.dump(data, stream)
+            os.replace(tmp, self.path)
+        except OSError as err:
+            logger.warning("SAVE %s failed: %s", self.path, err)
+
+    def refresh(self):
+        """
+        Fetch catalog, sending validators so an unchanged page costs a 304.
+
+        A stale catalog is kept if the fetch fails. The connection is kept
+        alive for the next revalidation.
+        """
+        headers = {}
+        if self.index is not None and self.etag:
+            headers["if-none-match"] = self.etag
+        if self.index is not None and self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        parts = urlsplit(self.url)
+        path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        logger.info("GET %s", self.url)
+        try:
+            with logger.timer("scopes_fetch"):
+                res = self.client.get(path, headers, time.monotonic() + SCOPES_TIMEOUT)
+        except (HTTPError, HTTPException, OSError, Timeout) as err:
+            return self.fallback(err)
+        if res.status == 304 and self.index is not None:
+            logger.info("NOT MODIFIED %s", self.url)
+        elif res.status != 200:
+            return self.fallback(RuntimeError(f"GET {self.url} HTTP {res.status}"))
+        else:
+            with logger.timer("scopes_index"):
+                self.index = Index(SCOPES_PATTERN.findall(res.text))
+            self.etag = res.headers.get("etag")
+            self.last_modified = res.headers.get("last-modified")
+        self.fetched_at = self.clock()
+        self.save()
+        return self.index
+
+    def fallback(self, err):
+        if self.index is None:
+            raise err
+        logger.warning("GET %s failed, serving stale catalog: %s", self.url, err)
+        # Go stale again in ``retry`` seconds
+        self.fetched_at = self.clock() - max(0, self.ttl - self.retry)
+        return self.index
@@ -0,0 +1,91 @@
+from unittest import mock
+
+import pytest
+from slackbot.client import Timeout
+
+import scopes
+
+PAGE = (
+    "&quot;name&quot;:&quot;chat:write&quot; &quot;name&quot;:&quot;channels:read&quot;"
+)
+
+
+def ok(body=PAGE, status=200, headers=None):
+    res = mock.MagicMock(status=status, text=body)
+    res.headers = headers or {"etag": '"fizz"'}
+    return res
+
+
+class TestIndex:
+    def test_search(self):
+        index = scopes.Index(["channels:read", "chat:write", "chat:write.public"])
+        assert index.search("chat:write") == ["chat:write", "chat:write.public"]
+        assert index.search("ch:w") == ["chat:write", "chat:write.public"]
+
+    def test_option_groups(self):
+        index = scopes.Index(["channels:read", "chat:write"])
+        (group,) = index.option_groups("chat")
+        assert group["label"]["text"] == "chat"
+        assert [x["value"] for x in group["options"]] == ["chat:write"]
+
+
+class TestCatalog:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.now = 1000
+        self.catalog = scopes.Catalog(
+            "https://example.com/scopes",
+            str(tmp_path / "scopes.json"),
+            ttl=3600,
+            retry=60,
+            clock=lambda: self.now,
+        )
+        self.catalog.client = mock.MagicMock()
+        self.get = self.catalog.client.get
+
+    def test_fetch(self):
+        self.get.return_value = ok()
+        assert self.catalog.search("chat") == ["chat:write"]
+        assert self.catalog.search("chan") == ["channels:read"]
+        assert self.get.call_count == 1
+
+    def test_not_modified(self):
+        self.get.return_value = ok()
+        self.catalog.get()
+        self.now += 3600
+        self.get.return_value = ok("", status=304)
+        assert self.catalog.search("chat") == ["chat:write"]
+        assert self.get.call_args.args[1] == {"if-none-match": '"fizz"'}
+
+    def test_load(self):
+        self.get.return_value = ok()
+        self.catalog.get()
+        catalog = scopes.Catalog(path=self.catalog.path, clock=lambda: self.now)
+        catalog.client = mock.MagicMock()
+        assert catalog.search("chat") == ["chat:write"]
+        catalog.client.get.assert_not_called()
+
+    def test_unavailable(self):
+        self.get.side_effect = Timeout("down")
+        with pytest.raises(Timeout):
+            self.catalog.get()
+
+    def test_stale(self):
+        self.get.return_value = ok()
+        self.catalog.get()
+        self.now += 3600
+        self.get.side_effect = Timeout("down")
+        assert self.catalog.search("chat") == ["chat:write"]
+        assert self.get.call_count == 2
+
+        # Keystrokes within the retry interval don't wait on the fetch again
+        self.now += 59
+        assert self.catalog.search("chat") == ["chat:write"]
+        assert self.get.call_count == 2
+
+        # Nor is the catalog kept stale for a whole TTL
+        self.now += 1
+        self.get.side_effect = None
+        self.get.return_value = ok(PAGE.replace("chat:write", "chat:write.public"))
+        assert self.catalog.search("chat") == ["chat:write.public"]
+        assert self.get.call_count == 3
@@ -1,18 +1,26 @@
-import json
+from urllib.parse import urlsplit
 
-from logger import logger
+from slackbot.blocks import Slot, Template
+from slackbot.client import deadline
+from slackbot.lazy import Lazy, get_queue
+from slackbot.logger import logger
+from slackbot.router import Router
+from slackbot.slack import Slack
 
+lazy = Lazy(get_queue())
+router = Router()
+slack = Slack()
 
-@logger.bind
-def handler(event, _):
-    command = event["command"]
-
-    if command == "/test":
-        text = "Choose a Slack OAuth scope to learn more"
-        blocks = [
+TEXT = "Choose a Slack OAuth scope to learn more"
+LOADING = Template.message({"text": "Loading…"})
+SCOPES = Template.message(
+    {
+        "replace_original": True,
+        "text": TEXT,
+        "blocks": [
             {
                 "type": "section",
-                "text": {"type": "plain_text", "text": text},
+                "text": {"type": "plain_text", "text": TEXT},
             },
             {
                 "block_id": "slack_oauth_scopes",
@@ -25,8 +33,34 @@ def handler(event, _):
                     }
                 ],
             },
-        ]
-    data = {"text": text, "blocks": blocks}
-    body = json.dumps(data)
-    resp = {"statusCode": "200", "body": body}
-    return resp
+        ],
+    }
+)
+UNKNOWN = Template.message({"text": f"Unknown command {Slot('command')}"})
+
+
+@logger.bind
+@lazy.handler
+def handler(event, context=None):
+    # Acknowledge known commands now and reply from a deferred invocation
+    # via the response_url, so the ack never waits on the command's work
+    command = event["command"]
+    if router.find(event) is None:
+        return {"statusCode": "200", "body": UNKNOWN.render(command=command)}
+    with logger.timer("defer"):
+        return lazy.ack(
+            {"statusCode": "200", "body": LOADING.render()}, "respond", event
+        )
+
+
+@lazy("respond")
+def respond(event, context=None):
+    body = router.dispatch(event)
+    logger.info("POST %s", urlsplit(event["response_url"]).path)
+    with logger.timer("response_url"):
+        slack.respond(event["response_url"], body.encode(), deadline=deadline(context))
+
+
+@router.command("/test")
+def scopes_command(event):
+    return SCOPES.render()
@@ -97,11 +97,20 @@ resource "aws_lambda_function" "custom_responders" {
   filename         = data.archive_file.custom_responders[each.value].output_path
   function_name    = "${local.name}-api-${each.value}"
   handler          = "index.handler"
+  layers           = [module.slackbot.layer.arn]
   publish          = local.snap_start_enabled
   role             = module.slackbot.roles["lambda"].arn
   runtime          = "python3.14"
   source_code_hash = data.archive_file.custom_responders[each.value].output_base64sha256
 
+  environment {
+    variables = {
+      CLAIM_CHECK_BUCKET  = module.slackbot.claims.bucket
+      COALESCE_TABLE      = aws_dynamodb_table.coalesce.name
+      INSTALLATIONS_TABLE = module.slackbot.installations.name
+    }
+  }
+
   snap_start {
     apply_on = local.snap_start_enabled ? "PublishedVersions" : "None"
   }
@@ -113,6 +122,44 @@ resource "aws_cloudwatch_log_group" "custom_responders" {
   retention_in_days = 14
 }
 
+################
+#   COALESCE   #
+################
+
+resource "aws_dynamodb_table" "coalesce" {
+  name         = "${local.name}-coalesce"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "key"
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires"
+    enabled        = true
+  }
+}
+
+resource "aws_iam_role_policy" "coalesce" {
+  name = "coalesce"
+  role = module.slackbot.roles["lambda"].id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Sid      = "Coalesce"
+      Effect   = "Allow"
+      Resource = aws_dynamodb_table.coalesce.arn
+      Action = [
+        "dynamodb:GetItem",
+        "dynamodb:UpdateItem",
+      ]
+    }]
+  })
+}
+
 #######################
 #   APP HOME OPENED   #
 #######################
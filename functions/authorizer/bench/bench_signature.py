@@ -0,0 +1,52 @@
+"""
+Signature verification microbenchmark
+
+Compares the per-request cost of the legacy string-building signer against
+the cloned-state ``Verifier`` across a range of body sizes.
+
+:Example:
+
+$ PYTHONPATH=src python bench/bench_signature.py
+"""
+
+import hmac
+import timeit
+from functools import partial
+from hashlib import sha256
+
+from slackbot.signature import Verifier
+
+SECRET = "FIZZ"
+ROTATED = "BUZZ"
+TS = "1234567890"
+SIZES = [64, 1024, 16 * 1024, 256 * 1024, 1024 * 1024]
+
+
+def legacy(secret, body, ts, signature):
+    data = f"v0:{ts}:{body}"
+    hex = hmac.new(secret.encode(), data.encode(), sha256).hexdigest()
+    return signature == f"v0={hex}"
+
+
+def measure(func, number):
+    runs = timeit.repeat(func, number=number, repeat=5)
+    return min(runs) / number * 1e6
+
+
+def main():
+    verifier = Verifier(SECRET)
+    rotated = Verifier(ROTATED, SECRET)
+    print(f"{'bytes':>10} {'legacy µs':>12} {'verifier µs':>12} {'rotated µs':>12}")
+    for size in SIZES:
+        body = "x" * size
+        data = f"v0:{TS}:{body}".encode()
+        signature = f"v0={hmac.new(SECRET.encode(), data, sha256).hexdigest()}"
+        number = max(10, 100_000 // max(1, size // 64))
+        old = measure(partial(legacy, SECRET, body, TS, signature), number)
+        new = measure(partial(verifier.verify, signature, TS, body), number)
+        rot = measure(partial(rotated.verify, signature, TS, body), number)
+        print(f"{size:>10} {old:>12.2f} {new:>12.2f} {rot:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
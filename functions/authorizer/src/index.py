@@ -1,51 +1,101 @@
-import hmac
 import os
-from datetime import datetime, UTC
-from hashlib import sha256
 
-from logger import logger
+from slackbot import claimcheck, idempotency
+from slackbot.logger import logger
+from slackbot.payload import PARSERS, parse
+from slackbot.signature import VERSION, Verifier, now, split_secrets
+from slackbot.snapstart import before_snapshot
+from slackbot.state import InvalidState, StateTokens
 
-secret = os.environ["SIGNING_SECRET"]
+secrets = split_secrets(os.environ["SIGNING_SECRET"])
+verifier = Verifier(*secrets)
+states = StateTokens(verifier, int(os.getenv("OAUTH_TIMEOUT_SECONDS") or 300))
+claims = claimcheck.ClaimCheck(
+    claimcheck.get_store(),
+    int(os.getenv("CLAIM_CHECK_BYTES") or claimcheck.THRESHOLD),
+)
+seen = idempotency.Idempotency(
+    idempotency.get_store(),
+    int(os.getenv("IDEMPOTENCY_TTL_SECONDS") or idempotency.TTL),
+    int(os.getenv("IDEMPOTENCY_PENDING_SECONDS") or idempotency.PENDING_TTL),
+)
 
 
-@logger.bind
+@logger.bind(redact=("body", "state"), expected=(idempotency.Duplicate,))
 def handler(event, *_):
+    # Issue or verify OAuth state if requested
+    action = event.get("action")
+    if action == "issue_state":
+        return {"state": states.issue()}
+    elif action == "verify_state":
+        try:
+            return states.verify(event.get("state"))
+        except InvalidState as err:
+            raise Forbidden(str(err))
+
+    # Commit or release the idempotency key claimed for a request once its
+    # event has (or hasn't) been published; the state machines update the
+    # table directly, while the local server (with any store) calls here
+    elif action in ("commit_request", "release_request"):
+        key = idempotency.request_key(
+            event.get("event"), event["signature"], event["ts"]
+        )
+        if action == "commit_request":
+            seen.commit(key)
+        else:
+            seen.release(key)
+        return {"key": key}
+
     # Extract signing details
     body = event["body"]
     signature = event["signature"]
     ts = event["ts"]
 
     # Raise if message is older than 5min or in the future
-    try:
-        delta = int(now()) - int(ts)
-    except ValueError:
-        raise Forbidden("Request timestamp invalid")
-    if delta > 5 * 60:
-        raise Forbidden("Request timestamp is too old")
-    elif delta < 0:
-        raise Forbidden("Request timestamp is in the future")
+    with logger.timer("timestamp"):
+        try:
+            delta = int(now()) - int(ts)
+        except ValueError:
+            raise Forbidden("Request timestamp invalid")
+        if delta > 5 * 60:
+            raise Forbidden("Request timestamp is too old")
+        elif delta < 0:
+            raise Forbidden("Request timestamp is in the future")
 
     # Raise if signatures do not match
-    expected = sign(secret, body, ts)
-    logger.debug("GIVEN SIGNATURE    %s", signature)
-    logger.debug("EXPECTED SIGNATURE %s", expected)
-    if signature != expected:
+    logger.debug("GIVEN SIGNATURE %s", signature)
+    with logger.timer("signature"):
+        verified = verifier.verify(signature, ts, body)
+    if not verified:
         raise Forbidden("Invalid signature")
 
-    return True
+    # Parse payload if requested
+    kind = event.get("parse")
+    result = True
+    if kind:
+        with logger.timer("parse"):
+            result = parse(body, kind)
 
+    # Raise if request (or Events API retry) was already seen
+    if event.get("dedupe"):
+        with logger.timer("dedupe"):
+            seen.claim(idempotency.request_key(result, signature, ts))
 
-def now():
-    return datetime.now(UTC).timestamp()
+    # Pass the trace on with the event, pointer or not
+    return logger.inject(claims.encode(result, len(body.encode()))) if kind else result
 
 
-def sign(secret, body, ts=None):
-    ts = ts or str(int(now()))
-    data = f"v0:{ts}:{body}"
-    logger.debug("STRING TO SIGN %s", data)
-    hex = hmac.new(secret.encode(), data.encode(), sha256).hexdigest()
-    signature = f"v0={hex}"
-    return signature
+@before_snapshot
+def prime():
+    # Run the signing, parsing and state paths once so their first use after
+    # restore is warm; logging is skipped to keep metrics clean
+    ts = str(int(now()))
+    body = "payload=%7B%22type%22%3A%22block_actions%22%7D"
+    digest = verifier.digest(verifier.primary, ts, body).hex()
+    verifier.verify(f"{VERSION}={digest}", ts, body)
+    for kind, sample in (("json", "{}"), ("payload", body), ("slash_command", "")):
+        claims.encode(PARSERS[kind](sample), len(sample.encode()))
+    states.verify(states.issue())
 
 
 class Forbidden(Exception): ...
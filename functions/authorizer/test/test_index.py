@@ -1,6 +1,11 @@
+import json
+import random
+import string
 from unittest import mock
 
 import pytest
+from slackbot import claimcheck, idempotency, snapstart
+from slackbot.signature import sign
 
 import index
 
@@ -14,34 +19,208 @@ class TestHandler:
             index.handler(event)
 
     @mock.patch("index.now")
-    @mock.patch("index.sign")
-    def test_future_ts(self, mock_sign, mock_time):
+    def test_future_ts(self, mock_time):
         mock_time.return_value = 1234567890.9
-        mock_sign.return_value = "GOOD"
-        event = {"body": "fizz=buzz", "signature": "GOOD", "ts": "1234567899"}
+        signature = sign("FIZZ", "fizz=buzz", "1234567899")
+        event = {"body": "fizz=buzz", "signature": signature, "ts": "1234567899"}
         with pytest.raises(index.Forbidden):
             index.handler(event)
 
     @mock.patch("index.now")
-    @mock.patch("index.sign")
-    def test_stale_ts(self, mock_sign, mock_time):
+    def test_stale_ts(self, mock_time):
         mock_time.return_value = 1234567890.9
-        mock_sign.return_value = "GOOD"
-        event = {"body": "fizz=buzz", "signature": "GOOD", "ts": "1134567890"}
+        signature = sign("FIZZ", "fizz=buzz", "1134567890")
+        event = {"body": "fizz=buzz", "signature": signature, "ts": "1134567890"}
         with pytest.raises(index.Forbidden):
             index.handler(event)
 
-    @mock.patch("index.sign")
-    def test_invalid_ts(self, mock_sign):
-        mock_sign.return_value = "GOOD"
+    def test_invalid_ts(self):
         event = {"body": "fizz=buzz", "signature": "GOOD", "ts": "BAD"}
         with pytest.raises(index.Forbidden):
             index.handler(event)
 
     @mock.patch("index.now")
-    @mock.patch("index.sign")
-    def test_valid(self, mock_sign, mock_time):
+    def test_valid(self, mock_time):
         mock_time.return_value = 1234567890.9
-        mock_sign.return_value = "GOOD"
-        event = {"body": "fizz=buzz", "signature": "GOOD", "ts": "1234567890"}
+        signature = sign("FIZZ", "fizz=buzz", "1234567890")
+        event = {"body": "fizz=buzz", "signature": signature, "ts": "1234567890"}
         assert index.handler(event) is True
+
+    @mock.patch("index.now")
+    def test_valid_parse(self, mock_time):
+        mock_time.return_value = 1234567890.9
+        body = "command=%2Ftest&text=fizz+buzz"
+        signature = sign("FIZZ", body, "1234567890")
+        event = {"body": body, "signature": signature, "ts": "1234567890"}
+        event.update(parse="slash_command")
+        result = index.handler(event)
+        assert result.pop("_trace")
+        assert result == {
+            "command": "/test",
+            "text": "fizz buzz",
+            "type": "slash_command",
+        }
+
+    @pytest.mark.parametrize(
+        ("body", "correlation_id"),
+        [
+            ("command=%2Ftest&trigger_id=123.456", "123.456"),
+            ("command=%2Ftest", "fizz"),
+        ],
+    )
+    @mock.patch("index.now")
+    def test_trace(self, mock_time, body, correlation_id):
+        mock_time.return_value = 1234567890.9
+        signature = sign("FIZZ", body, "1234567890")
+        event = {"body": body, "signature": signature, "ts": "1234567890"}
+        event.update(parse="slash_command", execution="fizz")
+        trace = index.handler(event)["_trace"]
+        assert trace["correlation_id"] == correlation_id
+        assert trace["trace_id"].startswith("1-")
+        assert len(trace["parent_id"]) == 16
+
+    @mock.patch("index.now")
+    def test_metrics(self, mock_time, capsys):
+        mock_time.return_value = 1234567890.9
+        body = "command=%2Ftest"
+        signature = sign("FIZZ", body, "1234567890")
+        event = {"body": body, "signature": signature, "ts": "1234567890"}
+        index.handler({**event, "parse": "slash_command"})
+        record = json.loads(capsys.readouterr().out.splitlines()[-1])
+        metrics = record["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+        assert [x["Name"] for x in metrics] == [
+            "timestamp",
+            "signature",
+            "parse",
+            "handler",
+        ]
+
+    def test_issue_and_verify_state(self):
+        returned = index.handler({"action": "issue_state"})
+        assert index.handler({"action": "verify_state", **returned}) is True
+        with pytest.raises(index.Forbidden, match="already used"):
+            index.handler({"action": "verify_state", **returned})
+
+    def test_verify_state_invalid(self):
+        with pytest.raises(index.Forbidden, match="malformed"):
+            index.handler({"action": "verify_state", "state": "fizz"})
+
+
+class TestDedupe:
+    def request(self, event_id):
+        body = json.dumps({"type": "event_callback", "event_id": event_id})
+        return {
+            "body": body,
+            "signature": sign("FIZZ", body, "1234567890"),
+            "ts": "1234567890",
+            "parse": "json",
+            "dedupe": True,
+        }
+
+    def action(self, action, request, event):
+        return {
+            "action": action,
+            "signature": request["signature"],
+            "ts": request["ts"],
+            "event": event,
+        }
+
+    @mock.patch("index.now")
+    def test_dedupe(self, mock_time):
+        mock_time.return_value = 1234567890.9
+        event = self.request("EvDEDUPE")
+        assert index.handler(event)["event_id"] == "EvDEDUPE"
+        with pytest.raises(idempotency.Duplicate):
+            index.handler(event)
+        assert index.handler({**event, "dedupe": False})["event_id"] == "EvDEDUPE"
+
+    @mock.patch("index.now")
+    def test_commit(self, mock_time):
+        mock_time.return_value = 1234567890.9
+        request = self.request("EvCOMMIT")
+        with mock.patch.object(index.seen, "clock") as mock_clock:
+            mock_clock.return_value = 1000
+            result = index.handler(request)
+            returned = index.handler(self.action("commit_request", request, result))
+            assert returned == {"key": "event:EvCOMMIT"}
+
+            # Past the pending TTL, but not the committed one
+            mock_clock.return_value = 1000 + idempotency.PENDING_TTL
+            with pytest.raises(idempotency.Duplicate):
+                index.handler(request)
+
+    @mock.patch("index.now")
+    def test_pending(self, mock_time):
+        mock_time.return_value = 1234567890.9
+        request = self.request("EvPENDING")
+        with mock.patch.object(index.seen, "clock") as mock_clock:
+            mock_clock.return_value = 1000
+            index.handler(request)
+            mock_clock.return_value = 1000 + idempotency.PENDING_TTL
+            assert index.handler(request)["event_id"] == "EvPENDING"
+
+    @mock.patch("index.now")
+    def test_release(self, mock_time):
+        mock_time.return_value = 1234567890.9
+        request = self.request("EvRELEASE")
+        result = index.handler(request)
+        returned = index.handler(self.action("release_request", request, result))
+        assert returned == {"key": "event:EvRELEASE"}
+        assert index.handler(request)["event_id"] == "EvRELEASE"
+
+
+def submission(size):
+    rng = random.Random(size)
+    text = "".join(rng.choices(string.ascii_letters, k=size))
+    return {"type": "view_submission", "view": {"private_metadata": text}}
+
+
+class TestClaimCheck:
+    @mock.patch("index.now")
+    def test_offload(self, mock_time, tmp_path):
+        mock_time.return_value = 1234567890.9
+        payload = submission(300_000)
+        body = f"payload={json.dumps(payload)}"
+        signature = sign("FIZZ", body, "1234567890")
+        event = {
+            "body": body,
+            "signature": signature,
+            "ts": "1234567890",
+            "parse": "payload",
+        }
+        store = claimcheck.FileStore(tmp_path)
+        with mock.patch.object(index.claims, "store", store):
+            pointer = index.handler(event)
+            assert index.claims.decode(pointer) == payload
+        assert len(json.dumps(pointer)) < 1024
+        assert pointer["type"] == "view_submission"
+
+    @mock.patch("index.now")
+    def test_escaped(self, mock_time):
+        # 80 KB of body serializes to 240 KB once escaped as \u00e9
+        mock_time.return_value = 1234567890.9
+        payload = {
+            "type": "view_submission",
+            "view": {"private_metadata": "é" * 40_000},
+        }
+        body = f"payload={json.dumps(payload, ensure_ascii=False)}"
+        event = {
+            "body": body,
+            "signature": sign("FIZZ", body, "1234567890"),
+            "ts": "1234567890",
+            "parse": "payload",
+        }
+        pointer = index.handler(event)
+        assert claimcheck.CLAIM_KEY in pointer
+        assert index.claims.decode(pointer) == payload
+
+
+class TestSnapStart:
+    def test_registered(self):
+        assert index.prime in snapstart.HOOKS["before_snapshot"]
+        assert snapstart.reseed in snapstart.HOOKS["after_restore"]
+
+    def test_prime(self):
+        states = len(index.states.used)
+        index.prime()
+        assert len(index.states.used) == states + 1
@@ -1,28 +1,52 @@
-import json
 import os
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+import socket
+import ssl
+from urllib.parse import urlsplit
 
-from logger import logger
+from slackbot.client import deadline
+from slackbot.installations import Installation, get_store
+from slackbot.logger import logger
+from slackbot.slack import Slack
+from slackbot.snapstart import after_restore, before_snapshot
 
 client_id = os.environ["CLIENT_ID"]
 client_secret = os.environ["CLIENT_SECRET"]
 
+slack = Slack()
+store = get_store()
 
-@logger.bind
-def handler(event, *_):
-    # Set up OAuth request
-    url = "https://slack.com/api/oauth.v2.access"
-    headers = {"content-type": "application/x-www-form-urlencoded"}
+
+@logger.bind(redact=("code",))
+def handler(event, context=None):
+    # Execute request to complete OAuth workflow before the Lambda times out
+    method = "oauth.v2.access"
     payload = {"client_id": client_id, "client_secret": client_secret, **event}
-    data = urlencode(payload).encode()
+    logger.info("POST /api/%s", method)
+    with logger.timer("oauth_access"):
+        result = slack.api(method, deadline=deadline(context), **payload)
 
-    # Execute request to complete OAuth workflow
-    logger.info("POST %s", url)
-    req = Request(url, data, headers, method="POST")
-    res = urlopen(req)
+    # Persist installation
+    if result.get("ok"):
+        installation = Installation.from_oauth(result)
+        logger.info("PUT %s", installation.key)
+        with logger.timer("store"):
+            store.put(installation)
 
     # Return response
-    resdata = res.read().decode()
-    result = json.loads(resdata)
     return result
+
+
+@before_snapshot
+def prime():
+    # Load the CA bundle and resolver before the snapshot. No connection is
+    # opened, since it would be stale in every restored instance
+    slack.pool.kwargs.setdefault("context", ssl.create_default_context())
+    try:
+        socket.getaddrinfo(urlsplit(slack.pool.url).hostname, 443)
+    except OSError:
+        pass
+
+
+@after_restore
+def reconnect():
+    slack.close()
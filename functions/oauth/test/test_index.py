@@ -1,25 +1,66 @@
-import json
-from io import BytesIO
 from unittest import mock
 
-with mock.patch("urllib.request.urlopen"):
-    with mock.patch("urllib.request.Request"):
-        import index
+import pytest
+from slackbot.client import Timeout
+
+import index
 
 
 class TestHandler:
     def setup_method(self):
-        self.response = {"ok": True}
-        index.urlopen.return_value = BytesIO(json.dumps(self.response).encode())
+        self.context = mock.MagicMock()
+        self.context.get_remaining_time_in_millis.return_value = 3000
 
-    def test_handler(self):
+    @mock.patch("index.store")
+    @mock.patch("index.slack")
+    def test_handler(self, mock_slack, mock_store):
+        result = {"ok": True, "access_token": "xoxb", "team": {"id": "T1"}}
+        mock_slack.api.return_value = result
         event = {"code": "JAZZ"}
-        returned = index.handler(event)
-        index.Request.assert_called_once_with(
-            "https://slack.com/api/oauth.v2.access",
-            "client_id=FIZZ&client_secret=BUZZ&code=JAZZ".encode(),
-            {"content-type": "application/x-www-form-urlencoded"},
-            method="POST",
+        with mock.patch("slackbot.client.time.monotonic", return_value=100):
+            returned = index.handler(event, self.context)
+        mock_slack.api.assert_called_once_with(
+            "oauth.v2.access",
+            deadline=102.75,
+            client_id="FIZZ",
+            client_secret="BUZZ",
+            code="JAZZ",
         )
-        index.urlopen.assert_called_once_with(index.Request.return_value)
-        assert returned == self.response
+        assert returned == {"ok": True, "access_token": "xoxb", "team": {"id": "T1"}}
+        (installation,) = mock_store.put.call_args.args
+        assert installation.key == "-:T1"
+        assert installation.bot_token == "xoxb"
+
+    @mock.patch("index.store")
+    @mock.patch("index.slack")
+    def test_handler_not_ok(self, mock_slack, mock_store):
+        mock_slack.api.return_value = {"ok": False}
+        assert index.handler({"code": "JAZZ"}, self.context) == {"ok": False}
+        mock_store.put.assert_not_called()
+
+    @mock.patch("index.slack")
+    def test_handler_timeout(self, mock_slack):
+        mock_slack.api.side_effect = Timeout
+        with pytest.raises(Timeout):
+            index.handler({"code": "JAZZ"}, self.context)
+
+
+class TestSnapStart:
+    @mock.patch("index.socket.getaddrinfo")
+    def test_prime(self, mock_getaddrinfo):
+        with mock.patch.dict(index.slack.pool.kwargs):
+            index.prime()
+            assert index.slack.pool.kwargs["context"]
+        mock_getaddrinfo.assert_called_once_with("slack.com", 443)
+
+    @mock.patch("index.socket.getaddrinfo", side_effect=OSError)
+    def test_prime_offline(self, _):
+        with mock.patch.dict(index.slack.pool.kwargs):
+            index.prime()
+
+    def test_reconnect(self):
+        with index.slack.pool.client() as client:
+            pass
+        index.reconnect()
+        assert index.slack.pool.idle.empty()
+        assert client.connection is None
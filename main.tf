@@ -53,6 +53,53 @@ locals {
     }
 
     lambda = {
+      claims = {
+        Version = "2012-10-17"
+        Statement = [{
+          Sid      = "Claims"
+          Effect   = "Allow"
+          Resource = "${aws_s3_bucket.claims.arn}/claims/*"
+          Action = [
+            "s3:GetObject",
+            "s3:PutObject",
+          ]
+        }]
+      }
+
+      idempotency = {
+        Version = "2012-10-17"
+        Statement = [{
+          Sid      = "Idempotency"
+          Effect   = "Allow"
+          Action   = "dynamodb:PutItem"
+          Resource = aws_dynamodb_table.idempotency.arn
+        }]
+      }
+
+      installations = {
+        Version = "2012-10-17"
+        Statement = [{
+          Sid      = "Installations"
+          Effect   = "Allow"
+          Resource = aws_dynamodb_table.installations.arn
+          Action = [
+            "dynamodb:DeleteItem",
+            "dynamodb:GetItem",
+            "dynamodb:PutItem",
+          ]
+        }]
+      }
+
+      lambda = {
+        Version = "2012-10-17"
+        Statement = [{
+          Sid      = "Invoke"
+          Effect   = "Allow"
+          Action   = "lambda:InvokeFunction"
+          Resource = "arn:aws:lambda:${local.region}:${local.account}:function:${var.name}-api-*"
+        }]
+      }
+
       logs = {
         Version = "2012-10-17"
         Statement = [{
@@ -74,6 +121,19 @@ locals {
         }]
       }
 
+      idempotency = {
+        Version = "2012-10-17"
+        Statement = [{
+          Sid      = "Idempotency"
+          Effect   = "Allow"
+          Resource = aws_dynamodb_table.idempotency.arn
+          Action = [
+            "dynamodb:DeleteItem",
+            "dynamodb:UpdateItem",
+          ]
+        }]
+      }
+
       lambda = {
         Version = "2012-10-17"
         Statement = [{
@@ -124,21 +184,6 @@ locals {
           }
         ]
       }
-
-      states = {
-        Version = "2012-10-17"
-        Statement = [{
-          Effect = "Allow"
-          Action = [
-            "states:DescribeExecution",
-            "states:StartExecution",
-          ]
-          Resource = [
-            "arn:aws:states:${local.region}:${local.account}:stateMachine:${var.name}-api-state",
-            "arn:aws:states:${local.region}:${local.account}:execution:${var.name}-api-state:*",
-          ]
-        }]
-      }
     }
   }
 
@@ -150,7 +195,10 @@ locals {
       runtime            = var.lambda_runtime
       snap_start_enabled = var.lambda_snap_start_enabled
       variables = {
-        SIGNING_SECRET = var.slack_signing_secret
+        CLAIM_CHECK_BUCKET    = aws_s3_bucket.claims.bucket
+        IDEMPOTENCY_TABLE     = aws_dynamodb_table.idempotency.name
+        OAUTH_TIMEOUT_SECONDS = var.oauth_timeout_seconds
+        SIGNING_SECRET        = var.slack_signing_secret
       }
     }
 
@@ -161,8 +209,9 @@ locals {
       runtime            = var.lambda_runtime
       snap_start_enabled = var.lambda_snap_start_enabled
       variables = {
-        CLIENT_ID     = var.slack_client_id
-        CLIENT_SECRET = var.slack_client_secret
+        CLIENT_ID           = var.slack_client_id
+        CLIENT_SECRET       = var.slack_client_secret
+        INSTALLATIONS_TABLE = aws_dynamodb_table.installations.name
       }
     }
   }
@@ -174,7 +223,6 @@ locals {
     menu     = "EXPRESS"
     oauth    = "EXPRESS"
     slash    = "EXPRESS"
-    state    = "STANDARD"
   }
 
   log_groups = merge(
@@ -206,6 +254,66 @@ resource "aws_cloudwatch_event_connection" "slack" {
   }
 }
 
+################
+#   DYNAMODB   #
+################
+
+resource "aws_dynamodb_table" "idempotency" {
+  name         = "${var.name}-idempotency"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "key"
+  tags         = var.tags
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires"
+    enabled        = true
+  }
+}
+
+resource "aws_dynamodb_table" "installations" {
+  name         = "${var.name}-installations"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "key"
+  tags         = var.tags
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+}
+
+##########
+#   S3   #
+##########
+
+resource "aws_s3_bucket" "claims" {
+  bucket_prefix = "${var.name}-claims-"
+  force_destroy = true
+  tags          = var.tags
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "claims" {
+  bucket = aws_s3_bucket.claims.id
+
+  rule {
+    id     = "expire-claims"
+    status = "Enabled"
+
+    filter {
+      prefix = "claims/"
+    }
+
+    expiration {
+      days = 1
+    }
+  }
+}
+
 ################
 #   REST API   #
 ################
@@ -337,6 +445,27 @@ resource "aws_iam_role_policy" "policies" {
 #   LAMBDA FUNCTIONS   #
 ########################
 
+data "archive_file" "runtime" {
+  source_dir  = "${path.module}/runtime"
+  output_path = "${path.module}/runtime/package.zip"
+  type        = "zip"
+
+  # Only the python/ tree belongs in the layer (it is mounted at /opt/python)
+  excludes = setsubtract(
+    fileset("${path.module}/runtime", "**"),
+    fileset("${path.module}/runtime", "python/**"),
+  )
+}
+
+resource "aws_lambda_layer_version" "runtime" {
+  compatible_architectures = ["arm64"]
+  compatible_runtimes      = [var.lambda_runtime]
+  description              = "${var.name} shared runtime"
+  filename                 = data.archive_file.runtime.output_path
+  layer_name               = "${var.name}-runtime"
+  source_code_hash         = data.archive_file.runtime.output_base64sha256
+}
+
 data "archive_file" "packages" {
   for_each = local.functions
 
@@ -353,6 +482,7 @@ resource "aws_lambda_function" "functions" {
   filename         = data.archive_file.packages[each.key].output_path
   function_name    = "${var.name}-api-${each.key}"
   handler          = "index.handler"
+  layers           = [aws_lambda_layer_version.runtime.arn]
   memory_size      = each.value.memory_size
   publish          = each.value.publish
   role             = aws_iam_role.roles["lambda"].arn
@@ -391,15 +521,17 @@ resource "aws_sfn_state_machine" "states" {
     event_bus_name          = aws_cloudwatch_event_bus.bus.name
     authorizer_function_arn = aws_lambda_function.functions["authorizer"].arn
     oauth_function_arn      = aws_lambda_function.functions["oauth"].arn
+    idempotency_table_name  = aws_dynamodb_table.idempotency.name
+
+    idempotency_ttl_seconds = 3600
 
-    name                  = var.name
-    domain_name           = var.domain_name
-    oauth_timeout_seconds = var.oauth_timeout_seconds
-    slack_client_id       = var.slack_client_id
-    slack_error_uri       = var.slack_error_uri
-    slack_scope           = var.slack_scope
-    slack_success_uri     = var.slack_success_uri
-    slack_user_scope      = var.slack_user_scope
+    name              = var.name
+    domain_name       = var.domain_name
+    slack_client_id   = var.slack_client_id
+    slack_error_uri   = var.slack_error_uri
+    slack_scope       = var.slack_scope
+    slack_success_uri = var.slack_success_uri
+    slack_user_scope  = var.slack_user_scope
   })))
 
   logging_configuration {
@@ -11,6 +11,11 @@ output "apigateway" {
   }
 }
 
+output "claims" {
+  description = "S3 bucket for oversized event payloads"
+  value       = aws_s3_bucket.claims
+}
+
 output "connection" {
   description = "EventBridge connection"
   value       = aws_cloudwatch_event_connection.slack
@@ -21,6 +26,21 @@ output "functions" {
   value       = aws_lambda_function.functions
 }
 
+output "idempotency" {
+  description = "DynamoDB idempotency table"
+  value       = aws_dynamodb_table.idempotency
+}
+
+output "installations" {
+  description = "DynamoDB installations table"
+  value       = aws_dynamodb_table.installations
+}
+
+output "layer" {
+  description = "Lambda layer with the shared slackbot runtime"
+  value       = aws_lambda_layer_version.runtime
+}
+
 output "logs" {
   description = "CloudWatch log groups"
   value       = aws_cloudwatch_log_group.logs
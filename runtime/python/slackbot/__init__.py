@@ -0,0 +1,6 @@
+"""
+Slackbot runtime
+
+Modules shared by every function, packaged as a Lambda layer (``/opt/python``)
+so function zips only carry their own handlers.
+"""
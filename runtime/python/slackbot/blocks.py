@@ -0,0 +1,300 @@
+"""
+Block Kit templates
+
+Messages and views are declared once, checked against Slack's limits when
+they are defined (so an oversize template fails at import rather than in
+Slack's response) and compiled to pre-serialized JSON fragments. Only the
+values that change between responses are left as typed ``Slot``s, so
+rendering is a string join rather than building and serializing nested
+dicts.
+
+A slot may stand for a whole value (any JSON type) or, formatted into a
+string, for part of one. String slots inherit the length limit of the
+field they sit in, and object slots are checked like the template they
+fill, when rendered.
+
+:Example:
+
+>>> SCOPE = Template.message(
+...     {
+...         "text": "Scope",
+...         "blocks": [
+...             {
+...                 "type": "actions",
+...                 "elements": [
+...                     {
+...                         "type": "button",
+...                         "text": {"type": "plain_text", "text": "Open"},
+...                         "url": f"https://api.slack.com/scopes/{Slot('scope')}",
+...                     }
+...                 ],
+...             }
+...         ],
+...     }
+... )
+>>> SCOPE.render(scope="chat:write")
+'{"text":"Scope","blocks":[{"type":"actions",..."url":"https://api.slack.com/scopes/chat:write"}]}]}'
+"""
+
+import json
+import re
+from json.encoder import encode_basestring_ascii
+
+SEPARATORS = (",", ":")
+ENCODER = json.JSONEncoder(separators=SEPARATORS)
+
+# Maximum blocks per surface
+MAX_BLOCKS = {"message": 50, "modal": 100, "home": 100}
+
+# Maximum characters of text objects, by (container type, key); a container
+# type of None matches any container
+TEXT_LIMITS = {
+    ("header", "text"): 150,
+    ("section", "text"): 3000,
+    ("section", "fields"): 2000,
+    ("button", "text"): 75,
+    ("option", "text"): 75,
+    ("option", "description"): 75,
+    ("input", "label"): 2000,
+    ("input", "hint"): 2000,
+    ("modal", "title"): 24,
+    ("modal", "submit"): 24,
+    ("modal", "close"): 24,
+    (None, "placeholder"): 150,
+}
+
+# Maximum characters of string fields, by (container type, key)
+STRING_LIMITS = {
+    ("message", "text"): 40000,
+    ("option", "value"): 150,
+    ("button", "value"): 2000,
+    (None, "action_id"): 255,
+    (None, "block_id"): 255,
+    (None, "callback_id"): 255,
+    (None, "private_metadata"): 3000,
+    (None, "url"): 3000,
+}
+
+# Maximum items of lists, by key
+LIST_LIMITS = {
+    "elements": 25,
+    "fields": 10,
+    "options": 100,
+    "option_groups": 100,
+}
+
+
+class BlockKitError(ValueError): ...
+
+
+class Slot:
+    """
+    Substitution slot of a template.
+
+    Rendered values must be instances of ``type``. Formatted into a string
+    (``f"...{Slot('name')}"``), a slot stands for part of that string.
+    """
+
+    def __init__(self, name, type=str):
+        if not re.fullmatch(r"\w+", name):
+            raise BlockKitError(f"Invalid slot name: {name!r}")
+        self.name = name
+        self.type = type
+        self.limit = None
+        self.context = None
+
+    def __str__(self):
+        return f"<<slot:{self.name}>>"
+
+    def __repr__(self):
+        return f"Slot({self.name!r}, {self.type.__name__})"
+
+
+MARKER = re.compile(r"<<slot:(\w+)>>")
+
+
+def kind_of(node):
+    """
+    Get container type of a Block Kit node (options have none of their own).
+    """
+    if "type" in node and isinstance(node["type"], str):
+        return node["type"]
+    if "text" in node and "value" in node:
+        return "option"
+    return None
+
+
+def limit(limits, container, key):
+    return limits.get((container, key)) or limits.get((None, key))
+
+
+class Checker:
+    """
+    Check a template (or a value rendered into one) against Slack's limits,
+    recording on each slot the limit of the field it fills.
+    """
+
+    def __init__(self, slots=None):
+        self.slots = slots
+
+    def string(self, value, maximum, path):
+        if maximum is None:
+            return
+        literal = MARKER.sub("", value) if self.slots is not None else value
+        if len(literal) > maximum:
+            raise BlockKitError(f"{path} is over {maximum} characters")
+        if self.slots is not None:
+            for name in MARKER.findall(value):
+                self.limit(self.slots[name], maximum - len(literal))
+
+    @staticmethod
+    def limit(slot, maximum):
+        if maximum is not None and slot.type is str:
+            slot.limit = maximum if slot.limit is None else min(slot.limit, maximum)
+
+    def text(self, node, maximum, path):
+        if isinstance(node, dict):
+            value = node.get("text")
+            if isinstance(value, str):
+                self.string(value, maximum, f"{path}.text")
+            elif isinstance(value, Slot):
+                self.limit(value, maximum)
+
+    def check(self, node, path="$", container=None, key=None, kind=None):
+        if isinstance(node, Slot):
+            node.context = (container, key)
+            self.limit(node, limit(STRING_LIMITS, container, key))
+        elif isinstance(node, str):
+            self.string(node, limit(STRING_LIMITS, container, key), path)
+        elif isinstance(node, list):
+            maximum = LIST_LIMITS.get(key)
+            if maximum is not None and len(node) > maximum:
+                raise BlockKitError(f"{path} has over {maximum} items")
+            text = limit(TEXT_LIMITS, container, key)
+            for i, item in enumerate(node):
+                if text is not None:
+                    self.text(item, text, f"{path}[{i}]")
+                else:
+                    self.check(item, f"{path}[{i}]", container, key)
+        elif isinstance(node, dict):
+            kind = kind or kind_of(node)
+            for name, value in node.items():
+                text = limit(TEXT_LIMITS, kind, name)
+                if text is not None and not isinstance(value, list):
+                    self.text(value, text, f"{path}.{name}")
+                else:
+                    self.check(value, f"{path}.{name}", kind, name)
+
+
+class Template:
+    """
+    Block Kit payload compiled to JSON fragments and ``Slot``s.
+
+    ``surface`` is ``message``, ``modal`` or ``home`` (whose block counts
+    are limited), or ``None`` for a fragment such as a list of options.
+    """
+
+    def __init__(self, document, surface=None):
+        self.surface = surface
+        self.slots = {}
+        self.collect(document)
+        blocks = document.get("blocks") if isinstance(document, dict) else None
+        maximum = MAX_BLOCKS.get(surface)
+        if isinstance(blocks, list) and maximum and len(blocks) > maximum:
+            raise BlockKitError(f"Over {maximum} blocks")
+        Checker(self.slots).check(document, kind=surface)
+        self.parts = self.compile(document)
+
+    @classmethod
+    def message(cls, document):
+        return cls(document, "message")
+
+    @classmethod
+    def modal(cls, document):
+        return cls({"type": "modal", **document}, "modal")
+
+    @classmethod
+    def home(cls, document):
+        return cls({"type": "home", **document}, "home")
+
+    def collect(self, node):
+        if isinstance(node, Slot):
+            self.add(node)
+        elif isinstance(node, str):
+            for name in MARKER.findall(node):
+                self.add(self.slots.get(name) or Slot(name))
+        elif isinstance(node, dict):
+            for value in node.values():
+                self.collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                self.collect(value)
+
+    def add(self, slot):
+        other = self.slots.setdefault(slot.name, slot)
+        if other is not slot and other.type is not slot.type:
+            raise BlockKitError(f"Slot {slot.name} has conflicting types")
+
+    def compile(self, document):
+        """
+        Split serialized document into literal fragments and slots.
+
+        Returns ``[(literal, slot, quoted), ..., (literal, None, False)]``,
+        where ``quoted`` slots are rendered inside a JSON string.
+        """
+
+        def encode(node):
+            if isinstance(node, Slot):
+                return f"\x00{node.name}\x00"
+            raise TypeError(f"Object of type {type(node).__name__} is not a slot")
+
+        encoder = json.JSONEncoder(separators=SEPARATORS, default=encode)
+        text = encoder.encode(document)
+        pattern = re.compile(r'"\\u0000(\w+)\\u0000"|<<slot:(\w+)>>')
+        parts = []
+        start = 0
+        for match in pattern.finditer(text):
+            whole, inline = match.groups()
+            slot = self.slots[whole or inline]
+            if inline is not None and slot.type is not str:
+                raise BlockKitError(f"Slot {inline} is formatted into a string")
+            parts.append((text[start : match.start()], slot, inline is not None))
+            start = match.end()
+        parts.append((text[start:], None, False))
+        return parts
+
+    def value(self, slot, value, quoted):
+        if not isinstance(value, slot.type):
+            raise BlockKitError(
+                f"Slot {slot.name} expects {slot.type.__name__}, "
+                f"got {type(value).__name__}"
+            )
+        if (
+            slot.limit is not None
+            and isinstance(value, str)
+            and len(value) > slot.limit
+        ):
+            raise BlockKitError(f"Slot {slot.name} is over {slot.limit} characters")
+        if isinstance(value, (dict, list)):
+            container, key = slot.context or (None, None)
+            Checker().check(value, f"${{{slot.name}}}", container, key)
+        if isinstance(value, str):
+            text = encode_basestring_ascii(value)
+        else:
+            text = ENCODER.encode(value)
+        return text[1:-1] if quoted else text
+
+    def render(self, **values):
+        """
+        Render template as a JSON string.
+        """
+        try:
+            return "".join(
+                literal + (self.value(slot, values[slot.name], quoted) if slot else "")
+                for literal, slot, quoted in self.parts
+            )
+        except KeyError as err:
+            raise BlockKitError(f"Missing slot {err.args[0]}") from None
+
+    def __repr__(self):
+        return f"Template({self.surface!r}, slots={list(self.slots)})"
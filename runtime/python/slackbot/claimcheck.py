@@ -0,0 +1,243 @@
+"""
+Claim-check codec
+
+Keeps oversized events out of EventBridge ``Detail`` and Step Functions
+payloads (256 KB each). An event over ``threshold`` bytes is compressed
+and, if still too big to carry inline, written to a blob store; either way
+it is replaced by a compact pointer that keeps the event's short top-level
+fields (``type``, ``callback_id``, ``trigger_id``...) so routing still works
+without resolving it.
+
+:Example:
+
+>>> claims = ClaimCheck(FileStore("/tmp/claims"), threshold=100)
+>>> pointer = claims.encode({"type": "view_submission", "view": {...}})
+>>> pointer["_claim"]
+{'encoding': 'gzip', 'key': 'claims/5d41...', 'bytes': 180512}
+>>> claims.resolve(pointer)["view"]
+{...}
+"""
+
+import base64
+import hashlib
+import json
+import os
+import zlib
+from collections.abc import Mapping
+
+from slackbot.logger import logger
+
+CLAIM_KEY = "_claim"
+THRESHOLD = 192 * 1024
+MAX_SCALAR = 256
+
+# Most each byte of a request body can grow to once its event is serialized:
+# JSON escapes a control character as six (``\u0001``)
+EXPANSION = 6
+
+
+class ClaimError(Exception): ...
+
+
+###############
+#   STORES    #
+###############
+
+
+class FileStore:
+    """
+    Blob store on the local filesystem (tests and local development).
+
+    ``tempfile`` is imported on first use so it stays off the cold-start
+    path of functions using another store.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+
+    def put(self, key, data):
+        import tempfile
+
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.root, key), "rb") as stream:
+                return stream.read()
+        except FileNotFoundError:
+            raise ClaimError(f"Claim not found: {key}")
+
+
+class S3Store:
+    """
+    Blob store in an S3 bucket.
+
+    ``boto3`` is imported on first use so functions that never offload do
+    not pay for it at cold start.
+    """
+
+    def __init__(self, bucket, client=None):
+        self.bucket = bucket
+        self.client = client
+
+    def connect(self):
+        if self.client is None:
+            import boto3
+
+            self.client = boto3.client("s3")
+        return self.client
+
+    def put(self, key, data):
+        self.connect().put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def get(self, key):
+        try:
+            res = self.connect().get_object(Bucket=self.bucket, Key=key)
+        except Exception as err:
+            raise ClaimError(f"Claim not found: {key}") from err
+        return res["Body"].read()
+
+
+def get_store(environ=os.environ):
+    """
+    Get blob store configured by ``CLAIM_CHECK_BUCKET`` or
+    ``CLAIM_CHECK_DIR``, if any.
+    """
+    if bucket := environ.get("CLAIM_CHECK_BUCKET"):
+        return S3Store(bucket)
+    if root := environ.get("CLAIM_CHECK_DIR"):
+        return FileStore(root)
+    return None
+
+
+##############
+#   CODEC    #
+##############
+
+
+class ClaimCheck:
+    """
+    Encode events over ``threshold`` bytes as claim-check pointers.
+
+    Pointers carry the event inline as base64 gzip when that fits under the
+    threshold, otherwise they reference a blob written to ``store`` under a
+    content-addressed key (so retries write the same object). Without a
+    store, events that cannot be made small enough pass through unchanged.
+    """
+
+    def __init__(self, store=None, threshold=THRESHOLD, compress=True, level=6):
+        self.store = store
+        self.threshold = threshold
+        self.compress = compress
+        self.level = level
+
+    def encode(self, event, size=None):
+        """
+        Encode event, returning it unchanged if it is small enough.
+
+        ``size`` is the length in bytes of the request body the event was
+        parsed from, if known. Its serialized JSON is at most ``EXPANSION``
+        times that, so events that can't reach the threshold aren't
+        serialized to check.
+        """
+        if size is not None and size * EXPANSION <= self.threshold:
+            return event
+        data = json.dumps(event, separators=(",", ":")).encode()
+        if len(data) <= self.threshold:
+            return event
+
+        claim = {"encoding": "identity", "bytes": len(data)}
+        if self.compress:
+            data = zlib.compress(data, self.level, wbits=31)
+            claim["encoding"] = "gzip"
+            inline = base64.b64encode(data).decode()
+            if len(inline) <= self.threshold:
+                logger.putMetric("claim_check_inline", 1, "Count")
+                return self.pointer(event, {**claim, "data": inline})
+
+        if self.store is None:
+            logger.warning("EVENT OVER %d BYTES AND NO CLAIM STORE", self.threshold)
+            return event
+        key = f"claims/{hashlib.sha256(data).hexdigest()}"
+        with logger.timer("claim_check_put"):
+            self.store.put(key, data)
+        logger.putMetric("claim_check_offloaded", 1, "Count")
+        return self.pointer(event, {**claim, "key": key})
+
+    def pointer(self, event, claim):
+        fields = {
+            key: value
+            for key, value in event.items()
+            if value is None
+            or isinstance(value, (bool, int, float))
+            or (isinstance(value, str) and len(value) <= MAX_SCALAR)
+        }
+        return {**fields, CLAIM_KEY: claim}
+
+    def decode(self, event):
+        """
+        Get full event from pointer (or the event itself if it is not one).
+        """
+        claim = event.get(CLAIM_KEY) if isinstance(event, Mapping) else None
+        if claim is None:
+            return event
+        if "data" in claim:
+            data = base64.b64decode(claim["data"])
+        elif self.store is None:
+            raise ClaimError("No claim store to resolve event")
+        else:
+            with logger.timer("claim_check_get"):
+                data = self.store.get(claim["key"])
+        if claim.get("encoding") == "gzip":
+            data = zlib.decompress(data, wbits=31)
+        return json.loads(data)
+
+    def resolve(self, event):
+        """
+        Get lazily resolved event from pointer.
+        """
+        claim = event.get(CLAIM_KEY) if isinstance(event, Mapping) else None
+        if claim is None:
+            return event
+        return LazyEvent(event, self.decode)
+
+
+class LazyEvent(Mapping):
+    """
+    Event behind a claim-check pointer, fetched on first access to a field
+    the pointer does not carry.
+    """
+
+    def __init__(self, pointer, decode):
+        self.pointer = pointer
+        self.decoder = decode
+        self.event = None
+
+    @property
+    def resolved(self):
+        return self.event is not None
+
+    def load(self):
+        if self.event is None:
+            self.event = self.decoder(self.pointer)
+        return self.event
+
+    def __getitem__(self, key):
+        if self.event is None and key != CLAIM_KEY and key in self.pointer:
+            return self.pointer[key]
+        return self.load()[key]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __repr__(self):
+        state = "resolved" if self.resolved else "unresolved"
+        return f"<LazyEvent {state} {self.pointer.get('type')!r}>"
@@ -0,0 +1,231 @@
+"""
+HTTPS client
+
+Keeps one connection per host open across warm invocations, bounds every
+request by a deadline and retries transient failures.
+"""
+
+import gzip
+import http.client
+import json
+import random
+import ssl
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+DEADLINE_MARGIN = 0.25
+DEFAULT_TIMEOUT = 10
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class Timeout(Exception):
+    """
+    Request deadline exceeded.
+    """
+
+
+class HTTPError(Exception):
+    """
+    Request failed with an error status.
+    """
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status}")
+        self.response = response
+
+
+class Response:
+    """
+    Decoded HTTP response.
+    """
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    @property
+    def text(self):
+        return self.body.decode()
+
+
+def deadline(context=None, margin=DEADLINE_MARGIN, default=DEFAULT_TIMEOUT):
+    """
+    Get ``time.monotonic()`` deadline from Lambda runtime context.
+
+    A ``margin`` is held back so there is time to handle a timeout before
+    the Lambda itself is killed.
+
+    :Example:
+
+    >>> client.post(path, data, headers, deadline=deadline(context))
+    """
+    try:
+        remaining = context.get_remaining_time_in_millis() / 1000
+    except AttributeError:
+        remaining = default
+    return time.monotonic() + remaining - margin
+
+
+def retry_after(value, now=None):
+    """
+    Parse ``Retry-After`` header (delay-seconds or HTTP-date) as seconds.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - (now or time.time()))
+
+
+def decode(body, encoding=None):
+    """
+    Decode ``gzip`` or ``deflate`` content.
+    """
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    return body
+
+
+class Client:
+    """
+    Persistent keep-alive HTTP(S) client for a single host.
+
+    Connections dropped by the server while idle are re-opened transparently.
+    Connection errors and ``statuses`` (``429``/``5xx``) are retried up to
+    ``retries`` times with jittered exponential backoff (or the server's
+    ``Retry-After``), as long as the wait fits before the deadline.
+
+    :Example:
+
+    >>> slack = Client("https://slack.com")
+    >>> slack.post("/api/oauth.v2.access", data, headers, deadline=deadline(context))
+    """
+
+    def __init__(
+        self,
+        url,
+        *,
+        retries=2,
+        backoff=0.1,
+        max_backoff=1.0,
+        context=None,
+        sleep=time.sleep,
+        statuses=RETRY_STATUSES,
+    ):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.context = context
+        self.sleep = sleep
+        self.statuses = statuses
+        self.connection = None
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def connect(self, timeout):
+        """
+        Get open connection (or open a new one) with ``timeout``.
+        """
+        if self.connection is None:
+            if self.scheme == "https":
+                self.context = self.context or ssl.create_default_context()
+                self.connection = http.client.HTTPSConnection(
+                    self.host, self.port, timeout=timeout, context=self.context
+                )
+            else:
+                self.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=timeout
+                )
+            self.connections += 1
+        self.connection.timeout = timeout
+        if self.connection.sock:
+            self.connection.sock.settimeout(timeout)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def get(self, path, headers=None, deadline=None):
+        return self.request("GET", path, None, headers, deadline)
+
+    def post(self, path, body=None, headers=None, deadline=None):
+        return self.request("POST", path, body, headers, deadline)
+
+    def request(self, method, path, body=None, headers=None, deadline=None):
+        """
+        Send request and return decoded ``Response``.
+
+        Raises ``Timeout`` if the deadline passes and ``HTTPError`` if the
+        final response has an error status.
+        """
+        deadline = deadline or time.monotonic() + DEFAULT_TIMEOUT
+        headers = {"accept-encoding": "gzip", **(headers or {})}
+        attempt = 0
+        with self.lock:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Timeout(f"{method} {path} deadline exceeded")
+                reused = self.connection is not None
+                try:
+                    conn = self.connect(remaining)
+                    conn.request(method, path, body, headers)
+                    res = conn.getresponse()
+                    data = res.read()
+                except TimeoutError as err:
+                    self.close()
+                    raise Timeout(f"{method} {path} timed out") from err
+                except (http.client.HTTPException, OSError):
+                    self.close()
+                    if reused:
+                        continue
+                    if attempt >= self.retries or not self.pause(attempt, deadline):
+                        raise
+                    attempt += 1
+                    continue
+
+                if res.will_close:
+                    self.close()
+                encoding = res.getheader("content-encoding")
+                response = Response(res.status, res.headers, decode(data, encoding))
+                if res.status in self.statuses and attempt < self.retries:
+                    delay = retry_after(res.getheader("retry-after"))
+                    if self.pause(attempt, deadline, delay):
+                        attempt += 1
+                        continue
+                if res.status >= 400:
+                    raise HTTPError(response)
+                return response
+
+    def pause(self, attempt, deadline, delay=None):
+        """
+        Sleep before retrying, unless the wait would pass the deadline.
+        """
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+        if time.monotonic() + delay >= deadline:
+            return False
+        self.sleep(delay)
+        return True
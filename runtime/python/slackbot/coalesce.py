@@ -0,0 +1,411 @@
+"""
+Message-update coalescing
+
+Users clicking quickly through a menu or buttons trigger one
+``replace_original`` update per click, most of which are overtaken before
+Slack shows them. Updates to the same message are debounced for a short
+window and only the latest is sent; the rest are dropped without a
+request, saving rate-limit budget.
+
+Each update has a version (the action's ``action_ts``). The shared store
+only ever moves a message's version forward, and sends are leased one at
+a time per message and must be newer than the last one sent, so a stale
+update can never overwrite a newer one.
+
+Debouncing only pays off when the clicks it coalesces see the same state.
+A Lambda instance handles one invocation at a time, so the in-memory store
+never sees two clicks at once. Without a shared store the window defaults
+to 0, so updates are not delayed for nothing.
+
+:Example:
+
+>>> coalescer = Coalescer(get_store())
+>>> coalescer.send(update_key(event), version_of(event), post)
+True
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from slackbot.logger import logger
+
+WINDOW = 0.25
+LEASE = 10.0
+TTL = 3600
+MAXSIZE = 4096
+
+# Attributes of a key's item in the DynamoDB store
+ATTRIBUTES = ("version", "sent", "lease", "holder", "expires")
+
+
+def update_key(event):
+    """
+    Get key of the message an interaction updates: its channel and message
+    ``ts`` if it has them, otherwise its ``response_url``.
+    """
+    container = event.get("container") or {}
+    channel = container.get("channel_id") or (event.get("channel") or {}).get("id")
+    ts = container.get("message_ts") or (event.get("message") or {}).get("ts")
+    if channel and ts:
+        return f"message:{channel}:{ts}"
+    return f"response_url:{event.get('response_url')}"
+
+
+def version_of(event, clock=time.time):
+    """
+    Get version of an interaction's update: its first action's ``action_ts``
+    if it has one, otherwise the current time.
+    """
+    actions = event.get("actions") or [{}]
+    try:
+        return float(actions[0]["action_ts"])
+    except (KeyError, TypeError, ValueError):
+        return clock()
+
+
+class Store:
+    """
+    Coalescing state store interface.
+
+    Each key holds the latest ``version`` offered, the last version
+    ``sent`` and the send ``lease`` (expiry and holder). Subclasses
+    implement each step atomically, and set ``shared`` if their state is
+    seen by more than one process.
+    """
+
+    shared = False
+
+    def offer(self, key, version, expires):
+        """
+        Record ``version`` as the latest if it is newer; return ``True`` if
+        it was.
+        """
+        raise NotImplementedError
+
+    def latest(self, key):
+        """
+        Get latest version offered.
+        """
+        raise NotImplementedError
+
+    def acquire(self, key, version, until, now):
+        """
+        Lease the send of ``version`` until ``until`` if it is the latest,
+        newer than the last sent and no other send is leased.
+        """
+        raise NotImplementedError
+
+    def release(self, key, version, sent):
+        """
+        End lease of ``version``, marking it sent if ``sent``.
+        """
+        raise NotImplementedError
+
+    def wait(self, key, timeout):
+        """
+        Wait up to ``timeout`` seconds for the lease of ``key`` to end.
+        """
+        time.sleep(timeout)
+
+
+class MemoryStore(Store):
+    """
+    In-memory LRU of keys, per process.
+    """
+
+    def __init__(self, maxsize=MAXSIZE):
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)
+
+    def offer(self, key, version, expires):
+        with self.lock:
+            record = self.keys.get(key)
+            if record is None:
+                record = {"version": version, "sent": 0, "lease": 0, "holder": None}
+                self.keys[key] = record
+            elif record["version"] >= version:
+                return False
+            record.update(version=version, expires=expires)
+            self.keys.move_to_end(key)
+            while len(self.keys) > self.maxsize:
+                self.keys.popitem(last=False)
+            return True
+
+    def latest(self, key):
+        with self.lock:
+            record = self.keys.get(key)
+            return None if record is None else record["version"]
+
+    def acquire(self, key, version, until, now):
+        with self.lock:
+            record = self.keys.get(key)
+            if (
+                record is None
+                or record["version"] != version
+                or record["sent"] >= version
+                or record["lease"] > now
+            ):
+                return False
+            record.update(lease=until, holder=version)
+            return True
+
+    def release(self, key, version, sent):
+        with self.lock:
+            record = self.keys.get(key)
+            if record is None or record["holder"] != version:
+                return
+            if sent:
+                record["sent"] = max(record["sent"], version)
+            record.update(lease=0, holder=None)
+            self.released.notify_all()
+
+    def wait(self, key, timeout):
+        with self.lock:
+            record = self.keys.get(key)
+            if record is not None and record["holder"] is not None:
+                self.released.wait(timeout)
+
+
+class SQLiteStore(Store):
+    """
+    SQLite state store, shared by processes on one host.
+
+    ``sqlite3`` is imported on first use so it stays off the cold-start path
+    of functions using the in-memory store.
+    """
+
+    shared = True
+
+    def __init__(self, path=":memory:"):
+        import sqlite3
+
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS coalesce ("
+            "key TEXT PRIMARY KEY, "
+            "version REAL NOT NULL, "
+            "sent REAL NOT NULL DEFAULT 0, "
+            "lease REAL NOT NULL DEFAULT 0, "
+            "holder REAL, "
+            "expires REAL NOT NULL)"
+        )
+
+    def execute(self, sql, params):
+        with self.lock:
+            return self.db.execute(sql, params)
+
+    def offer(self, key, version, expires):
+        cursor = self.execute(
+            "INSERT INTO coalesce (key, version, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE "
+            "SET version = excluded.version, expires = excluded.expires "
+            "WHERE coalesce.version < excluded.version",
+            (key, version, expires),
+        )
+        return cursor.rowcount == 1
+
+    def latest(self, key):
+        cursor = self.execute("SELECT version FROM coalesce WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def acquire(self, key, version, until, now):
+        cursor = self.execute(
+            "UPDATE coalesce SET lease = ?, holder = ? "
+            "WHERE key = ? AND version = ? AND sent < ? AND lease <= ?",
+            (until, version, key, version, version, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key, version, sent):
+        self.execute(
+            "UPDATE coalesce SET lease = 0, holder = NULL, "
+            "sent = CASE WHEN ? THEN MAX(sent, holder) ELSE sent END "
+            "WHERE key = ? AND holder = ?",
+            (sent, key, version),
+        )
+
+    def purge(self, now=None):
+        """
+        Delete expired keys.
+        """
+        now = time.time() if now is None else now
+        self.execute("DELETE FROM coalesce WHERE expires <= ?", (now,))
+
+
+class DynamoDBStore(Store):
+    """
+    DynamoDB state store, shared by every instance.
+
+    Each step is a single conditional ``UpdateItem``, so instances never
+    hold a lock between requests. The table's partition key is the string
+    attribute ``key``; enable TTL on the numeric ``expires`` attribute to
+    have old keys removed.
+    """
+
+    shared = True
+
+    def __init__(self, table_name, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("dynamodb")
+        self.table_name = table_name
+        self.client = client
+
+    def update(self, key, expression, condition, values):
+        names = {
+            f"#{name}": name
+            for name in ATTRIBUTES
+            if f"#{name}" in expression or f"#{name}" in condition
+        }
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"key": {"S": key}},
+                UpdateExpression=expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues={
+                    name: {"N": str(value)} for name, value in values.items()
+                },
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def offer(self, key, version, expires):
+        return self.update(
+            key,
+            "SET #version = :version, #expires = :expires, "
+            "#sent = if_not_exists(#sent, :zero), "
+            "#lease = if_not_exists(#lease, :zero)",
+            "attribute_not_exists(#version) OR #version < :version",
+            {":version": version, ":expires": int(expires), ":zero": 0},
+        )
+
+    def latest(self, key):
+        res = self.client.get_item(
+            TableName=self.table_name,
+            Key={"key": {"S": key}},
+            ProjectionExpression="#version",
+            ExpressionAttributeNames={"#version": "version"},
+            ConsistentRead=True,
+        )
+        item = res.get("Item")
+        return None if item is None else float(item["version"]["N"])
+
+    def acquire(self, key, version, until, now):
+        return self.update(
+            key,
+            "SET #lease = :until, #holder = :version",
+            "#version = :version AND #sent < :version AND #lease <= :now",
+            {":version": version, ":until": until, ":now": now},
+        )
+
+    def release(self, key, version, sent):
+        # A lease is only acquired for a version newer than the last sent,
+        # so marking it sent can only move ``sent`` forward
+        expression = "SET #lease = :zero"
+        if sent:
+            expression += ", #sent = :version"
+        self.update(
+            key,
+            f"{expression} REMOVE #holder",
+            "#holder = :version",
+            {":version": version, ":zero": 0},
+        )
+
+
+def get_store(environ=None):
+    """
+    Get coalescing store configured by the environment.
+
+    ``COALESCE_TABLE`` selects a DynamoDB table, shared by every instance,
+    and ``COALESCE_DB`` an SQLite database, shared by processes on one
+    host. Otherwise state is only kept in memory, which only coalesces
+    updates handled concurrently by one long-lived process.
+    """
+    environ = os.environ if environ is None else environ
+    if environ.get("COALESCE_TABLE"):
+        return DynamoDBStore(environ["COALESCE_TABLE"])
+    if environ.get("COALESCE_DB"):
+        return SQLiteStore(environ["COALESCE_DB"])
+    return MemoryStore()
+
+
+class Coalescer:
+    """
+    Send only the latest of the updates to a key offered within ``window``
+    seconds of each other.
+
+    Each ``send()`` records the ``update_coalesced`` metric (1 if the update
+    was dropped, 0 if it was sent). A ``window`` of 0 sends at once, still
+    dropping updates older than one already sent. It defaults to ``WINDOW``
+    for a shared store and 0 otherwise.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        window=None,
+        lease=LEASE,
+        ttl=TTL,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.store = store if store is not None else MemoryStore()
+        if window is None:
+            window = WINDOW if self.store.shared else 0
+        self.window = window
+        self.lease = lease
+        self.ttl = ttl
+        self.clock = clock
+        self.sleep = sleep
+
+    def send(self, key, version, func, deadline=None):
+        """
+        Call ``func`` to send update ``version`` of ``key``, unless a newer
+        update is offered before the window closes (or before ``deadline``,
+        a ``time.monotonic()`` value, while another send is in flight).
+
+        Returns ``True`` if the update was sent.
+        """
+        sent = self.offer(key, version) and self.wait(key, version, func, deadline)
+        logger.putMetric("update_coalesced", 0 if sent else 1, "Count")
+        return sent
+
+    def offer(self, key, version):
+        return self.store.offer(key, version, self.clock() + self.ttl)
+
+    def wait(self, key, version, func, deadline):
+        delay = self.window
+        while True:
+            if delay > 0:
+                self.sleep(delay)
+            if self.store.latest(key) != version:
+                return False
+            now = self.clock()
+            if self.store.acquire(key, version, now + self.lease, now):
+                break
+            # Another send is in flight
+            timeout = max(self.window / 4, 0.01)
+            if deadline is not None and time.monotonic() + timeout >= deadline:
+                logger.warning("UPDATE %s GAVE UP WAITING ON SEND", key)
+                return False
+            self.store.wait(key, timeout)
+            delay = 0
+        sent = False
+        try:
+            func()
+            sent = True
+        finally:
+            self.store.release(key, version, sent)
+        return sent
@@ -0,0 +1,257 @@
+"""
+Request idempotency
+
+Slack retries Events API deliveries (``X-Slack-Retry-Num``) that aren't
+acknowledged within 3 seconds, with the same ``event_id``. Claiming a key
+for each verified request before it is published lets retries be acked at
+once instead of re-running every downstream rule.
+
+Claims are two-phase. A key is first claimed as pending, for only
+``PENDING_TTL`` seconds, and committed for the full ``ttl`` once the event
+has been published. If publishing fails the claim is released (or simply
+expires), so Slack's next retry is published rather than acked and lost.
+
+:Example:
+
+>>> seen = Idempotency(get_store())
+>>> key = request_key(event, signature, ts)
+>>> seen.claim(key)
+>>> seen.claim(key)
+Traceback (most recent call last):
+  ...
+slackbot.idempotency.Duplicate: event:Ev0123456789
+>>> seen.commit(key)  # after PutEvents succeeds, or
+>>> seen.release(key)  # after it fails
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from slackbot.logger import logger
+
+TTL = 3600
+PENDING_TTL = 30
+MAXSIZE = 4096
+
+
+class Duplicate(Exception): ...
+
+
+def request_key(event, signature, ts):
+    """
+    Get idempotency key of request: the Events API ``event_id`` if it has
+    one, otherwise its signature and timestamp.
+    """
+    event_id = event.get("event_id") if isinstance(event, dict) else None
+    if event_id:
+        return f"event:{event_id}"
+    return f"request:{ts}:{signature}"
+
+
+class Store:
+    """
+    Idempotency key store interface.
+
+    Subclasses implement ``add()``, which records ``key`` until ``expires``
+    (epoch seconds) and returns ``False`` if it was already recorded and
+    hasn't expired, ``commit()``, which extends a recorded key to a new
+    ``expires``, and ``delete()``.
+    """
+
+    def add(self, key, expires, now):
+        raise NotImplementedError
+
+    def commit(self, key, expires):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryStore(Store):
+    """
+    In-memory LRU of keys, per warm instance.
+    """
+
+    def __init__(self, maxsize=MAXSIZE):
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, key, expires, now):
+        with self.lock:
+            if self.keys.get(key, 0) > now:
+                self.keys.move_to_end(key)
+                return False
+            self.keys[key] = expires
+            self.keys.move_to_end(key)
+            while len(self.keys) > self.maxsize:
+                self.keys.popitem(last=False)
+            return True
+
+    def commit(self, key, expires):
+        with self.lock:
+            if key in self.keys:
+                self.keys[key] = expires
+
+    def delete(self, key):
+        with self.lock:
+            self.keys.pop(key, None)
+
+
+class SQLiteStore(Store):
+    """
+    SQLite key store, shared by processes on one host.
+
+    ``sqlite3`` is imported on first use so it stays off the cold-start path
+    of functions using another store.
+    """
+
+    def __init__(self, path=":memory:"):
+        import sqlite3
+
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency "
+            "(key TEXT PRIMARY KEY, expires REAL NOT NULL)"
+        )
+
+    def add(self, key, expires, now):
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO idempotency (key, expires) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET expires = excluded.expires "
+                "WHERE idempotency.expires <= ?",
+                (key, expires, now),
+            )
+            return cursor.rowcount == 1
+
+    def commit(self, key, expires):
+        with self.lock:
+            self.db.execute(
+                "UPDATE idempotency SET expires = ? WHERE key = ?", (expires, key)
+            )
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+    def purge(self, now=None):
+        """
+        Delete expired keys.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.db.execute("DELETE FROM idempotency WHERE expires <= ?", (now,))
+
+
+class DynamoDBStore(Store):
+    """
+    DynamoDB key store, shared by every instance.
+
+    The table's partition key is the string attribute ``key``; enable TTL
+    on the numeric ``expires`` attribute to have old keys removed.
+    """
+
+    def __init__(self, table_name, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("dynamodb")
+        self.table_name = table_name
+        self.client = client
+
+    def add(self, key, expires, now):
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={"key": {"S": key}, "expires": {"N": str(int(expires))}},
+                ConditionExpression="attribute_not_exists(#k) OR #e <= :now",
+                ExpressionAttributeNames={"#k": "key", "#e": "expires"},
+                ExpressionAttributeValues={":now": {"N": str(int(now))}},
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def commit(self, key, expires):
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"key": {"S": key}},
+                UpdateExpression="SET #e = :expires",
+                ConditionExpression="attribute_exists(#k)",
+                ExpressionAttributeNames={"#k": "key", "#e": "expires"},
+                ExpressionAttributeValues={":expires": {"N": str(int(expires))}},
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def delete(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={"key": {"S": key}})
+
+
+def get_store(environ=None):
+    """
+    Get idempotency store configured by the environment.
+
+    ``IDEMPOTENCY_TABLE`` selects a DynamoDB table and ``IDEMPOTENCY_DB`` an
+    SQLite database. Otherwise keys are only kept in memory.
+    """
+    environ = os.environ if environ is None else environ
+    if environ.get("IDEMPOTENCY_TABLE"):
+        return DynamoDBStore(environ["IDEMPOTENCY_TABLE"])
+    if environ.get("IDEMPOTENCY_DB"):
+        return SQLiteStore(environ["IDEMPOTENCY_DB"])
+    return MemoryStore()
+
+
+class Idempotency:
+    """
+    Claim request keys, pending for ``pending`` seconds until committed for
+    ``ttl`` seconds.
+
+    Keys already claimed (pending or committed) raise ``Duplicate``. Each
+    claim records the ``dedupe_hit`` metric (1 for a duplicate, 0
+    otherwise), so its average is the dedupe hit rate. If the store fails
+    the request is let through: a duplicate is cheaper than a dropped
+    event.
+    """
+
+    def __init__(self, store=None, ttl=TTL, pending=PENDING_TTL, clock=time.time):
+        self.store = store if store is not None else MemoryStore()
+        self.ttl = ttl
+        self.pending = pending
+        self.clock = clock
+
+    def claim(self, key):
+        now = self.clock()
+        try:
+            added = self.store.add(key, now + self.pending, now)
+        except Exception:  # noqa: BLE001
+            logger.exception("IDEMPOTENCY STORE FAILED")
+            added = True
+        logger.putMetric("dedupe_hit", 0 if added else 1, "Count")
+        if not added:
+            raise Duplicate(key)
+
+    def commit(self, key):
+        """
+        Keep claimed key for ``ttl`` seconds, once its event is published.
+        """
+        try:
+            self.store.commit(key, self.clock() + self.ttl)
+        except Exception:  # noqa: BLE001
+            logger.exception("IDEMPOTENCY COMMIT FAILED")
+
+    def release(self, key):
+        """
+        Drop claimed key, so a retry of its unpublished event is let through.
+        """
+        try:
+            self.store.delete(key)
+        except Exception:  # noqa: BLE001
+            logger.exception("IDEMPOTENCY RELEASE FAILED")
@@ -0,0 +1,305 @@
+"""
+Installations
+
+Persists the workspaces (and Enterprise Grid organizations) the app is
+installed to and looks up their bot tokens.
+
+:Example:
+
+>>> store = get_store()
+>>> store.put(Installation.from_oauth(result))
+>>> store.token(team_id="T0123456789")
+'xoxb-...'
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import UTC, datetime
+
+CACHE_MAXSIZE = 1024
+CACHE_TTL = 300
+CACHE_NEGATIVE_TTL = 30
+
+
+def key(team_id=None, enterprise_id=None):
+    """
+    Get store key for workspace or organization.
+    """
+    return f"{enterprise_id or '-'}:{team_id or '-'}"
+
+
+class Installation:
+    """
+    App installation to a workspace, or organization-wide to an enterprise.
+    """
+
+    def __init__(
+        self,
+        team_id=None,
+        enterprise_id=None,
+        bot_token=None,
+        bot_user_id=None,
+        app_id=None,
+        scopes=(),
+        installed_at=None,
+    ):
+        self.team_id = team_id
+        self.enterprise_id = enterprise_id
+        self.bot_token = bot_token
+        self.bot_user_id = bot_user_id
+        self.app_id = app_id
+        self.scopes = list(scopes)
+        self.installed_at = installed_at or datetime.now(UTC).isoformat()
+
+    def __eq__(self, other):
+        return isinstance(other, Installation) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"<Installation {self.key}>"
+
+    @property
+    def key(self):
+        return key(self.team_id, self.enterprise_id)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def from_oauth(cls, result):
+        """
+        Get installation from ``oauth.v2.access`` result.
+        """
+        team = result.get("team") or {}
+        enterprise = result.get("enterprise") or {}
+        scope = result.get("scope") or ""
+        return cls(
+            team_id=None if result.get("is_enterprise_install") else team.get("id"),
+            enterprise_id=enterprise.get("id"),
+            bot_token=result.get("access_token"),
+            bot_user_id=result.get("bot_user_id"),
+            app_id=result.get("app_id"),
+            scopes=[x for x in scope.split(",") if x],
+        )
+
+    def to_dict(self):
+        return {
+            "team_id": self.team_id,
+            "enterprise_id": self.enterprise_id,
+            "bot_token": self.bot_token,
+            "bot_user_id": self.bot_user_id,
+            "app_id": self.app_id,
+            "scopes": self.scopes,
+            "installed_at": self.installed_at,
+        }
+
+
+class Store:
+    """
+    Installation store interface.
+
+    Subclasses implement ``get()``, ``put()`` and ``delete()``.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, installation):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def find(self, team_id=None, enterprise_id=None):
+        """
+        Find installation for a workspace, falling back to an installation
+        across its whole organization.
+        """
+        keys = [key(team_id, enterprise_id)]
+        if team_id and enterprise_id:
+            keys.append(key(None, enterprise_id))
+        for k in keys:
+            installation = self.get(k)
+            if installation is not None:
+                return installation
+        return None
+
+    def token(self, team_id=None, enterprise_id=None):
+        """
+        Get bot token for a workspace, or ``None`` if the app isn't installed.
+        """
+        installation = self.find(team_id, enterprise_id)
+        return installation.bot_token if installation else None
+
+
+class MemoryStore(Store):
+    """
+    In-memory installation store.
+    """
+
+    def __init__(self):
+        self.installations = {}
+
+    def get(self, key):
+        return self.installations.get(key)
+
+    def put(self, installation):
+        self.installations[installation.key] = installation
+
+    def delete(self, key):
+        self.installations.pop(key, None)
+
+
+class SQLiteStore(Store):
+    """
+    SQLite installation store, for local development and tests.
+
+    ``sqlite3`` is imported on first use so it stays off the cold-start path
+    of functions using another store.
+    """
+
+    def __init__(self, path=":memory:"):
+        import sqlite3
+
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS installations "
+            "(key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data FROM installations WHERE key = ?", (key,)
+            ).fetchone()
+        return Installation.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, installation):
+        data = json.dumps(installation.to_dict())
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO installations (key, data) VALUES (?, ?)",
+                (installation.key, data),
+            )
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM installations WHERE key = ?", (key,))
+
+
+class DynamoDBStore(Store):
+    """
+    DynamoDB installation store.
+
+    The table's partition key is the string attribute ``key``.
+    """
+
+    def __init__(self, table_name, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("dynamodb")
+        self.table_name = table_name
+        self.client = client
+
+    def get(self, key):
+        res = self.client.get_item(TableName=self.table_name, Key={"key": {"S": key}})
+        item = res.get("Item")
+        return Installation.from_dict(json.loads(item["data"]["S"])) if item else None
+
+    def put(self, installation):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "key": {"S": installation.key},
+                "data": {"S": json.dumps(installation.to_dict())},
+            },
+        )
+
+    def delete(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={"key": {"S": key}})
+
+
+class CachedStore(Store):
+    """
+    In-process TTL cache in front of another store.
+
+    Misses are cached too (for ``negative_ttl``), so events from workspaces
+    without an installation don't hit the backing store every time.
+    """
+
+    def __init__(
+        self,
+        store,
+        ttl=CACHE_TTL,
+        negative_ttl=CACHE_NEGATIVE_TTL,
+        maxsize=CACHE_MAXSIZE,
+        clock=time.monotonic,
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = self.clock()
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        installation = self.store.get(key)
+        self.cache_put(key, installation, now)
+        return installation
+
+    def put(self, installation):
+        self.store.put(installation)
+        self.cache_put(installation.key, installation, self.clock())
+
+    def delete(self, key):
+        self.store.delete(key)
+        self.invalidate(key)
+
+    def invalidate(self, key=None):
+        """
+        Drop ``key`` (or everything) from the cache.
+        """
+        with self.lock:
+            if key is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(key, None)
+
+    def cache_put(self, key, installation, now):
+        ttl = self.negative_ttl if installation is None else self.ttl
+        with self.lock:
+            self.cache.pop(key, None)
+            if len(self.cache) >= self.maxsize:
+                self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+                while len(self.cache) >= self.maxsize:
+                    del self.cache[next(iter(self.cache))]
+            self.cache[key] = (now + ttl, installation)
+
+
+def get_store(environ=None):
+    """
+    Get installation store configured by the environment.
+
+    ``INSTALLATIONS_TABLE`` selects a DynamoDB table and ``INSTALLATIONS_DB``
+    an SQLite database, either behind a ``CachedStore`` holding lookups for
+    ``INSTALLATIONS_CACHE_SECONDS`` (0 disables it). Otherwise installations
+    are only kept in memory.
+    """
+    environ = os.environ if environ is None else environ
+    if environ.get("INSTALLATIONS_TABLE"):
+        store = DynamoDBStore(environ["INSTALLATIONS_TABLE"])
+    elif environ.get("INSTALLATIONS_DB"):
+        store = SQLiteStore(environ["INSTALLATIONS_DB"])
+    else:
+        return MemoryStore()
+    ttl = float(environ.get("INSTALLATIONS_CACHE_SECONDS") or CACHE_TTL)
+    return CachedStore(store, ttl=ttl) if ttl > 0 else store
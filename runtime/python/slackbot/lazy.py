@@ -0,0 +1,161 @@
+"""
+Ack-then-defer execution
+
+Slack gives an interaction three seconds to be acknowledged, and the API
+Gateway integration waits for the responder. Slow work is handed to a
+named lazy function instead: the handler acks at once and the function
+runs in a separate, asynchronous invocation that replies via
+``response_url``.
+
+:Example:
+
+>>> lazy = Lazy(get_queue())
+>>> @lazy("respond")
+... def respond(event, context=None): ...
+>>> @lazy.handler
+... def handler(event, context=None):
+...     return lazy.ack({"statusCode": 200}, "respond", event)
+"""
+
+import functools
+import json
+import os
+
+from slackbot.logger import logger
+
+LAZY_KEY = "_lazy"
+
+
+class Queue:
+    """
+    Base queue interface for deferred messages.
+    """
+
+    def send(self, name, event):
+        raise NotImplementedError
+
+    @staticmethod
+    def message(name, event):
+        """
+        Get message deferring ``event`` to lazy function ``name``, carrying
+        the trace of the invocation that deferred it.
+        """
+        return logger.inject({LAZY_KEY: name, "event": event})
+
+
+class MemoryQueue(Queue):
+    """
+    In-memory stand-in queue; messages run when the ``Lazy`` is flushed.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, name, event):
+        self.messages.append(self.message(name, event))
+
+
+class LambdaQueue(Queue):
+    """
+    Defer by invoking a Lambda function (usually this one) asynchronously.
+
+    The client is created up front, during the function's init phase (and
+    so captured by a SnapStart snapshot), rather than on the first ack,
+    where importing ``boto3`` would count against the 3 second deadline.
+    """
+
+    def __init__(self, function_name, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("lambda")
+        self.function_name = function_name
+        self.client = client
+
+    def send(self, name, event):
+        self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType="Event",
+            Payload=json.dumps(self.message(name, event)).encode(),
+        )
+
+
+class Lazy:
+    """
+    Registry of lazy functions and the queue that defers them.
+    """
+
+    def __init__(self, queue=None):
+        self.queue = queue or MemoryQueue()
+        self.functions = {}
+
+    def __call__(self, name):
+        """
+        Register lazy function under ``name``.
+        """
+
+        def register(fn):
+            self.functions[name] = fn
+            return fn
+
+        return register
+
+    def defer(self, name, event):
+        """
+        Send ``event`` to lazy function ``name`` via the queue.
+        """
+        if name not in self.functions:
+            raise KeyError(f"Unknown lazy function: {name}")
+        self.queue.send(name, event)
+
+    def ack(self, response, name, event):
+        """
+        Defer ``event`` to lazy function ``name`` and return ``response``.
+        """
+        self.defer(name, event)
+        return response
+
+    def run(self, message, context=None):
+        """
+        Run lazy function for deferred ``message``.
+        """
+        return self.functions[message[LAZY_KEY]](message["event"], context)
+
+    def flush(self, context=None):
+        """
+        Run messages held by a ``MemoryQueue``, in order.
+        """
+        results = []
+        while self.queue.messages:
+            results.append(self.run(self.queue.messages.pop(0), context))
+        return results
+
+    def handler(self, fn):
+        """
+        Wrap Lambda handler so deferred messages run their lazy function.
+        """
+
+        @functools.wraps(fn)
+        def wrapper(event, context=None):
+            if isinstance(event, dict) and LAZY_KEY in event:
+                return self.run(event, context)
+            return fn(event, context)
+
+        return wrapper
+
+
+def get_queue(environ=None):
+    """
+    Get queue configured by the environment.
+
+    Inside Lambda, lazy functions are deferred to an asynchronous invocation
+    of ``LAZY_FUNCTION_NAME`` (this function by default). Otherwise they are
+    held in memory.
+    """
+    environ = os.environ if environ is None else environ
+    function_name = environ.get("LAZY_FUNCTION_NAME") or environ.get(
+        "AWS_LAMBDA_FUNCTION_NAME"
+    )
+    if function_name:
+        return LambdaQueue(function_name)
+    return MemoryQueue()
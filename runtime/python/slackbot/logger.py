@@ -0,0 +1,652 @@
+"""
+Logger
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from slackbot.trace import Span
+
+LOG_FORMAT = "%(levelname)s %(awsRequestId)s %(correlationId)s %(message)s"
+LOG_LEVEL = logging.INFO
+LOG_NAME = "slackbot"
+LOG_PAYLOAD_MAX_BYTES = 8192
+LOG_REDACT = {"access_token", "client_secret", "refresh_token", "token"}
+LOG_SAMPLE_RATE = 1.0
+METRICS_NAMESPACE = "slackbot"
+TRACE_SPANS = True
+
+# inspect.CO_COROUTINE
+CO_COROUTINE = 0x80
+
+REDACTED = "[REDACTED]"
+
+
+def iscoroutinefunction(func):
+    """
+    Check for an ``async def`` function (or method) by its code flags, like
+    ``inspect.iscoroutinefunction()`` without the cost of importing
+    ``inspect`` on every cold start.
+    """
+    code = getattr(getattr(func, "__func__", func), "__code__", None)
+    return code is not None and bool(code.co_flags & CO_COROUTINE)
+
+
+class SuppressFilter(logging.Filter):
+    """
+    Suppress Log Records from registered logger
+
+    Taken from ``aws_lambda_powertools.logging.filters.SuppressFilter``
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def filter(self, record):
+        logger = record.name
+        return self.logger not in logger
+
+
+class Payload:
+    """
+    Lazily serialized log payload.
+
+    Serialization, redaction and truncation are deferred until a handler
+    actually formats the record, so payloads logged below the logger's level
+    cost nothing.
+
+    :Example:
+
+    >>> logger.info("EVENT %s", Payload(event, max_bytes=1024, redact={"token"}))
+    """
+
+    __slots__ = ("_text", "max_bytes", "obj", "redact", "truncated")
+
+    def __init__(self, obj, max_bytes=None, redact=None):
+        self.obj = obj
+        self.max_bytes = max_bytes
+        self.redact = redact or set()
+        self.truncated = False
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            obj = self.obj
+            if isinstance(obj, dict) and not self.redact.isdisjoint(obj):
+                obj = {k: REDACTED if k in self.redact else v for k, v in obj.items()}
+            text = json.dumps(obj, default=str)
+            needles, scalar, nested, escaped = redaction(frozenset(self.redact))
+            found = any(x in text for x in needles)
+            if (found and nested.search(text)) or any(x in text for x in escaped):
+                text = json.dumps(redacted(obj, self.redact), default=str)
+            elif found:
+                text = scalar.sub(rf'\1: "{REDACTED}"', text)
+            if self.max_bytes:
+                text = self.truncate(text)
+            self._text = text
+        return self._text
+
+    def truncate(self, text):
+        """
+        Cut text to ``max_bytes`` encoded bytes, on a character boundary.
+        """
+        data = text.encode()
+        if len(data) <= self.max_bytes:
+            return text
+        head = data[: self.max_bytes].decode(errors="ignore")
+        dropped = len(data) - len(head.encode())
+        self.truncated = True
+        return f"{head}…[truncated {dropped} bytes]"
+
+
+@functools.cache
+def redaction(keys):
+    """
+    Compile patterns matching encoded ``"key": value`` pairs for ``keys``.
+
+    Nested scalar values are redacted in the encoded text, which is much
+    cheaper than copying the object, and only once one of the ``needles``
+    occurs. Objects and arrays can't be matched by a regular expression, so
+    the ``nested`` pattern tells when to fall back on ``redacted()``, as do
+    the ``escaped`` needles, found in JSON documents encoded as strings.
+    """
+    needles = [f"{json.dumps(str(x))}: " for x in sorted(keys)]
+    escaped = [json.dumps(json.dumps(str(x)))[1:-1] for x in sorted(keys)]
+    names = "|".join(re.escape(x[:-2]) for x in needles)
+    scalar = re.compile(rf'({names}): (?:"[^"\\]*(?:\\.[^"\\]*)*"|[-+.\w]+)')
+    nested = re.compile(rf"(?:{names}): [\[{{]")
+    return needles, scalar, nested, escaped
+
+
+def redacted(obj, keys):
+    """
+    Copy ``obj`` with the values of any ``keys`` replaced at every depth,
+    including inside strings holding JSON documents.
+    """
+    if not keys:
+        return obj
+    if isinstance(obj, dict):
+        return {k: REDACTED if k in keys else redacted(v, keys) for k, v in obj.items()}
+    if isinstance(obj, list | tuple):
+        return [redacted(x, keys) for x in obj]
+    if (
+        isinstance(obj, str)
+        and obj[:1] in ("{", "[")
+        and any(json.dumps(str(x)) in obj for x in keys)
+    ):
+        try:
+            document = json.loads(obj)
+        except ValueError:
+            return obj
+        return json.dumps(redacted(document, keys), default=str)
+    return obj
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format log records as single-line JSON objects.
+
+    ``Payload`` arguments are emitted as structured ``payload`` fields rather
+    than being interpolated into the message.
+    """
+
+    def format(self, record):
+        args = record.args if isinstance(record.args, tuple) else ()
+        payloads = [x for x in args if isinstance(x, Payload)]
+        if payloads:
+            args = tuple("" if isinstance(x, Payload) else x for x in args)
+            message = (record.msg % args).strip()
+        else:
+            message = record.getMessage()
+        request_id = getattr(record, "awsRequestId", "-")
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "requestId": request_id.removeprefix("RequestId: "),
+            "correlationId": getattr(record, "correlationId", "-"),
+            "message": message,
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        text = json.dumps(data, default=str)
+
+        # Splice pre-serialized payload in rather than encoding it twice
+        if payloads:
+            payload = payloads[0]
+            raw = str(payload)
+            raw = json.dumps(raw) if payload.truncated else raw
+            text = f'{text[:-1]}, "payload": {raw}}}'
+        return text
+
+
+class Metrics:
+    """
+    Metrics recorded during one invocation.
+
+    Flushed as a single CloudWatch Embedded Metric Format record, so phase
+    timings reach CloudWatch without any extra API calls.
+    """
+
+    def __init__(self, namespace, dimensions=None):
+        self.namespace = namespace
+        self.dimensions = {}
+        self.values = {}
+        self.units = {}
+        self.lock = threading.Lock()
+        self.putDimensions(**(dimensions or {}))
+
+    def putDimensions(self, **dimensions):
+        self.dimensions.update({k: str(v) for k, v in dimensions.items() if v})
+
+    def putMetric(self, name, value, unit="Milliseconds"):
+        with self.lock:
+            self.values.setdefault(name, []).append(round(value, 3))
+            self.units[name] = unit
+
+    def to_dict(self, **properties):
+        metrics = [{"Name": k, "Unit": v} for k, v in self.units.items()]
+        values = {k: v[0] if len(v) == 1 else v for k, v in self.values.items()}
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": metrics,
+                    }
+                ],
+            },
+            **properties,
+            **self.dimensions,
+            **values,
+        }
+
+
+class Timer:
+    """
+    Time a phase of the current invocation in milliseconds.
+
+    :Example:
+
+    >>> with logger.timer("signature"):
+    ...     verify(signature, ts, body)
+    >>>
+    >>> @logger.timer("scopes")
+    ... def get_scopes(): ...
+    """
+
+    def __init__(self, adapter, name):
+        self.adapter = adapter
+        self.name = name
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.elapsed = (time.perf_counter() - self.start) * 1000
+        self.adapter.putMetric(self.name, self.elapsed)
+
+    def __call__(self, func):
+        if iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with Timer(self.adapter, self.name):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with Timer(self.adapter, self.name):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+
+class LambdaLoggerAdapter(logging.LoggerAdapter):
+    """
+    Lambda logger adapter.
+    """
+
+    max_bytes = LOG_PAYLOAD_MAX_BYTES
+    redact = LOG_REDACT
+    sample_rate = LOG_SAMPLE_RATE
+    namespace = METRICS_NAMESPACE
+    spans = TRACE_SPANS
+    metrics_stream = None
+    cold = True
+
+    @staticmethod
+    def getLogger(name, level=None, format_string=None, stream=None):
+        # Get logger, handler, formatter
+        logger = logging.getLogger(name)
+        handler = logging.StreamHandler(stream)
+        format_string = format_string or LOG_FORMAT
+        if format_string == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(format_string)
+        handler.setFormatter(formatter)
+
+        # Set log level
+        logger.setLevel(level or LOG_LEVEL)
+
+        # Set handler if necessary
+        if not logger.handlers:  # and not logger.parent.handlers:
+            logger.addHandler(handler)
+
+        # Suppress AWS logging for this logger
+        for handler in logging.root.handlers:
+            logFilter = SuppressFilter(name)
+            handler.addFilter(logFilter)
+
+        return logger
+
+    def __init__(self, logger, extra=None):
+        super().__init__(logger, extra or {"awsRequestId": "-", "correlationId": "-"})
+        self.context = contextvars.ContextVar(f"{logger.name}.context", default=None)
+        self.metrics = contextvars.ContextVar(f"{logger.name}.metrics", default=None)
+        self.span = contextvars.ContextVar(f"{logger.name}.span", default=None)
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {
+            **self.extra,
+            **(self.context.get() or {}),
+            **kwargs.get("extra", {}),
+        }
+        return msg, kwargs
+
+    def bind(
+        self,
+        handler=None,
+        *,
+        max_bytes=None,
+        redact=(),
+        sample_rate=None,
+        route=None,
+        expected=(),
+    ):
+        """
+        Decorate Lambda handler to attach logger to AWS request.
+
+        The event and result are logged lazily at INFO for a ``sample_rate``
+        fraction of invocations and truncated to ``max_bytes``. If the handler
+        raises, the event is always logged in full at ERROR. Values of keys in
+        ``redact`` (in addition to the logger's defaults) are never logged.
+
+        Exceptions in ``expected`` are part of the handler's contract (e.g.
+        a duplicate request a state machine catches): they are re-raised but
+        only logged at INFO, without the event, and the span isn't a fault.
+
+        Both plain and ``async def`` handlers are supported. Request context
+        is held in a context variable, so concurrent invocations in threads or
+        tasks each log their own request ID.
+
+        Phases timed with ``timer()`` and the handler's own duration are
+        emitted as one EMF record per invocation, with ``route`` (the function
+        name by default), ``action_id`` and ``start`` (cold/warm) dimensions.
+
+        Each invocation is also a span of the request's trace, joined from
+        the event's ``_trace`` key. Its correlation ID is added to every log
+        line and ``inject()`` passes it on to the next hop.
+
+        :Example:
+
+        >>> logger = getLogger(__name__)
+        >>>
+        >>> @logger.bind(redact={"body"}, sample_rate=0.1)
+        ... def handler(event, context):
+        ...     logger.info('Hello, world!')
+        ...     return {'ok': True}
+        ...
+        >>> handler({'fizz': 'buzz'})
+        >>> # => INFO RequestId: {awsRequestId} EVENT {"fizz": "buzz"}
+        >>> # => INFO RequestId: {awsRequestId} Hello, world!
+        >>> # => INFO RequestId: {awsRequestId} RETURN {"ok": True}
+        """
+        if handler is None:
+            return functools.partial(
+                self.bind,
+                max_bytes=max_bytes,
+                redact=redact,
+                sample_rate=sample_rate,
+                route=route,
+                expected=expected,
+            )
+
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        redact = {*self.redact, *redact}
+        sample_rate = self.sample_rate if sample_rate is None else sample_rate
+
+        def enter(event, context):
+            span = self.spanOf(event, context, route)
+            tokens = (
+                self.context.set(
+                    {**self.contextOf(context), "correlationId": span.correlation_id}
+                ),
+                self.metrics.set(self.metricsOf(event, context, route)),
+                self.span.set(span),
+            )
+            sampled = sample_rate >= 1 or random.random() < sample_rate
+            if sampled:
+                self.info("EVENT %s", Payload(event, max_bytes, redact))
+            return tokens, sampled
+
+        def returned(result, sampled):
+            if sampled:
+                self.info("RETURN %s", Payload(result, max_bytes, redact))
+            return result
+
+        def leave(tokens, fault=False):
+            self.flushSpan(fault)
+            self.flushMetrics()
+            self.span.reset(tokens[2])
+            self.metrics.reset(tokens[1])
+            self.context.reset(tokens[0])
+
+        if iscoroutinefunction(handler):
+
+            @functools.wraps(handler)
+            async def wrapper(event=None, context=None):
+                tokens, sampled = enter(event, context)
+                fault = False
+                try:
+                    with self.timer("handler"):
+                        result = await handler(event, context)
+                    return returned(result, sampled)
+                except expected as err:
+                    self.info("%s %s", type(err).__name__, err)
+                    raise
+                except Exception:
+                    fault = True
+                    self.error("EVENT %s", Payload(event, None, redact))
+                    raise
+                finally:
+                    leave(tokens, fault)
+
+        else:
+
+            @functools.wraps(handler)
+            def wrapper(event=None, context=None):
+                tokens, sampled = enter(event, context)
+                fault = False
+                try:
+                    with self.timer("handler"):
+                        result = handler(event, context)
+                    return returned(result, sampled)
+                except expected as err:
+                    self.info("%s %s", type(err).__name__, err)
+                    raise
+                except Exception:
+                    fault = True
+                    self.error("EVENT %s", Payload(event, None, redact))
+                    raise
+                finally:
+                    leave(tokens, fault)
+
+        return wrapper
+
+    @staticmethod
+    def contextOf(context=None):
+        """
+        Get logging context from Lambda runtime context.
+        """
+        try:
+            return {"awsRequestId": f"RequestId: {context.aws_request_id}"}
+        except AttributeError:
+            return {}
+
+    def metricsOf(self, event=None, context=None, route=None):
+        """
+        Start metrics for an invocation.
+        """
+        start = "cold" if self.cold else "warm"
+        self.cold = False
+        dimensions = {
+            "route": route or getattr(context, "function_name", None),
+            "action_id": self.actionOf(event),
+            "start": start,
+        }
+        return Metrics(self.namespace, dimensions)
+
+    @staticmethod
+    def spanOf(event=None, context=None, route=None):
+        """
+        Start span for an invocation.
+        """
+        name = route or getattr(context, "function_name", None) or "handler"
+        return Span(str(name), event)
+
+    @staticmethod
+    def actionOf(event=None):
+        """
+        Get the action ID (or callback ID, or command) of a Slack event.
+        """
+        if not isinstance(event, dict):
+            return None
+        actions = event.get("actions") or [{}]
+        view = event.get("view") or {}
+        return (
+            event.get("action_id")
+            or actions[0].get("action_id")
+            or event.get("callback_id")
+            or view.get("callback_id")
+            or event.get("command")
+        )
+
+    def timer(self, name):
+        """
+        Time a phase of the current invocation.
+        """
+        return Timer(self, name)
+
+    def putMetric(self, name, value, unit="Milliseconds"):
+        """
+        Record metric for the current invocation.
+        """
+        metrics = self.metrics.get()
+        if metrics is not None:
+            metrics.putMetric(name, value, unit)
+        return self
+
+    def putDimensions(self, **dimensions):
+        """
+        Add dimensions to the current invocation's metrics.
+        """
+        metrics = self.metrics.get()
+        if metrics is not None:
+            metrics.putDimensions(**dimensions)
+        return self
+
+    def flushMetrics(self):
+        """
+        Write the current invocation's metrics to stdout as an EMF record.
+        """
+        metrics = self.metrics.get()
+        if not self.namespace or metrics is None or not metrics.values:
+            return self
+        context = self.context.get() or {}
+        request_id = context.get("awsRequestId", "-").removeprefix("RequestId: ")
+        record = metrics.to_dict(requestId=request_id)
+        stream = self.metrics_stream or sys.stdout
+        stream.write(json.dumps(record) + "\n")
+        stream.flush()
+        return self
+
+    def inject(self, event):
+        """
+        Add the current invocation's trace context to an outgoing event.
+
+        Events sent from a root span (e.g. the authorizer's parsed payload)
+        also set its correlation ID from their ``trigger_id``/``event_id``.
+        """
+        span = self.span.get()
+        if span is None or not isinstance(event, dict):
+            return event
+        correlation_id = span.correlation_id
+        event = span.inject(event)
+        context = self.context.get()
+        if context is not None and span.correlation_id != correlation_id:
+            self.context.set({**context, "correlationId": span.correlation_id})
+        return event
+
+    def flushSpan(self, fault=False):
+        """
+        Write the current invocation's span to stdout as an X-Ray segment.
+        """
+        span = self.span.get()
+        if not self.spans or span is None:
+            return self
+        stream = self.metrics_stream or sys.stdout
+        stream.write(json.dumps(span.finish(fault).to_dict()) + "\n")
+        stream.flush()
+        return self
+
+    def addContext(self, context=None):
+        """
+        Add runtime context to logger for the current thread or task.
+        """
+        self.context.set(self.contextOf(context))
+        return self
+
+    def dropContext(self):
+        """
+        Drop runtime context from logger for the current thread or task.
+        """
+        self.context.set(None)
+        return self
+
+
+def __getattr__(name):
+    # ``concurrent.futures`` is only imported by functions that fan out work
+    if name != "ContextThreadPoolExecutor":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    class ContextThreadPoolExecutor(ThreadPoolExecutor):
+        """
+        Thread pool that runs each call in a copy of the submitter's context.
+
+        Work fanned out from a bound handler keeps logging the request ID of
+        the invocation that submitted it.
+
+        :Example:
+
+        >>> with ContextThreadPoolExecutor() as executor:
+        ...     list(executor.map(post, urls))
+        """
+
+        def submit(self, fn, /, *args, **kwargs):
+            context = contextvars.copy_context()
+            return super().submit(context.run, fn, *args, **kwargs)
+
+    ContextThreadPoolExecutor.__module__ = __name__
+    ContextThreadPoolExecutor.__qualname__ = name
+    globals()[name] = ContextThreadPoolExecutor
+    return ContextThreadPoolExecutor
+
+
+def getLogger(name, level=None, format_string=None, stream=None):
+    """
+    Helper to get Lambda logger.
+
+    Defaults are read from the ``LOG_LEVEL``, ``LOG_FORMAT`` (a format string
+    or ``json``), ``LOG_PAYLOAD_MAX_BYTES``, ``LOG_SAMPLE_RATE`` and
+    ``LOG_REDACT`` (comma-separated keys) environment variables. Metrics are
+    written to ``METRICS_NAMESPACE`` (set it empty to disable them) and spans
+    unless ``TRACE_SPANS`` is ``false``.
+
+    :Example:
+
+    >>> getLogger('logger-name', 'DEBUG', '%(message)s')
+    """
+    level = level or os.getenv("LOG_LEVEL") or LOG_LEVEL
+    format_string = format_string or os.getenv("LOG_FORMAT") or LOG_FORMAT
+    logger = LambdaLoggerAdapter.getLogger(name, level, format_string, stream)
+    adapter = LambdaLoggerAdapter(logger)
+    adapter.max_bytes = int(os.getenv("LOG_PAYLOAD_MAX_BYTES", LOG_PAYLOAD_MAX_BYTES))
+    adapter.sample_rate = float(os.getenv("LOG_SAMPLE_RATE", LOG_SAMPLE_RATE))
+    adapter.redact = {
+        *LOG_REDACT,
+        *filter(None, os.getenv("LOG_REDACT", "").split(",")),
+    }
+    adapter.namespace = os.getenv("METRICS_NAMESPACE", METRICS_NAMESPACE)
+    adapter.spans = os.getenv("TRACE_SPANS", "true").lower() not in ("0", "false")
+    return adapter
+
+
+logger = getLogger(LOG_NAME)
@@ -0,0 +1,61 @@
+"""
+Slack request payloads
+"""
+
+import json
+from urllib.parse import parse_qsl
+
+
+def parse_form(body):
+    """
+    Parse form-encoded body.
+
+    Fields are split before they are decoded, so encoded ``&``, ``=`` and ``+``
+    characters in values survive intact. Later fields overwrite earlier ones.
+    """
+    return dict(parse_qsl(body, keep_blank_values=True))
+
+
+def parse_json(body):
+    """
+    Parse JSON body (Events API).
+    """
+    return json.loads(body)
+
+
+def parse_payload(body):
+    """
+    Parse form-encoded body with a JSON ``payload`` field (interactions).
+    """
+    return json.loads(parse_form(body)["payload"])
+
+
+def parse_slash_command(body):
+    """
+    Parse form-encoded slash command body.
+    """
+    return {**parse_form(body), "type": "slash_command"}
+
+
+PARSERS = {
+    "form": parse_form,
+    "json": parse_json,
+    "payload": parse_payload,
+    "slash_command": parse_slash_command,
+}
+
+
+def parse(body, kind):
+    """
+    Parse Slack request body of the given kind.
+
+    :Example:
+
+    >>> parse("command=%2Ftest&text=a+%26+b", "slash_command")
+    {'command': '/test', 'text': 'a & b', 'type': 'slash_command'}
+    """
+    try:
+        parser = PARSERS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown payload kind: {kind}")
+    return parser(body)
@@ -0,0 +1,223 @@
+"""
+Batched EventBridge publisher
+
+Accumulates events into ``PutEvents`` calls of up to 10 entries and 256 KB,
+flushing when a batch is full or its oldest entry has waited ``max_delay``
+seconds. Only the entries that failed in a partial failure are retried.
+
+Use it as a context manager in a batched ingestion Lambda, so the last
+partial batch is flushed before returning, or ``start()`` it in a
+long-lived process to flush on the deadline from a background thread.
+
+:Example:
+
+>>> with Publisher() as publisher:
+...     for record in event["Records"]:
+...         publisher.put(entry(record))
+"""
+
+import json
+import random
+import threading
+import time
+
+from slackbot.logger import logger
+
+MAX_ENTRIES = 10
+MAX_BYTES = 256 * 1024
+MAX_DELAY = 0.1
+RETRY_CODES = frozenset({"InternalException", "InternalFailure", "ThrottlingException"})
+
+
+def entry_size(entry):
+    """
+    Get size of ``PutEvents`` entry as EventBridge calculates it.
+    """
+    size = 14 if entry.get("Time") else 0
+    for key in ("Source", "DetailType", "Detail", "EventBusName"):
+        value = entry.get(key)
+        if value is not None:
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            size += len(value.encode())
+    for resource in entry.get("Resources") or []:
+        size += len(resource.encode())
+    return size
+
+
+def error_code(err):
+    """
+    Get AWS error code of a client exception, if it has one.
+    """
+    try:
+        return err.response["Error"]["Code"]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+class Publisher:
+    """
+    Batch ``PutEvents`` entries by count, size and age.
+
+    Entries that still fail after ``retries`` attempts, or fail with an
+    error that cannot be retried, are kept in ``failed`` with their error.
+
+    The lock only guards the buffer: a full batch is swapped out under it
+    and sent outside it, so ``put()`` from other threads never waits on a
+    ``PutEvents`` call (or its retry backoff).
+    """
+
+    def __init__(
+        self,
+        client=None,
+        *,
+        max_entries=MAX_ENTRIES,
+        max_bytes=MAX_BYTES,
+        max_delay=MAX_DELAY,
+        retries=3,
+        backoff=0.05,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        if client is None:
+            import boto3
+
+            client = boto3.client("events")
+        self.client = client
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.batch = []
+        self.size = 0
+        self.deadline = None
+        self.failed = []
+        self.stats = dict.fromkeys(("calls", "published", "retried", "failed"), 0)
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def put(self, entry):
+        """
+        Add entry, flushing the batch first if the entry would not fit.
+        """
+        size = entry_size(entry)
+        if size > self.max_bytes:
+            raise ValueError(f"Entry is {size} bytes, over {self.max_bytes}")
+        with self.lock:
+            full = self.take() if self.size + size > self.max_bytes else []
+            self.batch.append(entry)
+            self.size += size
+            if self.deadline is None:
+                self.deadline = self.clock() + self.max_delay
+            if len(self.batch) >= self.max_entries or self.clock() >= self.deadline:
+                ready = self.take()
+            else:
+                ready = []
+        self.publish(full)
+        self.publish(ready)
+
+    def poll(self):
+        """
+        Flush the batch if its deadline has passed.
+        """
+        with self.lock:
+            due = self.deadline is not None and self.clock() >= self.deadline
+            batch = self.take() if due else []
+        self.publish(batch)
+
+    def flush(self):
+        """
+        Publish pending entries now.
+        """
+        with self.lock:
+            batch = self.take()
+        self.publish(batch)
+
+    def take(self):
+        """
+        Swap out the buffered batch; call with the lock held.
+        """
+        batch, self.batch, self.size, self.deadline = self.batch, [], 0, None
+        return batch
+
+    def publish(self, batch):
+        if batch:
+            logger.putMetric("events_batch", len(batch), "Count")
+            self.send(batch)
+
+    def send(self, batch):
+        """
+        Send one batch, retrying only the entries that failed.
+        """
+        attempt = 0
+        while batch:
+            self.count("calls")
+            try:
+                res = self.client.put_events(Entries=batch)
+            except Exception as err:  # noqa: BLE001
+                code = error_code(err)
+                if code not in RETRY_CODES or attempt >= self.retries:
+                    self.fail(batch, code or type(err).__name__, str(err))
+                    return
+                retry = batch
+            else:
+                retry = []
+                results = res.get("Entries") or []
+                for entry, result in zip(batch, results, strict=True):
+                    code = result.get("ErrorCode")
+                    if not code:
+                        self.count("published")
+                    elif code in RETRY_CODES and attempt < self.retries:
+                        retry.append(entry)
+                    else:
+                        self.fail([entry], code, result.get("ErrorMessage"))
+            if retry:
+                self.count("retried", len(retry))
+                delay = self.backoff * 2**attempt * random.uniform(0.5, 1.0)
+                self.sleep(delay)
+                attempt += 1
+            batch = retry
+
+    def fail(self, entries, code, message):
+        logger.error("PUT EVENTS FAILED %s %s", code, message)
+        with self.lock:
+            self.stats["failed"] += len(entries)
+            self.failed.extend((entry, code) for entry in entries)
+
+    def count(self, stat, n=1):
+        with self.lock:
+            self.stats[stat] += n
+
+    def start(self, interval=None):
+        """
+        Flush on the batch deadline from a background thread.
+        """
+        interval = interval or self.max_delay / 2
+
+        def run():
+            while not self.stopped.wait(interval):
+                self.poll()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        """
+        Stop the background thread (if any) and flush the last batch.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
@@ -0,0 +1,316 @@
+"""
+Slack Web API client
+
+Paces calls with token buckets sized by each method's rate-limit tier, per
+workspace (and per channel for ``chat.postMessage``), and shares a small
+pool of keep-alive connections across the process. Interaction replies to
+a ``response_url`` share pooled connections the same way.
+
+:Example:
+
+>>> slack = Slack()
+>>> slack.api("views.publish", team_id="T0123456789", token=token, **view)
+{'ok': True, ...}
+>>> slack.respond(event["response_url"], {"text": "Done"})
+"""
+
+import contextlib
+import json
+import queue
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from slackbot.client import RETRY_STATUSES, Client, HTTPError, Timeout, retry_after
+from slackbot.logger import logger
+
+SLACK_URL = "https://slack.com"
+
+# Sustained calls per minute and burst size for each tier
+TIERS = {
+    1: (1, 1),
+    2: (20, 5),
+    3: (50, 10),
+    4: (100, 20),
+    "special": (60, 1),
+}
+
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.delete": 3,
+    "chat.postEphemeral": 4,
+    "chat.postMessage": "special",
+    "chat.update": 3,
+    "conversations.history": 3,
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "oauth.v2.access": 4,
+    "team.info": 3,
+    "users.info": 4,
+    "users.list": 2,
+    "views.open": 4,
+    "views.publish": 4,
+    "views.push": 4,
+    "views.update": 4,
+}
+
+DEFAULT_TIER = 3
+
+
+class RateLimited(Exception):
+    """
+    Call would exceed the method's rate limit.
+    """
+
+    def __init__(self, method, retry_after):
+        super().__init__(f"{method} rate limited, retry after {retry_after:.3f}s")
+        self.method = method
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    Tokens may be reserved ahead (the balance goes negative), which tells a
+    queued caller how long to wait for its turn.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """
+        Take a token, returning the seconds to wait before using it.
+        """
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        """
+        Take a token if one is available now, else return the seconds until
+        one will be.
+        """
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def release(self):
+        """
+        Return a reserved token that went unused.
+        """
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds):
+        """
+        Empty the bucket for ``seconds``, e.g. after a ``429 Retry-After``.
+        """
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class Pool:
+    """
+    Keep-alive clients for one host, shared by the threads of a process.
+
+    Idle clients are reused last-in first-out so the warmest connection is
+    picked; at most ``maxsize`` are kept.
+    """
+
+    def __init__(self, url=SLACK_URL, maxsize=4, **kwargs):
+        self.url = url
+        self.kwargs = kwargs
+        self.idle = queue.LifoQueue(maxsize)
+
+    @contextlib.contextmanager
+    def client(self):
+        try:
+            client = self.idle.get_nowait()
+        except queue.Empty:
+            client = Client(self.url, **self.kwargs)
+        try:
+            yield client
+        finally:
+            try:
+                self.idle.put_nowait(client)
+            except queue.Full:
+                client.close()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class Slack:
+    """
+    Rate-limit aware Slack Web API client.
+
+    Each call first takes a token from the bucket for its method and
+    workspace. With ``block=True`` a caller over the limit is queued until
+    its turn (unless that passes its deadline), otherwise it fails fast
+    with ``RateLimited``. A ``429`` empties the bucket for the server's
+    ``Retry-After`` so other callers back off too.
+
+    Counts of ``calls``, ``queued``, ``throttled`` and ``rejected`` calls are
+    kept in ``stats`` and recorded as invocation metrics.
+    """
+
+    def __init__(
+        self,
+        url=SLACK_URL,
+        *,
+        block=True,
+        tiers=TIERS,
+        method_tiers=METHOD_TIERS,
+        pool=None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.block = block
+        self.tiers = tiers
+        self.method_tiers = method_tiers
+        self.pool = pool or Pool(url, statuses=RETRY_STATUSES - {429})
+        self.clock = clock
+        self.sleep = sleep
+        self.buckets = {}
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(("calls", "queued", "throttled", "rejected"), 0)
+
+    def bucket(self, method, team_id=None, channel=None):
+        """
+        Get bucket for method in workspace.
+        """
+        tier = self.method_tiers.get(method, DEFAULT_TIER)
+        key = (method, team_id, channel if tier == "special" else None)
+        with self.lock:
+            if key not in self.buckets:
+                per_minute, burst = self.tiers[tier]
+                self.buckets[key] = TokenBucket(per_minute / 60, burst, self.clock)
+            return self.buckets[key]
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+        logger.putMetric(f"slack_{name}", value, "Count")
+
+    def wait(self, method, bucket, block, deadline):
+        """
+        Wait for a token from ``bucket``, or raise ``RateLimited``.
+        """
+        if not block:
+            delay = bucket.acquire()
+            if delay:
+                self.count("rejected")
+                raise RateLimited(method, delay)
+            return
+        delay = bucket.reserve()
+        if not delay:
+            return
+        if deadline is not None and self.clock() + delay >= deadline:
+            bucket.release()
+            self.count("rejected")
+            raise RateLimited(method, delay)
+        self.count("queued")
+        logger.putMetric("slack_queued_wait", delay * 1000)
+        self.sleep(delay)
+
+    def api(
+        self,
+        method,
+        *,
+        team_id=None,
+        token=None,
+        block=None,
+        deadline=None,
+        json_body=False,
+        **params,
+    ):
+        """
+        Call Slack Web API ``method`` and return its result.
+        """
+        block = self.block if block is None else block
+        bucket = self.bucket(method, team_id, params.get("channel"))
+        headers = {}
+        if token:
+            headers["authorization"] = f"Bearer {token}"
+        if json_body:
+            headers["content-type"] = "application/json; charset=utf-8"
+            data = json.dumps(params).encode()
+        else:
+            headers["content-type"] = "application/x-www-form-urlencoded"
+            data = urlencode(params).encode()
+        while True:
+            self.wait(method, bucket, block, deadline)
+            self.count("calls")
+            try:
+                with self.pool.client() as client:
+                    res = client.post(f"/api/{method}", data, headers, deadline)
+            except HTTPError as err:
+                if err.response.status != 429:
+                    raise
+                delay = retry_after(err.response.headers.get("retry-after")) or 1.0
+                bucket.pause(delay)
+                self.count("throttled")
+                if not block:
+                    raise RateLimited(method, delay) from err
+                if deadline is not None and self.clock() + delay >= deadline:
+                    raise Timeout(f"{method} rate limited past deadline") from err
+                continue
+            return res.json()
+
+    def respond(self, url, message, deadline=None):
+        """
+        Post ``message`` (a dict, or encoded JSON) to an interaction's
+        ``response_url``.
+
+        Response URLs aren't paced by tier; Slack only limits how many
+        replies each one takes.
+        """
+        parts = urlsplit(url)
+        path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        headers = {"content-type": "application/json; charset=utf-8"}
+        if not isinstance(message, bytes):
+            message = json.dumps(message).encode()
+        self.count("calls")
+        with self.origin(f"{parts.scheme}://{parts.netloc}").client() as client:
+            return client.post(path, message, headers, deadline)
+
+    def origin(self, url):
+        """
+        Get connection pool for ``response_url`` host.
+        """
+        with self.lock:
+            if url not in self.pools:
+                self.pools[url] = Pool(url)
+            return self.pools[url]
+
+    def close(self):
+        """
+        Close idle connections, e.g. after a SnapStart restore.
+        """
+        self.pool.close()
+        with self.lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            pool.close()
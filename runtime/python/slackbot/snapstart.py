@@ -0,0 +1,65 @@
+"""
+SnapStart runtime hooks
+
+With SnapStart, Lambda snapshots a function after its init phase and
+restores every new instance from that one snapshot. Work done in
+``before_snapshot`` hooks is paid once per published version instead of on
+each cold start; ``after_restore`` hooks re-seed state that would otherwise
+be shared by every instance restored from the snapshot.
+
+Hooks are registered with the runtime's ``snapshot_restore_py`` module
+when it is available (i.e. on Lambda) and can be run by hand with ``run()``
+everywhere else.
+
+:Example:
+
+>>> @before_snapshot
+... def prime():
+...     verifier.verify(signature, ts, body)
+"""
+
+import random
+
+try:
+    from snapshot_restore_py import register_after_restore, register_before_snapshot
+except ImportError:  # Not on Lambda
+    register_after_restore = register_before_snapshot = None
+
+HOOKS = {"before_snapshot": [], "after_restore": []}
+REGISTER = {
+    "before_snapshot": register_before_snapshot,
+    "after_restore": register_after_restore,
+}
+
+
+def hook(phase):
+    """
+    Get decorator registering a function for runtime ``phase``.
+    """
+
+    def decorator(func):
+        HOOKS[phase].append(func)
+        if REGISTER[phase] is not None:
+            REGISTER[phase](func)
+        return func
+
+    return decorator
+
+
+before_snapshot = hook("before_snapshot")
+after_restore = hook("after_restore")
+
+
+def run(phase):
+    """
+    Run hooks for ``phase`` in the order they were registered.
+    """
+    for func in HOOKS[phase]:
+        func()
+
+
+@after_restore
+def reseed():
+    # ``random`` was seeded once at import, before the snapshot, so restored
+    # instances would otherwise share backoff jitter and sampling decisions
+    random.seed()
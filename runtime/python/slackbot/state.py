@@ -0,0 +1,89 @@
+"""
+OAuth state tokens
+
+Stateless replacement for tracking each ``/install`` as a Step Functions
+execution. A token carries its own expiry and a random nonce, signed with
+the same keyed HMAC state (and secret rotation) as Slack request signatures.
+"""
+
+import secrets
+
+from slackbot.signature import VERSION, now
+
+PREFIX = "oauth-state"
+TTL = 300
+
+
+class InvalidState(Exception): ...
+
+
+class StateTokens:
+    """
+    Issue and verify signed, expiring OAuth ``state`` tokens.
+
+    Tokens look like ``<expires>.<nonce>.<hexdigest>``. The signed message
+    is prefixed so a token can never be mistaken for a Slack request
+    signature, or vice versa. Tokens are signed with the verifier's primary
+    (newest) secret, even once a request signed with a retiring one has
+    reordered its keys.
+
+    Verified nonces are remembered until they expire, so a token can only
+    be used once per warm instance. Slack's OAuth ``code`` is itself single
+    use, which covers replays that land on another instance.
+
+    :Example:
+
+    >>> tokens = StateTokens(verifier, ttl=300)
+    >>> token = tokens.issue()
+    >>> tokens.verify(token)
+    True
+    """
+
+    def __init__(self, verifier, ttl=TTL, clock=now, maxsize=4096):
+        self.verifier = verifier
+        self.ttl = ttl
+        self.clock = clock
+        self.maxsize = maxsize
+        self.used = {}
+
+    def sign(self, expires, nonce):
+        digest = self.verifier.digest(
+            self.verifier.primary, expires, f"{PREFIX}:{nonce}"
+        )
+        return digest.hex()
+
+    def issue(self):
+        """
+        Issue new state token.
+        """
+        expires = str(int(self.clock()) + self.ttl)
+        nonce = secrets.token_urlsafe(16)
+        return f"{expires}.{nonce}.{self.sign(expires, nonce)}"
+
+    def verify(self, token):
+        """
+        Verify state token, raising ``InvalidState`` if it is malformed,
+        forged, expired or already used.
+        """
+        try:
+            expires, nonce, hexdigest = token.split(".")
+            deadline = int(expires)
+        except (AttributeError, ValueError):
+            raise InvalidState("State token malformed")
+        signature = f"{VERSION}={hexdigest}"
+        if not self.verifier.verify(signature, expires, f"{PREFIX}:{nonce}"):
+            raise InvalidState("State token invalid")
+        ts = self.clock()
+        if deadline < ts:
+            raise InvalidState("State token expired")
+        if nonce in self.used:
+            raise InvalidState("State token already used")
+        self.claim(nonce, deadline, ts)
+        return True
+
+    def claim(self, nonce, deadline, ts):
+        if len(self.used) >= self.maxsize:
+            self.used = {k: v for k, v in self.used.items() if v >= ts}
+            while len(self.used) >= self.maxsize:
+                del self.used[next(iter(self.used))]
+        self.used[nonce] = deadline
@@ -0,0 +1,122 @@
+"""
+Tracing
+
+Follows one Slack request across every hop of the pipeline: the Step
+Functions execution, the authorizer, EventBridge and the responders. Its
+correlation ID is Slack's ``trigger_id`` (or the Events API ``event_id``),
+falling back to the execution name, and travels in the ``_trace`` key of
+each event with the X-Ray trace ID and the ID of the span that sent it.
+
+Each hop is recorded as a ``Span`` and written out as an X-Ray segment
+document, so spans can be read straight from the logs or forwarded to
+``PutTraceSegments``.
+
+:Example:
+
+>>> span = Span("slackbot-api-authorizer", {"execution": "abc"})
+>>> span.inject({"type": "block_actions", "trigger_id": "123.456"})
+{'type': 'block_actions', 'trigger_id': '123.456', '_trace': {'correlation_id': '123.456', 'trace_id': '1-6523e1c0-...', 'parent_id': '53995c3f42cd8ad8'}}
+>>> span.finish().to_dict()
+{'name': 'slackbot-api-authorizer', 'id': '53995c3f42cd8ad8', ...}
+"""
+
+import os
+import time
+
+TRACE_KEY = "_trace"
+
+
+def trace_id(now=None):
+    """
+    Get new X-Ray trace ID: version, epoch seconds (hex) and 96 random bits.
+    """
+    now = time.time() if now is None else now
+    return f"1-{int(now):08x}-{os.urandom(12).hex()}"
+
+
+def span_id():
+    """
+    Get new 64-bit X-Ray segment ID.
+    """
+    return os.urandom(8).hex()
+
+
+def correlation_id(event):
+    """
+    Get correlation ID of event: the one it was sent with, else its Slack
+    ``trigger_id`` or ``event_id``, else the Step Functions execution name.
+    """
+    if not isinstance(event, dict):
+        return None
+    parent = event.get(TRACE_KEY)
+    if isinstance(parent, dict) and parent.get("correlation_id"):
+        return parent["correlation_id"]
+    return event.get("trigger_id") or event.get("event_id") or event.get("execution")
+
+
+class Span:
+    """
+    One hop of a traced request.
+
+    Spans started from an event carrying ``_trace`` join its trace as a
+    child of the span that sent it; otherwise they start a new trace.
+    """
+
+    def __init__(self, name, event=None, now=None):
+        parent = event.get(TRACE_KEY) if isinstance(event, dict) else None
+        parent = parent if isinstance(parent, dict) else {}
+        self.name = name
+        self.id = span_id()
+        self.start_time = time.time() if now is None else now
+        self.end_time = None
+        self.trace_id = parent.get("trace_id") or trace_id(self.start_time)
+        self.parent_id = parent.get("parent_id")
+        self.correlation_id = correlation_id(event) or self.trace_id
+        self.fault = False
+
+    def correlate(self, event):
+        """
+        Adopt the Slack ID of an event produced by a root span.
+
+        The authorizer only sees the signed body, so its span starts out
+        correlated by execution name until the payload is parsed.
+        """
+        if self.parent_id is None:
+            self.correlation_id = correlation_id(event) or self.correlation_id
+        return self.correlation_id
+
+    def inject(self, event):
+        """
+        Get copy of event carrying this span's trace context.
+        """
+        self.correlate(event)
+        context = {
+            "correlation_id": self.correlation_id,
+            "trace_id": self.trace_id,
+            "parent_id": self.id,
+        }
+        return {**event, TRACE_KEY: context}
+
+    def finish(self, fault=False, now=None):
+        self.end_time = time.time() if now is None else now
+        self.fault = fault
+        return self
+
+    def to_dict(self):
+        end_time = self.end_time or time.time()
+        record = {
+            "name": self.name,
+            "id": self.id,
+            "trace_id": self.trace_id,
+            "start_time": round(self.start_time, 6),
+            "end_time": round(end_time, 6),
+        }
+        if self.parent_id:
+            record["parent_id"] = self.parent_id
+        if self.fault:
+            record["fault"] = True
+        record["annotations"] = {"correlation_id": self.correlation_id}
+        record["metadata"] = {
+            "default": {"duration_ms": round((end_time - self.start_time) * 1000, 3)}
+        }
+        return record
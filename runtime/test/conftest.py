@@ -0,0 +1,129 @@
+import operator
+import re
+import threading
+
+import pytest
+
+# Comparators of condition expressions
+OPERATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class ConditionalCheckFailedException(Exception): ...
+
+
+class FakeDynamoDB:
+    """
+    DynamoDB client stand-in shared by the stores' tests.
+
+    Evaluates the subset of expressions the stores use: conditions of
+    ``attribute_exists()``, ``attribute_not_exists()`` and comparisons
+    joined by a single kind of ``AND``/``OR``, ``SET`` updates (with
+    ``if_not_exists()``) and ``REMOVE``. Every call checks that each
+    expression attribute name it is given is used.
+    """
+
+    class exceptions:
+        ConditionalCheckFailedException = ConditionalCheckFailedException
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def item(self, table, key):
+        """
+        Get item as plain values (numbers as floats), or ``None``.
+        """
+        item = self.tables.get(table, {}).get(key)
+        if item is None:
+            return None
+        return {name: self.scalar(value) for name, value in item.items()}
+
+    @staticmethod
+    def scalar(value):
+        ((kind, data),) = value.items()
+        return float(data) if kind == "N" else data
+
+    @staticmethod
+    def names(kwargs, *expressions):
+        names = kwargs.get("ExpressionAttributeNames") or {}
+        used = re.findall(r"#\w+", " ".join(filter(None, expressions)))
+        assert set(names) <= set(used)
+        return names
+
+    def check(self, item, condition, names, values):
+        def term(text):
+            match = re.fullmatch(r"(attribute_(?:not_)?exists)\((#\w+)\)", text)
+            if match:
+                return (names[match[2]] in item) == (match[1] == "attribute_exists")
+            name, op, value = text.split()
+            if names[name] not in item:
+                return False
+            return OPERATORS[op](
+                self.scalar(item[names[name]]), self.scalar(values[value])
+            )
+
+        if not condition:
+            return True
+        if " OR " in condition:
+            return any(term(x) for x in condition.split(" OR "))
+        return all(term(x) for x in condition.split(" AND "))
+
+    def put_item(self, TableName, Item, ConditionExpression=None, **kwargs):
+        names = self.names(kwargs, ConditionExpression)
+        values = kwargs.get("ExpressionAttributeValues") or {}
+        with self.lock:
+            table = self.tables.setdefault(TableName, {})
+            item = table.get(Item["key"]["S"], {})
+            if not self.check(item, ConditionExpression, names, values):
+                raise ConditionalCheckFailedException()
+            table[Item["key"]["S"]] = dict(Item)
+
+    def update_item(self, TableName, Key, UpdateExpression, **kwargs):
+        condition = kwargs.get("ConditionExpression")
+        names = self.names(kwargs, UpdateExpression, condition)
+        values = kwargs.get("ExpressionAttributeValues") or {}
+        with self.lock:
+            table = self.tables.setdefault(TableName, {})
+            item = dict(table.get(Key["key"]["S"], {}))
+            if not self.check(item, condition, names, values):
+                raise ConditionalCheckFailedException()
+            item.update(Key)
+            sets, _, removes = UpdateExpression.removeprefix("SET ").partition(
+                " REMOVE "
+            )
+            for assignment in re.split(r", (?=#)", sets):
+                name, value = assignment.split(" = ")
+                match = re.fullmatch(r"if_not_exists\((#\w+), (:\w+)\)", value)
+                if match:
+                    value = match[2] if names[match[1]] not in item else None
+                if value is not None:
+                    item[names[name]] = values[value]
+            for name in filter(None, removes.split(", ")):
+                item.pop(names[name], None)
+            table[Key["key"]["S"]] = item
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, **kwargs):
+        names = self.names(kwargs, ProjectionExpression)
+        item = self.tables.get(TableName, {}).get(Key["key"]["S"])
+        if item is None:
+            return {}
+        if ProjectionExpression:
+            fields = [names.get(x, x) for x in ProjectionExpression.split(", ")]
+            item = {k: v for k, v in item.items() if k in fields}
+        return {"Item": dict(item)}
+
+    def delete_item(self, TableName, Key):
+        with self.lock:
+            self.tables.get(TableName, {}).pop(Key["key"]["S"], None)
+
+
+@pytest.fixture
+def dynamodb():
+    return FakeDynamoDB()
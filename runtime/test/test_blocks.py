@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from slackbot.blocks import BlockKitError, Slot, Template
+
+
+def button(text="Open", **kwargs):
+    return {"type": "button", "text": {"type": "plain_text", "text": text}, **kwargs}
+
+
+def actions(*elements):
+    return {"type": "actions", "elements": list(elements)}
+
+
+def option(text="x", value="x"):
+    return {"text": {"type": "plain_text", "text": text}, "value": value}
+
+
+class TestTemplate:
+    def test_render(self):
+        template = Template.message(
+            {
+                "text": "fizz",
+                "blocks": [
+                    actions(
+                        {
+                            "type": "external_select",
+                            "initial_option": Slot("opt", dict),
+                        },
+                        button(url=f"https://example.com/{Slot('path')}?q=1"),
+                    )
+                ],
+            }
+        )
+        rendered = template.render(opt=option("a", "b"), path='"buzz"')
+        assert json.loads(rendered) == {
+            "text": "fizz",
+            "blocks": [
+                actions(
+                    {"type": "external_select", "initial_option": option("a", "b")},
+                    button(url='https://example.com/"buzz"?q=1'),
+                )
+            ],
+        }
+
+    def test_render_constant(self):
+        document = {"text": "fizz", "blocks": [actions(button())]}
+        template = Template.message(document)
+        assert template.parts == [
+            (json.dumps(document, separators=(",", ":")), None, False)
+        ]
+        assert json.loads(template.render()) == document
+
+    def test_repeated_slot(self):
+        template = Template({"a": Slot("x"), "b": f"<{Slot('x')}>"})
+        assert json.loads(template.render(x="y")) == {"a": "y", "b": "<y>"}
+
+    def test_modal(self):
+        template = Template.modal(
+            {"title": {"type": "plain_text", "text": Slot("title")}, "blocks": []}
+        )
+        assert json.loads(template.render(title="fizz"))["type"] == "modal"
+        with pytest.raises(BlockKitError, match="over 24 characters"):
+            template.render(title="x" * 25)
+
+    def test_missing_slot(self):
+        with pytest.raises(BlockKitError, match="Missing slot x"):
+            Template({"a": Slot("x")}).render()
+
+    def test_wrong_type(self):
+        with pytest.raises(BlockKitError, match="expects dict, got str"):
+            Template({"a": Slot("x", dict)}).render(x="y")
+
+    def test_conflicting_types(self):
+        with pytest.raises(BlockKitError, match="conflicting types"):
+            Template({"a": Slot("x", dict), "b": Slot("x", int)})
+
+    def test_formatted_object_slot(self):
+        with pytest.raises(BlockKitError, match="formatted into a string"):
+            Template({"a": Slot("x", dict), "b": f"{Slot('x')}"})
+
+    def test_invalid_name(self):
+        with pytest.raises(BlockKitError):
+            Slot("fizz buzz")
+
+
+class TestLimits:
+    def test_blocks(self):
+        blocks = [{"type": "divider"}] * 51
+        with pytest.raises(BlockKitError, match="Over 50 blocks"):
+            Template.message({"blocks": blocks})
+        Template.modal({"blocks": blocks})
+
+    @pytest.mark.parametrize(
+        "document",
+        [
+            {"blocks": [actions(button("x" * 76))]},
+            {
+                "blocks": [
+                    {
+                        "type": "header",
+                        "text": {"type": "plain_text", "text": "x" * 151},
+                    }
+                ]
+            },
+            {
+                "blocks": [
+                    {
+                        "type": "section",
+                        "fields": [{"type": "mrkdwn", "text": "x"}] * 11,
+                    }
+                ]
+            },
+            {"blocks": [actions(button(action_id="x" * 256))]},
+            {
+                "blocks": [
+                    actions({"type": "static_select", "options": [option()] * 101})
+                ]
+            },
+            {
+                "blocks": [
+                    actions(
+                        {"type": "static_select", "options": [option(value="x" * 151)]}
+                    )
+                ]
+            },
+            {"text": "x" * 40001},
+        ],
+    )
+    def test_oversize(self, document):
+        with pytest.raises(BlockKitError):
+            Template.message(document)
+
+    def test_slot_limit(self):
+        template = Template.message({"blocks": [actions(button(f"Open {Slot('x')}"))]})
+        assert template.slots["x"].limit == 70
+        template.render(x="x" * 70)
+        with pytest.raises(BlockKitError, match="Slot x is over 70 characters"):
+            template.render(x="x" * 71)
+
+    def test_object_slot_limit(self):
+        template = Template.message(
+            {
+                "blocks": [
+                    actions(
+                        {"type": "external_select", "initial_option": Slot("o", dict)}
+                    )
+                ]
+            }
+        )
+        template.render(o=option())
+        with pytest.raises(BlockKitError, match="over 150 characters"):
+            template.render(o=option(value="x" * 151))
@@ -0,0 +1,114 @@
+import json
+import os
+import random
+import string
+from unittest import mock
+
+import pytest
+
+from slackbot import claimcheck
+
+
+def submission(size):
+    # Random text so compression can't shrink it below the threshold
+    rng = random.Random(size)
+    text = "".join(rng.choices(string.ascii_letters, k=size))
+    return {
+        "type": "view_submission",
+        "trigger_id": "123.456.abc",
+        "team": {"id": "T0123456789"},
+        "view": {"callback_id": "big", "private_metadata": text},
+    }
+
+
+class TestClaimCheck:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.store = claimcheck.FileStore(tmp_path)
+        self.claims = claimcheck.ClaimCheck(self.store, threshold=1024)
+
+    def test_small(self):
+        event = {"type": "block_actions", "actions": []}
+        assert self.claims.encode(event) is event
+        assert self.claims.decode(event) is event
+        assert self.claims.resolve(event) is event
+
+    def test_size_hint(self):
+        event = submission(4096)
+        assert self.claims.encode(event, size=100) is event
+
+    def test_size_hint_escaped(self):
+        # 200 body bytes that serialize to 1200 once escaped
+        text = "\x01" * 200
+        event = {"type": "view_submission", "view": {"private_metadata": text}}
+        pointer = self.claims.encode(event, size=len(text.encode()))
+        assert claimcheck.CLAIM_KEY in pointer
+        assert self.claims.decode(pointer) == event
+
+    def test_inline(self):
+        event = {"type": "view_submission", "view": {"blocks": ["fizz"] * 1000}}
+        pointer = self.claims.encode(event)
+        claim = pointer[claimcheck.CLAIM_KEY]
+        assert claim["encoding"] == "gzip"
+        assert "data" in claim
+        assert "key" not in claim
+        assert len(json.dumps(pointer)) <= 1024 + 64
+        assert self.claims.decode(pointer) == event
+
+    def test_offload(self, tmp_path):
+        event = submission(4096)
+        pointer = self.claims.encode(event)
+        assert pointer["type"] == "view_submission"
+        assert pointer["trigger_id"] == "123.456.abc"
+        assert "team" not in pointer
+        claim = pointer[claimcheck.CLAIM_KEY]
+        assert claim["key"].startswith("claims/")
+        assert (tmp_path / claim["key"]).exists()
+        assert self.claims.decode(pointer) == event
+
+    def test_offload_identity(self):
+        claims = claimcheck.ClaimCheck(self.store, threshold=1024, compress=False)
+        event = {"type": "view_submission", "view": {"blocks": ["fizz"] * 1000}}
+        pointer = claims.encode(event)
+        assert pointer[claimcheck.CLAIM_KEY]["encoding"] == "identity"
+        assert claims.decode(pointer) == event
+
+    def test_no_store(self):
+        claims = claimcheck.ClaimCheck(threshold=1024)
+        event = submission(4096)
+        assert claims.encode(event) is event
+
+    def test_missing(self):
+        pointer = self.claims.encode(submission(4096))
+        os.remove(os.path.join(self.store.root, pointer[claimcheck.CLAIM_KEY]["key"]))
+        with pytest.raises(claimcheck.ClaimError):
+            self.claims.decode(pointer)
+
+    def test_lazy(self):
+        event = submission(4096)
+        lazy = self.claims.resolve(self.claims.encode(event))
+        assert lazy["type"] == "view_submission"
+        assert not lazy.resolved
+        assert lazy["view"]["callback_id"] == "big"
+        assert lazy.resolved
+        assert dict(lazy) == event
+        assert lazy.get("missing") is None
+
+    def test_get_store(self, tmp_path):
+        assert claimcheck.get_store({}) is None
+        store = claimcheck.get_store({"CLAIM_CHECK_DIR": str(tmp_path)})
+        assert isinstance(store, claimcheck.FileStore)
+        store = claimcheck.get_store({"CLAIM_CHECK_BUCKET": "fizz"})
+        assert isinstance(store, claimcheck.S3Store)
+        assert store.client is None
+
+    def test_s3(self):
+        client = mock.MagicMock()
+        store = claimcheck.S3Store("fizz", client)
+        store.put("claims/buzz", b"data")
+        client.put_object.assert_called_once_with(
+            Bucket="fizz", Key="claims/buzz", Body=b"data"
+        )
+        client.get_object.side_effect = Exception("NoSuchKey")
+        with pytest.raises(claimcheck.ClaimError):
+            store.get("claims/buzz")
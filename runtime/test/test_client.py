@@ -0,0 +1,205 @@
+import gzip
+import json
+import shutil
+import ssl
+import subprocess
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from slackbot import client
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if not shutil.which("openssl"):
+        pytest.skip("openssl not installed")
+    path = tmp_path_factory.mktemp("tls")
+    cert, key = path / "cert.pem", path / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        capture_output=True,
+        check=True,
+    )  # fmt: skip
+    return cert, key
+
+
+class Server:
+    """
+    Local HTTPS stand-in that plays back scripted responses.
+    """
+
+    def __init__(self, certificate):
+        self.responses = []
+        self.requests = []
+        self.delay = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            disable_nagle_algorithm = True
+            protocol_version = "HTTP/1.1"
+
+            def respond(self):
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length)
+                server.requests.append((self.command, self.path, self.headers, body))
+                time.sleep(server.delay)
+                status, headers, body = server.responses.pop(0)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = respond
+
+            def log_message(self, *_):
+                pass
+
+        cert, key = certificate
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.url = f"https://localhost:{self.httpd.server_port}"
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.01,), daemon=True
+        )
+        self.thread.start()
+
+    def respond(self, status=200, body=b"{}", **headers):
+        self.responses.append((status, headers, body))
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(certificate):
+    server = Server(certificate)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def slack(certificate, server):
+    context = ssl.create_default_context(cafile=certificate[0])
+    sleep = mock.MagicMock()
+    slack = client.Client(server.url, context=context, sleep=sleep)
+    yield slack
+    slack.close()
+
+
+class TestClient:
+    def test_keep_alive(self, server, slack):
+        server.respond(body=b'{"ok": true}')
+        server.respond(body=b'{"ok": false}')
+        assert slack.post("/api/fizz", b"a=1").json() == {"ok": True}
+        assert slack.get("/api/buzz").json() == {"ok": False}
+        assert slack.connections == 1
+        assert [x[:2] for x in server.requests] == [
+            ("POST", "/api/fizz"),
+            ("GET", "/api/buzz"),
+        ]
+
+    def test_reconnect(self, server, slack):
+        server.respond()
+        server.respond()
+        slack.get("/")
+        slack.connection.sock.close()
+        slack.get("/")
+        assert slack.connections == 2
+        assert len(server.requests) == 2
+
+    def test_gzip(self, server, slack):
+        server.respond(body=gzip.compress(b"fizz"), **{"content-encoding": "gzip"})
+        assert slack.get("/").text == "fizz"
+        assert server.requests[0][2]["accept-encoding"] == "gzip"
+
+    def test_retry(self, server, slack):
+        server.respond(503)
+        server.respond(429, **{"retry-after": "0.5"})
+        server.respond(body=b'{"ok": true}')
+        assert slack.post("/", b"").json() == {"ok": True}
+        assert len(server.requests) == 3
+        assert slack.sleep.call_count == 2
+        assert slack.sleep.call_args_list[1] == mock.call(0.5)
+
+    def test_retry_exhausted(self, server, slack):
+        for _ in range(3):
+            server.respond(500, b"oops")
+        with pytest.raises(client.HTTPError) as err:
+            slack.get("/")
+        assert err.value.response.status == 500
+        assert err.value.response.text == "oops"
+
+    def test_retry_after_deadline(self, server, slack):
+        server.respond(429, **{"retry-after": "30"})
+        with pytest.raises(client.HTTPError):
+            slack.get("/", deadline=time.monotonic() + 1)
+        slack.sleep.assert_not_called()
+
+    def test_not_retried(self, server, slack):
+        server.respond(404)
+        with pytest.raises(client.HTTPError):
+            slack.get("/")
+        assert len(server.requests) == 1
+
+    def test_timeout(self, server, slack):
+        server.delay = 0.5
+        server.respond()
+        with pytest.raises(client.Timeout):
+            slack.get("/", deadline=time.monotonic() + 0.1)
+        assert slack.connection is None
+
+    def test_deadline_passed(self, slack):
+        with pytest.raises(client.Timeout):
+            slack.get("/", deadline=time.monotonic() - 1)
+
+    def test_connection_refused(self, certificate):
+        slack = client.Client("https://localhost:1", sleep=mock.MagicMock())
+        with pytest.raises(ConnectionRefusedError):
+            slack.get("/")
+        assert slack.connections == 3
+
+    def test_untrusted(self, server):
+        server.respond()
+        with pytest.raises(ssl.SSLCertVerificationError):
+            client.Client(server.url, retries=0).get("/")
+
+
+class TestHelpers:
+    def test_deadline(self):
+        context = mock.MagicMock()
+        context.get_remaining_time_in_millis.return_value = 3000
+        with mock.patch("slackbot.client.time.monotonic", return_value=100):
+            assert client.deadline(context) == 102.75
+            assert client.deadline() == 109.75
+
+    @pytest.mark.parametrize(
+        ("value", "expected"),
+        [
+            (None, None),
+            ("2", 2.0),
+            ("-1", 0.0),
+            ("soon", None),
+            (formatdate(1010, usegmt=True), 10.0),
+        ],
+    )
+    def test_retry_after(self, value, expected):
+        assert client.retry_after(value, now=1000) == expected
+
+    def test_decode(self):
+        assert client.decode(gzip.compress(b"fizz"), "gzip") == b"fizz"
+        assert client.decode(json.dumps(1).encode()) == b"1"
@@ -0,0 +1,275 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from slackbot import coalesce
+
+
+class TestKeys:
+    @pytest.mark.parametrize(
+        ("event", "expected"),
+        [
+            (
+                {"container": {"channel_id": "C1", "message_ts": "1.2"}},
+                "message:C1:1.2",
+            ),
+            (
+                {"channel": {"id": "C1"}, "message": {"ts": "1.2"}},
+                "message:C1:1.2",
+            ),
+            (
+                {"channel": {"id": "C1"}, "response_url": "https://example.com/"},
+                "response_url:https://example.com/",
+            ),
+        ],
+    )
+    def test_update_key(self, event, expected):
+        assert coalesce.update_key(event) == expected
+
+    @pytest.mark.parametrize(
+        ("event", "expected"),
+        [
+            ({"actions": [{"action_ts": "1234567890.123456"}]}, 1234567890.123456),
+            ({"actions": [{"action_ts": "fizz"}]}, 42),
+            ({"actions": [{}]}, 42),
+            ({}, 42),
+        ],
+    )
+    def test_version_of(self, event, expected):
+        assert coalesce.version_of(event, lambda: 42) == expected
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, dynamodb):
+    if request.param == "memory":
+        return coalesce.MemoryStore()
+    if request.param == "sqlite":
+        return coalesce.SQLiteStore()
+    return coalesce.DynamoDBStore("coalesce", dynamodb)
+
+
+class TestStore:
+    def test_offer(self, store):
+        assert store.latest("fizz") is None
+        assert store.offer("fizz", 2, 100) is True
+        assert store.offer("fizz", 1, 100) is False
+        assert store.offer("fizz", 2, 100) is False
+        assert store.latest("fizz") == 2
+        assert store.offer("fizz", 3, 100) is True
+        assert store.latest("fizz") == 3
+
+    def test_acquire(self, store):
+        store.offer("fizz", 1, 100)
+        assert store.acquire("fizz", 1, 20, 10) is True
+        assert store.acquire("fizz", 1, 20, 10) is False
+        store.release("fizz", 1, True)
+        assert store.acquire("fizz", 1, 20, 10) is False
+
+    def test_acquire_stale(self, store):
+        store.offer("fizz", 1, 100)
+        store.offer("fizz", 2, 100)
+        assert store.acquire("fizz", 1, 20, 10) is False
+        assert store.acquire("fizz", 2, 20, 10) is True
+
+    def test_acquire_leased(self, store):
+        store.offer("fizz", 1, 100)
+        assert store.acquire("fizz", 1, 20, 10) is True
+        store.offer("fizz", 2, 100)
+        assert store.acquire("fizz", 2, 30, 15) is False
+        assert store.acquire("fizz", 2, 40, 20) is True
+
+    def test_release_failed(self, store):
+        store.offer("fizz", 1, 100)
+        store.acquire("fizz", 1, 20, 10)
+        store.release("fizz", 1, False)
+        assert store.acquire("fizz", 1, 20, 10) is True
+
+    def test_never_older(self, store):
+        store.offer("fizz", 1, 100)
+        store.acquire("fizz", 1, 20, 10)
+        store.offer("fizz", 2, 100)
+        store.release("fizz", 1, True)
+        assert store.acquire("fizz", 2, 20, 10) is True
+        store.release("fizz", 2, True)
+        assert store.offer("fizz", 1, 100) is False
+        assert store.acquire("fizz", 1, 20, 10) is False
+
+
+class TestMemoryStore:
+    def test_lru(self):
+        store = coalesce.MemoryStore(maxsize=2)
+        store.offer("a", 1, 10)
+        store.offer("b", 1, 10)
+        store.offer("a", 2, 10)
+        store.offer("c", 1, 10)
+        assert list(store.keys) == ["a", "c"]
+
+    def test_wait(self):
+        store = coalesce.MemoryStore()
+        store.offer("fizz", 1, 100)
+        store.acquire("fizz", 1, 20, 10)
+        timer = threading.Timer(0.01, store.release, ("fizz", 1, True))
+        timer.start()
+        start = time.monotonic()
+        store.wait("fizz", 5)
+        timer.join()
+        assert time.monotonic() - start < 5
+
+
+class TestSQLiteStore:
+    def test_shared(self, tmp_path):
+        path = tmp_path / "coalesce.db"
+        assert coalesce.SQLiteStore(path).offer("fizz", 2, 100)
+        assert not coalesce.SQLiteStore(path).offer("fizz", 1, 100)
+
+    def test_purge(self):
+        store = coalesce.SQLiteStore()
+        store.offer("fizz", 1, 110)
+        store.purge(110)
+        assert store.db.execute("SELECT COUNT(*) FROM coalesce").fetchone() == (0,)
+
+
+class TestDynamoDBStore:
+    def test_expires(self, dynamodb):
+        store = coalesce.DynamoDBStore("coalesce", dynamodb)
+        store.offer("fizz", 1234567890.123456, 110.5)
+        assert dynamodb.item("coalesce", "fizz") == {
+            "key": "fizz",
+            "version": 1234567890.123456,
+            "expires": 110,
+            "sent": 0,
+            "lease": 0,
+        }
+        assert store.latest("fizz") == 1234567890.123456
+
+    def test_release_keeps_holder_of_other(self, dynamodb):
+        store = coalesce.DynamoDBStore("coalesce", dynamodb)
+        store.offer("fizz", 1, 100)
+        store.acquire("fizz", 1, 20, 10)
+        store.release("fizz", 2, True)
+        item = dynamodb.item("coalesce", "fizz")
+        assert item["holder"] == 1
+        assert item["sent"] == 0
+
+    def test_client(self):
+        boto3 = mock.MagicMock()
+        with mock.patch.dict("sys.modules", {"boto3": boto3}):
+            store = coalesce.get_store({"COALESCE_TABLE": "fizz"})
+        assert isinstance(store, coalesce.DynamoDBStore)
+        assert store.table_name == "fizz"
+        assert store.client is boto3.client.return_value
+        boto3.client.assert_called_once_with("dynamodb")
+
+
+class TestCoalescer:
+    def setup_method(self):
+        self.now = 100
+        self.sleeps = []
+        self.coalescer = coalesce.Coalescer(
+            window=0.25,
+            clock=lambda: self.now,
+            sleep=self.sleep,
+        )
+        self.sent = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    def post(self, version):
+        return lambda: self.sent.append(version)
+
+    def test_send(self):
+        assert self.coalescer.send("fizz", 1, self.post(1)) is True
+        assert self.sleeps == [0.25]
+        assert self.sent == [1]
+
+    def test_send_superseded(self):
+        def sleep(seconds):
+            self.coalescer.store.offer("fizz", 2, 200)
+
+        self.coalescer.sleep = sleep
+        assert self.coalescer.send("fizz", 1, self.post(1)) is False
+        assert self.sent == []
+
+    def test_send_stale(self):
+        self.coalescer.send("fizz", 2, self.post(2))
+        assert self.coalescer.send("fizz", 1, self.post(1)) is False
+        assert self.coalescer.send("fizz", 2, self.post(2)) is False
+        assert self.sent == [2]
+
+    def test_send_no_window(self):
+        self.coalescer.window = 0
+        assert self.coalescer.send("fizz", 1, self.post(1)) is True
+        assert self.sleeps == []
+
+    def test_send_error(self):
+        def post():
+            raise ValueError("down")
+
+        with pytest.raises(ValueError):
+            self.coalescer.send("fizz", 1, post)
+        assert self.coalescer.store.keys["fizz"]["holder"] is None
+        assert self.coalescer.store.keys["fizz"]["sent"] == 0
+
+    def test_send_in_flight(self):
+        store = self.coalescer.store
+        store.offer("fizz", 1, 200)
+        store.acquire("fizz", 1, 110, 100)
+        with mock.patch.object(store, "wait") as mock_wait:
+            mock_wait.side_effect = lambda *_: store.release("fizz", 1, True)
+            assert self.coalescer.send("fizz", 2, self.post(2)) is True
+        mock_wait.assert_called_once_with("fizz", 0.0625)
+        assert self.sent == [2]
+
+    def test_send_deadline(self):
+        store = self.coalescer.store
+        store.offer("fizz", 1, 200)
+        store.acquire("fizz", 1, 110, 100)
+        deadline = time.monotonic()
+        assert self.coalescer.send("fizz", 2, self.post(2), deadline) is False
+        assert self.sent == []
+
+    @mock.patch("slackbot.coalesce.logger")
+    def test_metric(self, mock_logger):
+        self.coalescer.send("fizz", 2, self.post(2))
+        self.coalescer.send("fizz", 1, self.post(1))
+        assert [x.args for x in mock_logger.putMetric.call_args_list] == [
+            ("update_coalesced", 0, "Count"),
+            ("update_coalesced", 1, "Count"),
+        ]
+
+    def test_get_store(self, tmp_path):
+        get = coalesce.get_store
+        assert isinstance(get({}), coalesce.MemoryStore)
+        db = str(tmp_path / "coalesce.db")
+        assert isinstance(get({"COALESCE_DB": db}), coalesce.SQLiteStore)
+
+    @pytest.mark.parametrize(
+        ("store", "window"),
+        [
+            (coalesce.MemoryStore, 0),
+            (coalesce.SQLiteStore, coalesce.WINDOW),
+            (
+                lambda: coalesce.DynamoDBStore("coalesce", mock.Mock()),
+                coalesce.WINDOW,
+            ),
+        ],
+        ids=["memory", "sqlite", "dynamodb"],
+    )
+    def test_default_window(self, store, window):
+        assert coalesce.Coalescer(store()).window == window
+        assert coalesce.Coalescer(store(), window=0.1).window == 0.1
+
+    def test_send_shared(self, dynamodb):
+        other = coalesce.Coalescer(coalesce.DynamoDBStore("coalesce", dynamodb), 0)
+
+        # A newer click handled by another instance during the window
+        def sleep(seconds):
+            assert other.send("fizz", 2, self.post(2))
+
+        store = coalesce.DynamoDBStore("coalesce", dynamodb)
+        coalescer = coalesce.Coalescer(store, sleep=sleep)
+        assert coalescer.send("fizz", 1, self.post(1)) is False
+        assert self.sent == [2]
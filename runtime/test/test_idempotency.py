@@ -0,0 +1,129 @@
+from unittest import mock
+
+import pytest
+
+from slackbot import idempotency
+
+
+class TestRequestKey:
+    def test_event_id(self):
+        event = {"type": "event_callback", "event_id": "Ev123"}
+        assert idempotency.request_key(event, "v0=abc", "1") == "event:Ev123"
+
+    def test_signature(self):
+        event = {"type": "block_actions"}
+        assert idempotency.request_key(event, "v0=abc", "1") == "request:1:v0=abc"
+        assert idempotency.request_key(True, "v0=abc", "1") == "request:1:v0=abc"
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, dynamodb):
+    if request.param == "memory":
+        return idempotency.MemoryStore()
+    if request.param == "sqlite":
+        return idempotency.SQLiteStore()
+    return idempotency.DynamoDBStore("idempotency", dynamodb)
+
+
+class TestStore:
+    def test_add(self, store):
+        assert store.add("fizz", 110, 100) is True
+        assert store.add("fizz", 120, 105) is False
+        assert store.add("buzz", 120, 105) is True
+
+    def test_expired(self, store):
+        assert store.add("fizz", 110, 100) is True
+        assert store.add("fizz", 120, 110) is True
+        assert store.add("fizz", 130, 115) is False
+
+    def test_commit(self, store):
+        assert store.add("fizz", 110, 100) is True
+        store.commit("fizz", 200)
+        assert store.add("fizz", 210, 150) is False
+        assert store.add("fizz", 210, 200) is True
+
+    def test_commit_missing(self, store):
+        store.commit("fizz", 200)
+        assert store.add("fizz", 110, 100) is True
+
+    def test_delete(self, store):
+        assert store.add("fizz", 110, 100) is True
+        store.delete("fizz")
+        store.delete("buzz")
+        assert store.add("fizz", 110, 100) is True
+
+
+class TestMemoryStore:
+    def test_lru(self):
+        store = idempotency.MemoryStore(maxsize=2)
+        store.add("a", 10, 0)
+        store.add("b", 10, 0)
+        store.add("a", 10, 0)
+        store.add("c", 10, 0)
+        assert list(store.keys) == ["a", "c"]
+
+
+class TestSQLiteStore:
+    def test_shared(self, tmp_path):
+        path = tmp_path / "idempotency.db"
+        assert idempotency.SQLiteStore(path).add("fizz", 110, 100)
+        assert not idempotency.SQLiteStore(path).add("fizz", 110, 100)
+
+    def test_purge(self):
+        store = idempotency.SQLiteStore()
+        store.add("fizz", 110, 100)
+        store.purge(110)
+        assert store.db.execute("SELECT COUNT(*) FROM idempotency").fetchone() == (0,)
+
+
+class TestIdempotency:
+    def setup_method(self):
+        self.now = 100
+        self.seen = idempotency.Idempotency(ttl=60, pending=10, clock=lambda: self.now)
+
+    def test_claim(self):
+        self.seen.claim("fizz")
+        with pytest.raises(idempotency.Duplicate):
+            self.seen.claim("fizz")
+        self.now = 110
+        self.seen.claim("fizz")
+
+    def test_commit(self):
+        self.seen.claim("fizz")
+        self.seen.commit("fizz")
+        self.now = 159
+        with pytest.raises(idempotency.Duplicate):
+            self.seen.claim("fizz")
+        self.now = 160
+        self.seen.claim("fizz")
+
+    def test_release(self):
+        self.seen.claim("fizz")
+        self.seen.release("fizz")
+        self.seen.claim("fizz")
+
+    @mock.patch("slackbot.idempotency.logger")
+    def test_metric(self, mock_logger):
+        self.seen.claim("fizz")
+        with pytest.raises(idempotency.Duplicate):
+            self.seen.claim("fizz")
+        assert [x.args for x in mock_logger.putMetric.call_args_list] == [
+            ("dedupe_hit", 0, "Count"),
+            ("dedupe_hit", 1, "Count"),
+        ]
+
+    def test_store_error(self):
+        store = mock.MagicMock()
+        store.add.side_effect = Exception("down")
+        store.commit.side_effect = Exception("down")
+        store.delete.side_effect = Exception("down")
+        seen = idempotency.Idempotency(store)
+        seen.claim("fizz")
+        seen.commit("fizz")
+        seen.release("fizz")
+
+    def test_get_store(self, tmp_path):
+        get = idempotency.get_store
+        assert isinstance(get({}), idempotency.MemoryStore)
+        db = str(tmp_path / "idempotency.db")
+        assert isinstance(get({"IDEMPOTENCY_DB": db}), idempotency.SQLiteStore)
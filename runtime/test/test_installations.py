@@ -0,0 +1,166 @@
+from unittest import mock
+
+import pytest
+
+from slackbot import installations
+from slackbot.installations import Installation
+
+RESULT = {
+    "ok": True,
+    "app_id": "A0123456789",
+    "authed_user": {"id": "U0123456789"},
+    "scope": "chat:write,commands",
+    "token_type": "bot",
+    "access_token": "xoxb-fizz",
+    "bot_user_id": "U9876543210",
+    "team": {"name": "Fizz", "id": "T0123456789"},
+    "enterprise": None,
+    "is_enterprise_install": False,
+}
+
+
+def installation(team_id="T1", enterprise_id=None, bot_token="xoxb-fizz"):
+    return Installation(
+        team_id=team_id,
+        enterprise_id=enterprise_id,
+        bot_token=bot_token,
+        installed_at="2025-01-01T00:00:00+00:00",
+    )
+
+
+class TestInstallation:
+    def test_from_oauth(self):
+        installation = Installation.from_oauth(RESULT)
+        assert installation.key == "-:T0123456789"
+        assert installation.bot_token == "xoxb-fizz"
+        assert installation.bot_user_id == "U9876543210"
+        assert installation.app_id == "A0123456789"
+        assert installation.scopes == ["chat:write", "commands"]
+
+    def test_from_oauth_enterprise(self):
+        result = {
+            **RESULT,
+            "team": None,
+            "enterprise": {"name": "Buzz", "id": "E0123456789"},
+            "is_enterprise_install": True,
+        }
+        installation = Installation.from_oauth(result)
+        assert installation.key == "E0123456789:-"
+
+    def test_dict(self):
+        installation = Installation.from_oauth(RESULT)
+        assert Installation.from_dict(installation.to_dict()) == installation
+        assert repr(installation) == "<Installation -:T0123456789>"
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, tmp_path, dynamodb):
+    if request.param == "memory":
+        return installations.MemoryStore()
+    if request.param == "sqlite":
+        return installations.SQLiteStore(str(tmp_path / "installations.db"))
+    return installations.DynamoDBStore("installations", client=dynamodb)
+
+
+class TestStore:
+    def test_crud(self, store):
+        assert store.get("-:T1") is None
+        store.put(installation())
+        assert store.get("-:T1") == installation()
+        store.put(installation(bot_token="xoxb-buzz"))
+        assert store.get("-:T1").bot_token == "xoxb-buzz"
+        store.delete("-:T1")
+        assert store.get("-:T1") is None
+
+    def test_find(self, store):
+        store.put(installation("T1", "E1", "xoxb-team"))
+        store.put(installation(None, "E1", "xoxb-org"))
+        assert store.token("T1", "E1") == "xoxb-team"
+        assert store.token("T2", "E1") == "xoxb-org"
+        assert store.token("T2") is None
+
+    def test_interface(self):
+        store = installations.Store()
+        for method, args in (("get", ["-:T1"]), ("put", [None]), ("delete", ["-"])):
+            with pytest.raises(NotImplementedError):
+                getattr(store, method)(*args)
+
+
+class TestCachedStore:
+    def setup_method(self):
+        self.now = 0
+        self.backend = mock.MagicMock(wraps=installations.MemoryStore())
+        self.store = installations.CachedStore(
+            self.backend, ttl=60, negative_ttl=5, maxsize=3, clock=lambda: self.now
+        )
+
+    def test_ttl(self):
+        self.store.put(installation())
+        assert self.store.token("T1") == "xoxb-fizz"
+        self.backend.get.assert_not_called()
+        self.now = 61
+        assert self.store.token("T1") == "xoxb-fizz"
+        self.backend.get.assert_called_once_with("-:T1")
+
+    def test_negative(self):
+        assert self.store.get("-:T1") is None
+        self.backend.put(installation())
+        assert self.store.get("-:T1") is None
+        assert self.backend.get.call_count == 1
+        self.now = 6
+        assert self.store.get("-:T1") == installation()
+        assert self.backend.get.call_count == 2
+
+    def test_delete(self):
+        self.store.put(installation())
+        self.store.delete("-:T1")
+        assert self.store.get("-:T1") is None
+
+    def test_invalidate(self):
+        self.store.get("-:T1")
+        self.store.get("-:T2")
+        self.store.invalidate("-:T1")
+        assert list(self.store.cache) == ["-:T2"]
+        self.store.invalidate()
+        assert self.store.cache == {}
+
+    def test_maxsize(self):
+        for team_id in ("T1", "T2", "T3"):
+            self.store.get(installations.key(team_id))
+        self.now = 10
+        self.store.put(installation("T4"))
+        self.store.put(installation("T5"))
+        assert list(self.store.cache) == ["-:T4", "-:T5"]
+        self.store.put(installation("T6"))
+        self.store.put(installation("T7"))
+        assert list(self.store.cache) == ["-:T5", "-:T6", "-:T7"]
+
+
+class TestGetStore:
+    def test_memory(self):
+        assert isinstance(installations.get_store({}), installations.MemoryStore)
+
+    def test_sqlite(self, tmp_path):
+        environ = {"INSTALLATIONS_DB": str(tmp_path / "installations.db")}
+        store = installations.get_store(environ)
+        assert isinstance(store, installations.CachedStore)
+        assert isinstance(store.store, installations.SQLiteStore)
+        assert store.ttl == installations.CACHE_TTL
+
+    def test_dynamodb(self):
+        boto3 = mock.MagicMock()
+        with mock.patch.dict("sys.modules", {"boto3": boto3}):
+            store = installations.get_store({"INSTALLATIONS_TABLE": "fizz"})
+        assert isinstance(store, installations.CachedStore)
+        assert store.store.table_name == "fizz"
+        assert store.store.client is boto3.client.return_value
+        boto3.client.assert_called_once_with("dynamodb")
+
+    @pytest.mark.parametrize(("seconds", "ttl"), [("60", 60), ("0", None)])
+    def test_cache_seconds(self, tmp_path, seconds, ttl):
+        environ = {
+            "INSTALLATIONS_DB": str(tmp_path / "installations.db"),
+            "INSTALLATIONS_CACHE_SECONDS": seconds,
+        }
+        store = installations.get_store(environ)
+        assert getattr(store, "ttl", None) == ttl
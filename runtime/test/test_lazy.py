@@ -0,0 +1,78 @@
+import json
+from unittest import mock
+
+import pytest
+
+from slackbot import lazy
+
+
+class TestLazy:
+    def setup_method(self):
+        self.lazy = lazy.Lazy()
+        self.calls = []
+
+        @self.lazy("respond")
+        def respond(event, context=None):
+            self.calls.append(event)
+            return event["n"]
+
+        @self.lazy.handler
+        def handler(event, context=None):
+            return self.lazy.ack({"statusCode": 200}, "respond", event)
+
+        self.handler = handler
+
+    def test_ack(self):
+        assert self.handler({"n": 1}) == {"statusCode": 200}
+        assert self.handler({"n": 2}) == {"statusCode": 200}
+        assert self.calls == []
+        assert self.lazy.queue.messages == [
+            {"_lazy": "respond", "event": {"n": 1}},
+            {"_lazy": "respond", "event": {"n": 2}},
+        ]
+        assert self.lazy.flush() == [1, 2]
+        assert self.calls == [{"n": 1}, {"n": 2}]
+        assert self.lazy.queue.messages == []
+
+    def test_run(self):
+        assert self.handler({"_lazy": "respond", "event": {"n": 3}}) == 3
+        assert self.lazy.queue.messages == []
+
+    def test_unknown(self):
+        with pytest.raises(KeyError):
+            self.lazy.defer("fizz", {})
+
+
+class TestLambdaQueue:
+    def test_client(self):
+        boto3 = mock.MagicMock()
+        with mock.patch.dict("sys.modules", {"boto3": boto3}):
+            queue = lazy.LambdaQueue("fizz")
+        boto3.client.assert_called_once_with("lambda")
+        assert queue.client is boto3.client.return_value
+
+    def test_send(self):
+        client = mock.MagicMock()
+        lazy.LambdaQueue("fizz", client).send("respond", {"n": 1})
+        (call,) = client.invoke.call_args_list
+        assert call.kwargs["FunctionName"] == "fizz"
+        assert call.kwargs["InvocationType"] == "Event"
+        payload = json.loads(call.kwargs["Payload"])
+        assert payload == {"_lazy": "respond", "event": {"n": 1}}
+
+
+class TestGetQueue:
+    def test_memory(self):
+        assert isinstance(lazy.get_queue({}), lazy.MemoryQueue)
+
+    @pytest.mark.parametrize(
+        "environ",
+        [
+            {"AWS_LAMBDA_FUNCTION_NAME": "fizz"},
+            {"AWS_LAMBDA_FUNCTION_NAME": "buzz", "LAZY_FUNCTION_NAME": "fizz"},
+        ],
+    )
+    def test_lambda(self, environ):
+        with mock.patch.dict("sys.modules", {"boto3": mock.MagicMock()}):
+            queue = lazy.get_queue(environ)
+        assert queue.function_name == "fizz"
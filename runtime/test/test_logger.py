@@ -0,0 +1,484 @@
+import asyncio
+import inspect
+import io
+import json
+import logging
+import threading
+from unittest import mock
+
+import pytest
+
+from slackbot import logger as log
+
+
+@pytest.fixture
+def stream():
+    return io.StringIO()
+
+
+def get_logger(stream, name="test-logger", level="INFO", format_string="json"):
+    logging.getLogger(name).handlers.clear()
+    return log.getLogger(name, level, format_string, stream)
+
+
+def records(stream):
+    return [json.loads(x) for x in stream.getvalue().splitlines()]
+
+
+class TestPayload:
+    def test_str(self):
+        payload = log.Payload({"fizz": "buzz"})
+        assert str(payload) == '{"fizz": "buzz"}'
+        assert not payload.truncated
+
+    def test_truncate(self):
+        payload = log.Payload({"fizz": "x" * 100}, max_bytes=10)
+        assert str(payload) == '{"fizz": "…[truncated 102 bytes]'
+        assert payload.truncated
+
+    def test_truncate_bytes(self):
+        payload = log.Payload(None, max_bytes=10)
+        head, marker = payload.truncate("é" * 100).split("…")
+        assert head == "é" * 5
+        assert marker == "[truncated 190 bytes]"
+        assert payload.truncated
+
+    def test_truncate_boundary(self):
+        payload = log.Payload(None, max_bytes=9)
+        head, marker = payload.truncate("é" * 100).split("…")
+        assert head == "é" * 4
+        assert marker == "[truncated 192 bytes]"
+
+    def test_redact(self):
+        payload = log.Payload(
+            {"token": "xoxb", "items": [{"access_token": "xoxp", "ok": True}]},
+            redact={"token", "access_token"},
+        )
+        assert json.loads(str(payload)) == {
+            "token": log.REDACTED,
+            "items": [{"access_token": log.REDACTED, "ok": True}],
+        }
+
+    def test_redact_scalars(self):
+        obj = {"token": 123, "text": 'say "token": "x"', "refresh_token": None}
+        payload = log.Payload(obj, redact={"token", "refresh_token"})
+        assert json.loads(str(payload)) == {
+            "token": log.REDACTED,
+            "text": 'say "token": "x"',
+            "refresh_token": log.REDACTED,
+        }
+
+    def test_redact_nested(self):
+        payload = log.Payload({"body": {"token": "xoxb"}, "ok": True}, redact={"body"})
+        assert json.loads(str(payload)) == {"body": log.REDACTED, "ok": True}
+
+    def test_redact_encoded(self):
+        body = json.dumps({"ok": True, "token": "xoxb", "items": [{"token": "xoxp"}]})
+        payload = log.Payload({"body": body, "text": "[token]"}, redact={"token"})
+        record = json.loads(str(payload))
+        assert "xox" not in str(payload)
+        assert json.loads(record["body"]) == {
+            "ok": True,
+            "token": log.REDACTED,
+            "items": [{"token": log.REDACTED}],
+        }
+        assert record["text"] == "[token]"
+
+    def test_redact_encoded_compact(self):
+        body = json.dumps({"token": "xoxb"}, separators=(",", ":"))
+        payload = log.Payload({"body": {"payload": body}}, redact={"token"})
+        assert "xoxb" not in str(payload)
+
+    def test_redact_encoded_invalid(self):
+        payload = log.Payload({"text": '{"token": "xoxb'}, redact={"token"})
+        assert json.loads(str(payload)) == {"text": '{"token": "xoxb'}
+
+    def test_redact_truncated(self):
+        payload = log.Payload({"token": "x" * 100}, max_bytes=20, redact={"token"})
+        assert str(payload) == '{"token": "[REDACTED…[truncated 3 bytes]'
+
+    @mock.patch("slackbot.logger.json.dumps")
+    def test_lazy(self, mock_dumps, stream):
+        logger = get_logger(stream, level="WARNING")
+        logger.info("EVENT %s", log.Payload({"fizz": "buzz"}))
+        mock_dumps.assert_not_called()
+
+
+class TestJsonFormatter:
+    def test_format(self, stream):
+        logger = get_logger(stream)
+        logger.info("EVENT %s", log.Payload({"fizz": "buzz"}))
+        logger.info("Hello, %s!", "world")
+        first, second = records(stream)
+        assert first["message"] == "EVENT"
+        assert first["payload"] == {"fizz": "buzz"}
+        assert second["message"] == "Hello, world!"
+        assert "payload" not in second
+
+    def test_format_truncated(self, stream):
+        logger = get_logger(stream)
+        logger.info("EVENT %s", log.Payload({"fizz": "x" * 100}, max_bytes=10))
+        (record,) = records(stream)
+        assert record["payload"] == '{"fizz": "…[truncated 102 bytes]'
+
+    def test_format_text(self, stream):
+        logger = get_logger(stream, format_string="%(levelname)s %(message)s")
+        logger.info("EVENT %s", log.Payload({"fizz": "buzz"}))
+        assert stream.getvalue() == 'INFO EVENT {"fizz": "buzz"}\n'
+
+
+class TestBind:
+    def setup_method(self):
+        self.context = mock.MagicMock(aws_request_id="<awsRequestId>")
+
+    def test_bind(self, stream):
+        logger = get_logger(stream)
+        handler = logger.bind(lambda event, context: {"ok": True})
+        assert handler({"fizz": "buzz"}, self.context) == {"ok": True}
+        event, result = records(stream)
+        assert event["requestId"] == "<awsRequestId>"
+        assert event["payload"] == {"fizz": "buzz"}
+        assert result["message"] == "RETURN"
+        assert result["payload"] == {"ok": True}
+        assert logger.context.get() is None
+
+    def test_bind_options(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind(max_bytes=64, redact={"secret"})
+        def handler(event, context):
+            return {"secret": "shh", "token": "xoxb"}
+
+        handler({"fizz": "x" * 100})
+        event, result = records(stream)
+        assert event["payload"].endswith("…[truncated 48 bytes]")
+        assert result["payload"] == {"secret": log.REDACTED, "token": log.REDACTED}
+        assert handler.__name__ == "handler"
+
+    @pytest.mark.parametrize(("rate", "count"), [(0.0, 0), (1.0, 2)])
+    def test_bind_sample(self, stream, rate, count):
+        logger = get_logger(stream)
+        handler = logger.bind(lambda event, context: {}, sample_rate=rate)
+        handler({})
+        assert len(records(stream)) == count
+
+    def test_bind_error(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind(max_bytes=16, sample_rate=0)
+        def handler(event, context):
+            raise ValueError(event)
+
+        with pytest.raises(ValueError):
+            handler({"fizz": "x" * 100, "token": "xoxb"})
+        (record,) = records(stream)
+        assert record["level"] == "ERROR"
+        assert record["payload"] == {"fizz": "x" * 100, "token": log.REDACTED}
+
+    def test_bind_expected(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind(sample_rate=0, expected=(KeyError,))
+        def handler(event, context):
+            raise KeyError("fizz")
+
+        with pytest.raises(KeyError):
+            handler({"fizz": "buzz"})
+        (record,) = records(stream)
+        assert record["level"] == "INFO"
+        assert record["message"] == "KeyError 'fizz'"
+        assert "payload" not in record
+
+    def test_bind_level(self, stream):
+        logger = get_logger(stream, level="WARNING")
+        with mock.patch("slackbot.logger.Payload.__str__") as mock_str:
+            logger.bind(lambda event, context: {})({})
+        mock_str.assert_not_called()
+        assert stream.getvalue() == ""
+
+
+class TestIsCoroutineFunction:
+    class Handler:
+        async def handle(self, event):
+            return event
+
+        def __call__(self, event):
+            return event
+
+    async def handle(self, event):
+        return event
+
+    @pytest.mark.parametrize(
+        "func",
+        [handle, Handler().handle, lambda event: event, Handler(), print],
+        ids=["function", "method", "lambda", "callable", "builtin"],
+    )
+    def test_iscoroutinefunction(self, func):
+        assert log.iscoroutinefunction(func) == inspect.iscoroutinefunction(func)
+
+
+class TestContext:
+    def context(self, request_id):
+        return mock.MagicMock(aws_request_id=request_id)
+
+    def test_async(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind
+        async def handler(event, context):
+            await asyncio.sleep(0.01)
+            logger.info(event["id"])
+            return event
+
+        async def main():
+            return await asyncio.gather(
+                *(handler({"id": x}, self.context(x)) for x in ("fizz", "buzz"))
+            )
+
+        assert asyncio.run(main()) == [{"id": "fizz"}, {"id": "buzz"}]
+        for record in records(stream):
+            if record["message"] in ("fizz", "buzz"):
+                assert record["requestId"] == record["message"]
+        assert inspect.iscoroutinefunction(handler)
+
+    def test_async_error(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind
+        async def handler(event, context):
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            asyncio.run(handler({}, self.context("fizz")))
+        assert records(stream)[-1]["level"] == "ERROR"
+        assert logger.context.get() is None
+
+    def test_threads(self, stream):
+        logger = get_logger(stream)
+        barrier = threading.Barrier(2)
+
+        @logger.bind(sample_rate=0)
+        def handler(event, context):
+            barrier.wait()
+            logger.info(event["id"])
+
+        threads = [
+            threading.Thread(target=handler, args=({"id": x}, self.context(x)))
+            for x in ("fizz", "buzz")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted((x["message"], x["requestId"]) for x in records(stream)) == [
+            ("buzz", "buzz"),
+            ("fizz", "fizz"),
+        ]
+
+    def test_executor(self, stream):
+        logger = get_logger(stream)
+
+        @logger.bind(sample_rate=0)
+        def handler(event, context):
+            with log.ContextThreadPoolExecutor(max_workers=2) as executor:
+                return list(executor.map(logger.info, ["fizz", "buzz"]))
+
+        handler({}, self.context("<awsRequestId>"))
+        assert [x["requestId"] for x in records(stream)] == ["<awsRequestId>"] * 2
+
+    def test_add_drop(self, stream):
+        logger = get_logger(stream)
+        logger.addContext(self.context("fizz")).info("fizz")
+        logger.dropContext().info("buzz")
+        assert [x["requestId"] for x in records(stream)] == ["fizz", "-"]
+
+
+class TestMetrics:
+    def emf(self, capsys):
+        lines = capsys.readouterr().out.splitlines()
+        return [x for x in map(json.loads, lines) if "_aws" in x]
+
+    def test_bind(self, stream, capsys):
+        logger = get_logger(stream)
+        logger.cold = True
+        context = mock.MagicMock(aws_request_id="<awsRequestId>")
+        context.function_name = "slackbot-api-block_actions"
+
+        @logger.bind
+        def handler(event, context):
+            with logger.timer("fizz"):
+                pass
+            logger.putMetric("buzz", 1).putMetric("buzz", 2)
+
+        handler({"actions": [{"action_id": "jazz"}]}, context)
+        handler({"command": "/test"}, context)
+        cold, warm = self.emf(capsys)
+        assert cold["_aws"]["CloudWatchMetrics"] == [
+            {
+                "Namespace": "slackbot",
+                "Dimensions": [["route", "action_id", "start"]],
+                "Metrics": [
+                    {"Name": "fizz", "Unit": "Milliseconds"},
+                    {"Name": "buzz", "Unit": "Milliseconds"},
+                    {"Name": "handler", "Unit": "Milliseconds"},
+                ],
+            }
+        ]
+        assert cold["requestId"] == "<awsRequestId>"
+        assert cold["route"] == "slackbot-api-block_actions"
+        assert cold["action_id"] == "jazz"
+        assert cold["start"] == "cold"
+        assert cold["buzz"] == [1, 2]
+        assert cold["fizz"] >= 0
+        assert warm["action_id"] == "/test"
+        assert warm["start"] == "warm"
+
+    def test_bind_error(self, stream, capsys):
+        logger = get_logger(stream)
+
+        @logger.bind(route="fizz")
+        def handler(event, context):
+            logger.putDimensions(action_id="buzz")
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            handler()
+        (record,) = self.emf(capsys)
+        assert record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [
+            ["route", "start", "action_id"]
+        ]
+        assert record["route"] == "fizz"
+        assert "handler" in record
+
+    def test_timer_decorator(self, stream, capsys):
+        logger = get_logger(stream)
+
+        @logger.timer("fizz")
+        def fizz():
+            return "fizz"
+
+        @logger.timer("buzz")
+        async def buzz():
+            return "buzz"
+
+        @logger.bind
+        def handler(event, context):
+            with log.ContextThreadPoolExecutor() as executor:
+                list(executor.map(lambda _: fizz(), range(3)))
+            return asyncio.run(buzz())
+
+        assert handler() == "buzz"
+        assert fizz() == "fizz"
+        (record,) = self.emf(capsys)
+        assert len(record["fizz"]) == 3
+        assert record["buzz"] >= 0
+
+    def test_disabled(self, stream, capsys):
+        logger = get_logger(stream)
+        logger.namespace = ""
+        logger.bind(lambda event, context: None)()
+        assert self.emf(capsys) == []
+
+
+class TestTrace:
+    def spans(self, capsys):
+        lines = capsys.readouterr().out.splitlines()
+        return [x for x in map(json.loads, lines) if "trace_id" in x]
+
+    def test_bind(self, stream, capsys):
+        logger = get_logger(stream)
+
+        @logger.bind(route="authorizer")
+        def authorizer(event, context):
+            logger.info("fizz")
+            return logger.inject({"trigger_id": "123.456"})
+
+        @logger.bind(route="block_actions")
+        def block_actions(event, context):
+            logger.info("buzz")
+
+        block_actions(authorizer({"execution": "jazz"}, None), None)
+        parent, child = self.spans(capsys)
+        assert parent["name"] == "authorizer"
+        assert parent["annotations"] == {"correlation_id": "123.456"}
+        assert "parent_id" not in parent
+        assert child["name"] == "block_actions"
+        assert child["trace_id"] == parent["trace_id"]
+        assert child["parent_id"] == parent["id"]
+        assert child["start_time"] >= parent["start_time"]
+        assert child["metadata"]["default"]["duration_ms"] >= 0
+        assert [(x["message"], x["correlationId"]) for x in records(stream)] == [
+            ("EVENT", "jazz"),
+            ("fizz", "jazz"),
+            ("RETURN", "123.456"),
+            ("EVENT", "123.456"),
+            ("buzz", "123.456"),
+            ("RETURN", "123.456"),
+        ]
+
+    def test_bind_error(self, stream, capsys):
+        logger = get_logger(stream)
+
+        @logger.bind
+        def handler(event, context):
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            handler({"event_id": "Ev123"})
+        (span,) = self.spans(capsys)
+        assert span["fault"] is True
+        assert span["annotations"] == {"correlation_id": "Ev123"}
+
+    def test_bind_expected(self, stream, capsys):
+        logger = get_logger(stream)
+
+        @logger.bind(expected=(KeyError,))
+        def handler(event, context):
+            raise KeyError
+
+        with pytest.raises(KeyError):
+            handler({"event_id": "Ev123"})
+        (span,) = self.spans(capsys)
+        assert not span.get("fault")
+
+    def test_inject_unbound(self, stream):
+        logger = get_logger(stream)
+        assert logger.inject({"fizz": "buzz"}) == {"fizz": "buzz"}
+
+    def test_disabled(self, stream, capsys):
+        logger = get_logger(stream)
+        logger.spans = False
+        logger.bind(lambda event, context: None)()
+        assert self.spans(capsys) == []
+
+
+class TestGetLogger:
+    @mock.patch.dict(
+        "os.environ",
+        {
+            "LOG_PAYLOAD_MAX_BYTES": "1024",
+            "LOG_REDACT": "fizz,buzz",
+            "LOG_SAMPLE_RATE": "0.5",
+        },
+    )
+    def test_environ(self, stream):
+        logger = get_logger(stream)
+        assert logger.max_bytes == 1024
+        assert logger.sample_rate == 0.5
+        assert logger.redact == {*log.LOG_REDACT, "fizz", "buzz"}
+
+    @mock.patch.dict("os.environ", {"METRICS_NAMESPACE": "fizz"})
+    def test_environ_metrics(self, stream):
+        assert get_logger(stream).namespace == "fizz"
+
+    @mock.patch.dict("os.environ", {"TRACE_SPANS": "false"})
+    def test_environ_spans(self, stream):
+        assert get_logger(stream).spans is False
+
+    @mock.patch.dict("os.environ", {"LOG_FORMAT": "json", "LOG_LEVEL": "DEBUG"})
+    def test_environ_format(self, stream):
+        logging.getLogger("test-environ").handlers.clear()
+        logger = log.getLogger("test-environ", stream=stream)
+        logger.debug("Hello")
+        (record,) = records(stream)
+        assert record["level"] == "DEBUG"
@@ -0,0 +1,76 @@
+import json
+from urllib.parse import quote, urlencode
+
+import pytest
+
+from slackbot import payload
+
+
+def encode(data):
+    return urlencode(data, quote_via=quote)
+
+
+SLASH = {
+    "token": "gIkuvaNzQIHg97ATvDxqgjtO",
+    "team_id": "T0001",
+    "channel_id": "C2147483705",
+    "user_id": "U2147483697",
+    "command": "/test",
+    "text": "94070",
+    "response_url": "https://hooks.slack.com/commands/1234/5678",
+    "trigger_id": "13345224609.738474920.8088930838d88f008e0",
+}
+
+BLOCK_ACTIONS = {
+    "type": "block_actions",
+    "user": {"id": "U2147483697", "name": "jane"},
+    "response_url": "https://hooks.slack.com/actions/T0001/1234/5678",
+    "actions": [
+        {
+            "action_id": "slack_oauth_scopes",
+            "block_id": "slack_oauth_scopes",
+            "selected_option": {"value": "chat:write"},
+        }
+    ],
+}
+
+BLOCK_SUGGESTION = {
+    "type": "block_suggestion",
+    "action_id": "slack_oauth_scopes",
+    "block_id": "slack_oauth_scopes",
+    "value": "chat",
+}
+
+
+class TestParse:
+    def test_slash_command(self):
+        returned = payload.parse(encode(SLASH), "slash_command")
+        assert returned == {**SLASH, "type": "slash_command"}
+
+    @pytest.mark.parametrize("data", [BLOCK_ACTIONS, BLOCK_SUGGESTION])
+    def test_payload(self, data):
+        body = encode({"payload": json.dumps(data)})
+        assert payload.parse(body, "payload") == data
+
+    def test_encoded_plus(self):
+        body = "command=%2Ftest&text=fizz+buzz"
+        assert payload.parse(body, "slash_command")["text"] == "fizz buzz"
+
+    def test_encoded_key(self):
+        assert payload.parse("fizz%3Dbuzz=jazz", "form") == {"fizz=buzz": "jazz"}
+
+    def test_form_blank(self):
+        assert payload.parse("fizz=&buzz=jazz", "form") == {"fizz": "", "buzz": "jazz"}
+
+    def test_json(self):
+        assert payload.parse('{"type": "url_verification"}', "json") == {
+            "type": "url_verification"
+        }
+
+    def test_slash_command_type(self):
+        returned = payload.parse("type=fizz&command=%2Ftest", "slash_command")
+        assert returned == {"type": "slash_command", "command": "/test"}
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            payload.parse("fizz=buzz", "fizz")
@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+
+import pytest
+
+from slackbot import publisher
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code, "Message": code}}
+
+
+class FakeEventBus:
+    """
+    Local EventBridge stand-in that enforces the PutEvents limits.
+
+    ``errors`` maps an entry's ``Detail`` to error codes returned for it on
+    successive attempts; ``throttle`` fails that many whole calls.
+    """
+
+    def __init__(self, errors=None, throttle=0):
+        self.calls = []
+        self.events = []
+        self.errors = {k: list(v) for k, v in (errors or {}).items()}
+        self.throttle = throttle
+
+    def put_events(self, Entries):
+        assert 1 <= len(Entries) <= publisher.MAX_ENTRIES
+        assert sum(map(publisher.entry_size, Entries)) <= publisher.MAX_BYTES
+        self.calls.append([x["Detail"] for x in Entries])
+        if self.throttle:
+            self.throttle -= 1
+            raise ClientError("ThrottlingException")
+        results = []
+        for entry in Entries:
+            errors = self.errors.get(entry["Detail"])
+            if errors:
+                code = errors.pop(0)
+                results.append({"ErrorCode": code, "ErrorMessage": code})
+            else:
+                self.events.append(entry)
+                results.append({"EventId": str(len(self.events))})
+        failed = sum("ErrorCode" in x for x in results)
+        return {"Entries": results, "FailedEntryCount": failed}
+
+
+def entry(detail, size=0):
+    return {
+        "EventBusName": "slackbot",
+        "Source": "slack.example.com",
+        "DetailType": "POST /events",
+        "Detail": json.dumps({"id": detail, "padding": "x" * size}),
+    }
+
+
+def detail(i, size=0):
+    return entry(i, size)["Detail"]
+
+
+class TestEntrySize:
+    def test_entry_size(self):
+        size = publisher.entry_size(
+            {
+                "Source": "fizz",
+                "DetailType": "buzz",
+                "Detail": {"a": 1},
+                "Resources": ["arn"],
+                "Time": "2025-01-01T00:00:00Z",
+            }
+        )
+        assert size == 4 + 4 + len('{"a": 1}') + 3 + 14
+
+
+class TestPublisher:
+    def setup_method(self):
+        self.now = 0
+        self.sleeps = []
+        self.bus = FakeEventBus()
+
+    def publisher(self, **kwargs):
+        return publisher.Publisher(
+            self.bus, clock=lambda: self.now, sleep=self.sleeps.append, **kwargs
+        )
+
+    def test_max_entries(self):
+        with self.publisher() as pub:
+            for i in range(25):
+                pub.put(entry(i))
+            assert [len(x) for x in self.bus.calls] == [10, 10]
+        assert [len(x) for x in self.bus.calls] == [10, 10, 5]
+        assert pub.stats == {"calls": 3, "published": 25, "retried": 0, "failed": 0}
+
+    def test_max_bytes(self):
+        with self.publisher() as pub:
+            for i in range(5):
+                pub.put(entry(i, 100_000))
+        assert [len(x) for x in self.bus.calls] == [2, 2, 1]
+
+    def test_too_large(self):
+        with pytest.raises(ValueError, match="over"):
+            self.publisher().put(entry(0, publisher.MAX_BYTES))
+
+    def test_max_delay(self):
+        pub = self.publisher(max_delay=0.5)
+        pub.put(entry(0))
+        pub.poll()
+        assert self.bus.calls == []
+        self.now = 0.5
+        pub.put(entry(1))
+        assert self.bus.calls == [[detail(0), detail(1)]]
+        pub.put(entry(2))
+        self.now = 1.0
+        pub.poll()
+        assert self.bus.calls[1] == [detail(2)]
+
+    def test_partial_failure(self):
+        self.bus.errors = {
+            detail(1): ["ThrottlingException"],
+            detail(3): ["InternalFailure", "InternalFailure"],
+            detail(5): ["MalformedDetail"],
+        }
+        with self.publisher() as pub:
+            for i in range(6):
+                pub.put(entry(i))
+        assert self.bus.calls == [
+            [detail(i) for i in range(6)],
+            [detail(1), detail(3)],
+            [detail(3)],
+        ]
+        assert pub.failed == [(entry(5), "MalformedDetail")]
+        assert pub.stats == {"calls": 3, "published": 5, "retried": 3, "failed": 1}
+        assert len(self.sleeps) == 2
+        assert self.sleeps[1] > self.sleeps[0] / 2
+
+    def test_retries_exhausted(self):
+        self.bus.errors = {detail(0): ["ThrottlingException"] * 5}
+        with self.publisher(retries=2) as pub:
+            pub.put(entry(0))
+        assert len(self.bus.calls) == 3
+        assert pub.failed == [(entry(0), "ThrottlingException")]
+
+    def test_throttled_call(self):
+        self.bus.throttle = 1
+        with self.publisher() as pub:
+            pub.put(entry(0))
+        assert len(self.bus.calls) == 2
+        assert pub.stats["published"] == 1
+
+    def test_throttled_call_exhausted(self):
+        self.bus.throttle = 5
+        with self.publisher(retries=1) as pub:
+            pub.put(entry(0))
+            pub.put(entry(1))
+        assert pub.failed == [(entry(0), "ThrottlingException")] + [
+            (entry(1), "ThrottlingException")
+        ]
+
+    def test_background(self):
+        pub = publisher.Publisher(self.bus, max_delay=0.02).start(0.005)
+        pub.put(entry(0))
+        for _ in range(100):
+            if self.bus.calls:
+                break
+            time.sleep(0.005)
+        assert self.bus.calls == [[detail(0)]]
+        pub.put(entry(1))
+        pub.close()
+        assert self.bus.calls[-1] == [detail(1)]
+
+    def test_put_during_send(self):
+        sending, done = threading.Event(), threading.Event()
+        put_events = self.bus.put_events
+
+        def slow(Entries):
+            sending.set()
+            done.wait(5)
+            return put_events(Entries)
+
+        self.bus.put_events = slow
+        pub = self.publisher()
+        pub.put(entry(0))
+        flush = threading.Thread(target=pub.flush)
+        flush.start()
+        assert sending.wait(5)
+        put = threading.Thread(target=pub.put, args=(entry(1),))
+        put.start()
+        put.join(1)
+        assert not put.is_alive()
+        assert pub.batch == [entry(1)]
+        done.set()
+        flush.join()
+        pub.close()
+        assert self.bus.calls == [[detail(0)], [detail(1)]]
@@ -0,0 +1,101 @@
+import re
+
+import pytest
+
+from slackbot.router import CHUNK, Router
+
+
+class TestRouter:
+    def setup_method(self):
+        self.router = Router()
+
+    def test_dispatch(self):
+        @self.router.command("/fizz")
+        def fizz(event, arg):
+            return ("fizz", arg)
+
+        assert self.router.dispatch({"command": "/fizz"}, 1) == ("fizz", 1)
+        assert self.router.dispatch({"command": "/buzz"}, default="none") == "none"
+
+    def test_pattern(self):
+        self.router.action(re.compile("fizz:[0-9]+"), lambda _: "fizz")
+        self.router.action(re.compile("buzz:.*"), lambda _: "buzz")
+        assert self.router.dispatch({"action_id": "buzz:1"}) == "buzz"
+        assert self.router.dispatch({"action_id": "fizz:1"}) == "fizz"
+        assert self.router.dispatch({"action_id": "fizz:x"}) is None
+
+    def test_pattern_order(self):
+        self.router.action(re.compile("fizz.*"), lambda _: "first")
+        self.router.action(re.compile("fizz:[0-9]+"), lambda _: "second")
+        assert self.router.dispatch({"action_id": "fizz:1"}) == "first"
+
+    def test_pattern_inline_flags(self):
+        self.router.action(re.compile("buzz"), lambda _: "buzz")
+        self.router.action(re.compile("(?i)fizz.*"), lambda _: "fizz")
+        assert self.router.dispatch({"action_id": "FIZZ:1"}) == "fizz"
+        assert self.router.dispatch({"action_id": "BUZZ"}) is None
+
+    def test_pattern_flags(self):
+        self.router.action(re.compile("fizz", re.IGNORECASE), lambda _: "fizz")
+        self.router.action(re.compile("buzz"), lambda _: "buzz")
+        self.router.action(re.compile("jazz  # comment", re.VERBOSE), lambda _: "jazz")
+        assert self.router.dispatch({"action_id": "FIZZ"}) == "fizz"
+        assert self.router.dispatch({"action_id": "BUZZ"}) is None
+        assert self.router.dispatch({"action_id": "jazz"}) == "jazz"
+
+    def test_pattern_backreference(self):
+        self.router.action(re.compile("(a)b"), lambda _: "ab")
+        self.router.action(re.compile(r"(a)\1"), lambda _: "aa")
+        self.router.action(re.compile(r"(?P<x>b)(?P=x)"), lambda _: "bb")
+        self.router.action(re.compile("c+"), lambda _: "c")
+        assert self.router.dispatch({"action_id": "ab"}) == "ab"
+        assert self.router.dispatch({"action_id": "aa"}) == "aa"
+        assert self.router.dispatch({"action_id": "bb"}) == "bb"
+        assert self.router.dispatch({"action_id": "ccc"}) == "c"
+        assert self.router.dispatch({"action_id": "ba"}) is None
+
+    def test_pattern_compiled_on_register(self):
+        self.router.action(re.compile("fizz"), lambda _: "fizz")
+        matchers, handlers, _ = self.router.compiled["action_id"]
+        assert len(matchers) == len(handlers) == 1
+
+    def test_pattern_chunks(self):
+        for i in range(CHUNK + 1):
+            self.router.action(re.compile(f"fizz{i}"), lambda _, i=i: i)
+        matchers, _, _ = self.router.compiled["action_id"]
+        assert [(offset, combined) for _, offset, combined in matchers] == [
+            (0, True),
+            (CHUNK, True),
+        ]
+        assert self.router.dispatch({"action_id": "fizz0"}) == 0
+        assert self.router.dispatch({"action_id": f"fizz{CHUNK}"}) == CHUNK
+
+    def test_exact_before_pattern(self):
+        self.router.action(re.compile("fizz.*"), lambda _: "pattern")
+        self.router.action("fizz", lambda _: "exact")
+        assert self.router.dispatch({"action_id": "fizz"}) == "exact"
+
+    def test_view_callback(self):
+        self.router.callback("modal", lambda _: "modal")
+        event = {"type": "view_submission", "view": {"callback_id": "modal"}}
+        assert self.router.dispatch(event) == "modal"
+
+    def test_actions(self):
+        self.router.action("fizz", lambda *_: "fizz")
+        self.router.block("buzz", lambda *_: "buzz")
+        event = {
+            "actions": [
+                {"action_id": "fizz"},
+                {"action_id": "x", "block_id": "buzz"},
+                {"action_id": "jazz"},
+            ]
+        }
+        assert [h() for _, h in self.router.actions(event)] == ["fizz", "buzz"]
+
+    def test_lazy(self):
+        self.router.action("dumps", "json:dumps")
+        assert self.router.dispatch({"action_id": "dumps"}) == '{"action_id": "dumps"}'
+
+    def test_unknown_key(self):
+        with pytest.raises(ValueError):
+            self.router.route("fizz", "buzz", lambda _: None)
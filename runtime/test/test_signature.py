@@ -0,0 +1,102 @@
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from unittest import mock
+
+import pytest
+
+from slackbot import signature
+
+
+def legacy_sign(secret, body, ts):
+    data = f"v0:{ts}:{body}".encode()
+    return f"v0={hmac.new(secret.encode(), data, sha256).hexdigest()}"
+
+
+class TestSign:
+    def test_sign(self):
+        returned = signature.sign("FIZZ", "fizz=buzz", "1234567890")
+        expected = legacy_sign("FIZZ", "fizz=buzz", "1234567890")
+        assert returned == expected
+
+    @mock.patch("slackbot.signature.now")
+    def test_sign_now(self, mock_now):
+        mock_now.return_value = 1234567890.9
+        returned = signature.sign("FIZZ", "fizz=buzz")
+        expected = legacy_sign("FIZZ", "fizz=buzz", "1234567890")
+        assert returned == expected
+
+
+class TestSplitSecrets:
+    @pytest.mark.parametrize(
+        ("value", "expected"),
+        [
+            ("FIZZ", ["FIZZ"]),
+            ("NEW,OLD", ["NEW", "OLD"]),
+            ("NEW, OLD", ["NEW", "OLD"]),
+            (" NEW ,\tOLD,", ["NEW", "OLD"]),
+        ],
+    )
+    def test_split_secrets(self, value, expected):
+        assert signature.split_secrets(value) == expected
+
+
+class TestVerifier:
+    def setup_method(self):
+        self.verifier = signature.Verifier("NEW", "OLD")
+
+    def test_no_secrets(self):
+        with pytest.raises(ValueError):
+            signature.Verifier()
+
+    @pytest.mark.parametrize("secret", ["NEW", "OLD"])
+    def test_verify(self, secret):
+        sig = legacy_sign(secret, "fizz=buzz", "1234567890")
+        assert self.verifier.verify(sig, "1234567890", "fizz=buzz")
+
+    def test_verify_bytes(self):
+        sig = legacy_sign("NEW", "fizz=buzz", "1234567890")
+        assert self.verifier.verify(sig, "1234567890", b"fizz=buzz")
+        assert self.verifier.verify(sig, "1234567890", memoryview(b"fizz=buzz"))
+
+    @pytest.mark.parametrize(
+        "sig",
+        [
+            None,
+            "BAD",
+            "v0=BAD",
+            "v1=" + legacy_sign("NEW", "fizz=buzz", "1234567890")[3:],
+            legacy_sign("NEW", "fizz=buzz", "1234567891"),
+            legacy_sign("OTHER", "fizz=buzz", "1234567890"),
+        ],
+    )
+    def test_verify_invalid(self, sig):
+        assert not self.verifier.verify(sig, "1234567890", "fizz=buzz")
+
+    def test_verify_rotation(self):
+        new, old = self.verifier.keys
+        sig = legacy_sign("OLD", "fizz=buzz", "1234567890")
+        assert self.verifier.verify(sig, "1234567890", "fizz=buzz")
+        assert self.verifier.keys == (old, new)
+        assert self.verifier.primary is new
+
+    def test_verify_rotation_concurrent(self):
+        new, old = self.verifier.keys
+        sigs = [
+            legacy_sign(secret, "fizz=buzz", "1234567890")
+            for secret in ["NEW", "OLD"] * 200
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            verified = executor.map(
+                lambda sig: self.verifier.verify(sig, "1234567890", "fizz=buzz"), sigs
+            )
+            assert all(verified)
+        assert sorted(map(id, self.verifier.keys)) == sorted(map(id, (new, old)))
+
+    def test_verify_many(self):
+        requests = [
+            (legacy_sign("NEW", "fizz=buzz", "1234567890"), "1234567890", "fizz=buzz"),
+            (legacy_sign("OLD", "jazz=fuzz", "1234567890"), "1234567890", "jazz=fuzz"),
+            ("v0=00", "1234567890", "fizz=buzz"),
+        ]
+        assert self.verifier.verify_many(requests) == [True, True, False]
@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from slackbot import slack
+from slackbot.client import Timeout
+
+# Fast tiers so pacing shows up in milliseconds: (per minute, burst). The
+# server allows one extra call of slack so client pacing alone never trips it
+TIERS = {2: (600, 2), 3: (6000, 4), 4: (6000, 4), "special": (600, 1)}
+SERVER_TIERS = {2: (600, 3), 3: (6000, 5), 4: (6000, 5), "special": (600, 2)}
+METHOD_TIERS = {"chat.postMessage": "special", "conversations.list": 2}
+
+
+class FakeSlack:
+    """
+    Local Slack Web API stand-in that enforces rate-limit tiers per method
+    and token, answering ``429 Retry-After`` when a bucket runs dry.
+    """
+
+    def __init__(self, tiers=SERVER_TIERS, retry_after="0.05"):
+        self.requests = []
+        self.throttled = 0
+        self.buckets = {}
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            disable_nagle_algorithm = True
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length)
+                method = self.path.removeprefix("/api/")
+                token = self.headers.get("authorization")
+                server.requests.append((method, token, body))
+                tier = METHOD_TIERS.get(method, slack.DEFAULT_TIER)
+                with server.lock:
+                    key = (method, token)
+                    if key not in server.buckets:
+                        per_minute, burst = tiers[tier]
+                        server.buckets[key] = slack.TokenBucket(per_minute / 60, burst)
+                    ok = server.buckets[key].acquire() == 0
+                    server.throttled += not ok
+                if ok:
+                    status, data = 200, json.dumps({"ok": True, "method": method})
+                else:
+                    status, data = (
+                        429,
+                        json.dumps({"ok": False, "error": "ratelimited"}),
+                    )
+                self.send_response(status)
+                if not ok:
+                    self.send_header("retry-after", retry_after)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data.encode())
+
+            def log_message(self, *_):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.01,), daemon=True
+        )
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = FakeSlack()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(server):
+    client = slack.Slack(server.url, tiers=TIERS, method_tiers=METHOD_TIERS)
+    yield client
+    client.close()
+
+
+class TestTokenBucket:
+    def setup_method(self):
+        self.now = 0
+        self.bucket = slack.TokenBucket(2, 2, clock=lambda: self.now)
+
+    def test_reserve(self):
+        assert [self.bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1.0]
+        self.now = 1
+        assert self.bucket.reserve() == 0.5
+
+    def test_acquire(self):
+        assert [self.bucket.acquire() for _ in range(3)] == [0, 0, 0.5]
+        self.now = 0.5
+        assert self.bucket.acquire() == 0
+
+    def test_release(self):
+        self.bucket.reserve()
+        self.bucket.reserve()
+        self.bucket.release()
+        assert self.bucket.acquire() == 0
+
+    def test_pause(self):
+        self.bucket.pause(3)
+        assert self.bucket.acquire() == 3.5
+        self.now = 3.5
+        assert self.bucket.acquire() == 0
+
+
+class TestSlack:
+    def test_api(self, server, client):
+        result = client.api("auth.test", team_id="T1", token="xoxb-T1", fizz="buzz")
+        assert result == {"ok": True, "method": "auth.test"}
+        ((method, token, body),) = server.requests
+        assert (method, token, body) == ("auth.test", "Bearer xoxb-T1", b"fizz=buzz")
+
+    def test_json_body(self, server, client):
+        client.api("views.publish", json_body=True, user_id="U1", view={"type": "home"})
+        (*_, body) = server.requests[0]
+        assert json.loads(body) == {"user_id": "U1", "view": {"type": "home"}}
+
+    def test_queue(self, server, client):
+        start = time.monotonic()
+        for _ in range(4):
+            client.api("conversations.list", team_id="T1", token="xoxb-T1")
+        assert time.monotonic() - start >= 0.2
+        assert server.throttled == 0
+        assert client.stats == {"calls": 4, "queued": 2, "throttled": 0, "rejected": 0}
+
+    def test_fail_fast(self, server, client):
+        client.api("conversations.list", team_id="T1", block=False)
+        client.api("conversations.list", team_id="T1", block=False)
+        with pytest.raises(slack.RateLimited) as err:
+            client.api("conversations.list", team_id="T1", block=False)
+        assert 0 < err.value.retry_after <= 0.1
+        assert len(server.requests) == 2
+        assert client.stats["rejected"] == 1
+
+    def test_deadline(self, client):
+        client.api("chat.postMessage", team_id="T1", channel="C1")
+        deadline = time.monotonic() + 0.01
+        with pytest.raises(slack.RateLimited):
+            client.api(
+                "chat.postMessage", team_id="T1", channel="C1", deadline=deadline
+            )
+        client.api("chat.postMessage", team_id="T1", channel="C2", block=False)
+
+    def test_workspaces(self, server, client):
+        for team_id in ("T1", "T2"):
+            for _ in range(2):
+                token = f"xoxb-{team_id}"
+                client.api(
+                    "conversations.list", team_id=team_id, token=token, block=False
+                )
+        assert len(server.requests) == 4
+
+    def test_throttled(self, server):
+        # Client allows a bigger burst than the server, which pushes back
+        tiers = {**TIERS, 2: (600, 5)}
+        client = slack.Slack(server.url, tiers=tiers, method_tiers=METHOD_TIERS)
+        for _ in range(4):
+            client.api("conversations.list", team_id="T1", token="xoxb-T1")
+        assert client.stats["throttled"] >= 1
+        assert client.stats["calls"] == 4 + client.stats["throttled"]
+        with pytest.raises(slack.RateLimited):
+            client.api("conversations.list", team_id="T1", token="xoxb-T1", block=False)
+        client.pool.close()
+
+    def test_throttled_past_deadline(self, server):
+        tiers = {**TIERS, 2: (600, 5)}
+        client = slack.Slack(server.url, tiers=tiers, method_tiers=METHOD_TIERS)
+        for _ in range(3):
+            client.api("conversations.list", token="xoxb-T1")
+        with pytest.raises(Timeout):
+            deadline = time.monotonic() + 0.02
+            client.api("conversations.list", token="xoxb-T1", deadline=deadline)
+        client.pool.close()
+
+    def test_pool(self, server, client):
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda _: client.api("auth.test"), range(12)))
+        clients = []
+        while not client.pool.idle.empty():
+            clients.append(client.pool.idle.get_nowait())
+        assert 1 <= len(clients) <= 4
+        assert sum(x.connections for x in clients) == len(clients)
+        for x in clients:
+            x.close()
+
+    def test_respond(self, server, client):
+        url = f"{server.url}/actions/T1/1/fizz?x=1"
+        res = client.respond(url, {"text": "buzz"})
+        client.respond(url, b'{"text": "jazz"}')
+        assert res.status == 200
+        assert [(x, y) for x, y, _ in server.requests] == [
+            ("/actions/T1/1/fizz?x=1", None)
+        ] * 2
+        assert [json.loads(x) for *_, x in server.requests] == [
+            {"text": "buzz"},
+            {"text": "jazz"},
+        ]
+        assert client.stats["calls"] == 2
+        (pool,) = client.pools.values()
+        assert pool.idle.qsize() == 1
+        client.close()
+        assert pool.idle.empty()
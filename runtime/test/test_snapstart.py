@@ -0,0 +1,37 @@
+import random
+from unittest import mock
+
+import pytest
+
+from slackbot import snapstart
+
+
+@pytest.fixture
+def hooks():
+    with mock.patch.dict(
+        snapstart.HOOKS, {"before_snapshot": [], "after_restore": []}
+    ) as hooks:
+        yield hooks
+
+
+class TestHooks:
+    def test_run(self, hooks):
+        calls = []
+        snapstart.before_snapshot(lambda: calls.append(1))
+        snapstart.before_snapshot(lambda: calls.append(2))
+        snapstart.run("before_snapshot")
+        snapstart.run("after_restore")
+        assert calls == [1, 2]
+
+    def test_register(self, hooks):
+        register = mock.MagicMock()
+        with mock.patch.dict(snapstart.REGISTER, {"after_restore": register}):
+            func = snapstart.after_restore(lambda: None)
+        register.assert_called_once_with(func)
+
+    def test_reseed(self):
+        random.seed(1234)
+        first = random.random()
+        random.seed(1234)
+        snapstart.reseed()
+        assert random.random() != first
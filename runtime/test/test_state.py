@@ -0,0 +1,75 @@
+import pytest
+
+from slackbot import state
+from slackbot.signature import Verifier, sign
+
+
+class TestStateTokens:
+    def setup_method(self):
+        self.now = 1234567890.9
+        self.tokens = state.StateTokens(
+            Verifier("FIZZ"), ttl=300, clock=lambda: self.now, maxsize=2
+        )
+
+    def test_issue(self):
+        expires, nonce, hexdigest = self.tokens.issue().split(".")
+        assert expires == "1234568190"
+        assert len(nonce) == 22
+        assert len(hexdigest) == 64
+        assert self.tokens.issue() != self.tokens.issue()
+
+    def test_verify(self):
+        token = self.tokens.issue()
+        assert self.tokens.verify(token) is True
+
+    def test_verify_rotated(self):
+        token = self.tokens.issue()
+        tokens = state.StateTokens(Verifier("BUZZ", "FIZZ"), clock=lambda: self.now)
+        assert tokens.verify(token) is True
+
+    def test_issue_after_promote(self):
+        verifier = Verifier("BUZZ", "FIZZ")
+        tokens = state.StateTokens(verifier, clock=lambda: self.now)
+        assert verifier.verify(sign("FIZZ", "fizz=buzz", "1"), "1", "fizz=buzz")
+        token = tokens.issue()
+        assert state.StateTokens(Verifier("BUZZ"), clock=lambda: self.now).verify(token)
+
+    def test_used(self):
+        token = self.tokens.issue()
+        self.tokens.verify(token)
+        with pytest.raises(state.InvalidState, match="already used"):
+            self.tokens.verify(token)
+
+    def test_expired(self):
+        token = self.tokens.issue()
+        self.now += 301
+        with pytest.raises(state.InvalidState, match="expired"):
+            self.tokens.verify(token)
+
+    @pytest.mark.parametrize("token", [None, "", "fizz", "1.2", "x.y.z", "1.2.3.4"])
+    def test_malformed(self, token):
+        with pytest.raises(state.InvalidState):
+            self.tokens.verify(token)
+
+    def test_forged(self):
+        expires, nonce, _ = self.tokens.issue().split(".")
+        other = state.StateTokens(Verifier("BUZZ"), clock=lambda: self.now)
+        _, _, hexdigest = other.issue().split(".")
+        with pytest.raises(state.InvalidState, match="invalid"):
+            self.tokens.verify(f"{expires}.{nonce}.{hexdigest}")
+        with pytest.raises(state.InvalidState, match="invalid"):
+            self.tokens.verify(f"{int(expires) + 1}.{nonce}.{hexdigest}")
+
+    def test_not_a_request_signature(self):
+        hexdigest = sign("FIZZ", "fizz", "1234568190").removeprefix("v0=")
+        with pytest.raises(state.InvalidState, match="invalid"):
+            self.tokens.verify(f"1234568190.fizz.{hexdigest}")
+
+    def test_maxsize(self):
+        first, second = self.tokens.issue(), self.tokens.issue()
+        self.tokens.verify(first)
+        self.tokens.verify(second)
+        self.now += 100
+        self.tokens.verify(self.tokens.issue())
+        assert len(self.tokens.used) == 2
+        assert first.split(".")[1] not in self.tokens.used
@@ -0,0 +1,75 @@
+import pytest
+
+from slackbot import trace
+
+
+class TestIds:
+    def test_trace_id(self):
+        version, epoch, unique = trace.trace_id(1234567890).split("-")
+        assert (version, epoch, len(unique)) == ("1", "499602d2", 24)
+
+    def test_span_id(self):
+        assert len(trace.span_id()) == 16
+        assert trace.span_id() != trace.span_id()
+
+    @pytest.mark.parametrize(
+        ("event", "expected"),
+        [
+            ({"_trace": {"correlation_id": "fizz"}, "trigger_id": "1.2"}, "fizz"),
+            ({"trigger_id": "1.2", "event_id": "Ev1"}, "1.2"),
+            ({"event_id": "Ev1", "execution": "buzz"}, "Ev1"),
+            ({"execution": "buzz"}, "buzz"),
+            ({}, None),
+            (None, None),
+        ],
+    )
+    def test_correlation_id(self, event, expected):
+        assert trace.correlation_id(event) == expected
+
+
+class TestSpan:
+    def test_root(self):
+        span = trace.Span("fizz", {"execution": "buzz"}, now=1234567890)
+        assert span.parent_id is None
+        assert span.correlation_id == "buzz"
+        assert span.trace_id.startswith("1-499602d2-")
+
+    def test_root_without_id(self):
+        span = trace.Span("fizz")
+        assert span.correlation_id == span.trace_id
+
+    def test_inject(self):
+        span = trace.Span("fizz", {"execution": "buzz"})
+        event = span.inject({"trigger_id": "1.2"})
+        assert event == {
+            "trigger_id": "1.2",
+            "_trace": {
+                "correlation_id": "1.2",
+                "trace_id": span.trace_id,
+                "parent_id": span.id,
+            },
+        }
+
+    def test_child(self):
+        parent = trace.Span("fizz")
+        event = parent.inject({"trigger_id": "1.2"})
+        child = trace.Span("buzz", event)
+        assert child.trace_id == parent.trace_id
+        assert child.parent_id == parent.id
+        assert child.correlation_id == "1.2"
+        child.inject({"trigger_id": "3.4"})
+        assert child.correlation_id == "1.2"
+
+    def test_to_dict(self):
+        span = trace.Span("fizz", {"_trace": {"parent_id": "abc"}}, now=1.0)
+        assert span.finish(fault=True, now=1.5).to_dict() == {
+            "name": "fizz",
+            "id": span.id,
+            "trace_id": span.trace_id,
+            "start_time": 1.0,
+            "end_time": 1.5,
+            "parent_id": "abc",
+            "fault": True,
+            "annotations": {"correlation_id": span.trace_id},
+            "metadata": {"default": {"duration_ms": 500.0}},
+        }
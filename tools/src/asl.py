@@ -0,0 +1,384 @@
+"""
+Amazon States Language
+
+Local executor for the ``state-machines/*.asl.yml`` templates. Templates are
+rendered like Terraform's ``templatefile()``, JSONata expressions are
+evaluated with ``jsonata`` and Task resources are bound to the in-process
+stand-ins from ``aws``. Every state is timed so the latency of a pipeline
+can be checked against API Gateway's integration timeout.
+
+:Example:
+
+$ PYTHONPATH=src python src/asl.py slash --input event.json --budget 3000
+"""
+
+import argparse
+import contextlib
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+import jsonata
+from aws import Resources, TaskError
+from functions import ROOT, discover, namespace, runtime
+
+STATE_MACHINES = ROOT / "state-machines"
+
+BUDGET_MS = 3000
+
+VARIABLES = {
+    "account": "123456789012",
+    "region": "us-east-1",
+    "name": "slackbot",
+    "domain_name": "slack.example.com",
+    "event_bus_name": "slackbot",
+    "idempotency_table_name": "slackbot-idempotency",
+    "idempotency_ttl_seconds": 3600,
+    "slack_client_id": "CLIENT_ID",
+    "slack_error_uri": "https://example.com/error",
+    "slack_scope": "",
+    "slack_success_uri": "slack://open",
+    "slack_user_scope": "",
+}
+
+
+class ExecutionFailed(Exception):
+    def __init__(self, error, cause=""):
+        super().__init__(error, cause)
+        self.error = error
+        self.cause = cause
+
+
+def render(template, variables):
+    """
+    Render Terraform-style ``${variable}`` template.
+    """
+
+    def replace(match):
+        return str(variables[match[1]])
+
+    return re.sub(r"\$\{(\w+)\}", replace, template)
+
+
+def evaluate(template, states, variables):
+    """
+    Evaluate ``{% ... %}`` JSONata expressions nested in a template.
+    """
+    if isinstance(template, str):
+        if template.startswith("{%") and template.endswith("%}"):
+            bindings = {**variables, "states": states}
+            value = jsonata.evaluate(template[2:-2], bindings)
+            return None if value is jsonata.undefined else value
+        return template
+    if isinstance(template, dict):
+        obj = {}
+        for key, value in template.items():
+            value = evaluate(value, states, variables)
+            if value is not jsonata.undefined:
+                obj[key] = value
+        return obj
+    if isinstance(template, list):
+        return [evaluate(x, states, variables) for x in template]
+    return template
+
+
+class Execution:
+    """
+    Result of a local state machine execution.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "RUNNING"
+        self.output = None
+        self.error = None
+        self.cause = None
+        self.timings = []
+        self.duration_ms = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, path, kind, start, end, status):
+        with self.lock:
+            self.timings.append(
+                {
+                    "state": path,
+                    "type": kind,
+                    "start_ms": round((start - self.started) * 1000, 3),
+                    "duration_ms": round((end - start) * 1000, 3),
+                    "status": status,
+                }
+            )
+
+    def over_budget(self, budget_ms=BUDGET_MS):
+        return self.duration_ms > budget_ms
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "output": self.output,
+            "error": self.error,
+            "cause": self.cause,
+            "duration_ms": round(self.duration_ms, 3),
+            "timings": sorted(self.timings, key=lambda x: x["start_ms"]),
+        }
+
+    def report(self, budget_ms=BUDGET_MS):
+        """
+        Format per-state timing table.
+        """
+        lines = [f"{'STATE':<48} {'TYPE':<9} {'START':>10} {'MS':>10} {'%':>6}"]
+        for timing in self.to_dict()["timings"]:
+            share = timing["duration_ms"] / budget_ms * 100
+            lines.append(
+                f"{timing['state']:<48} {timing['type']:<9} "
+                f"{timing['start_ms']:>10.3f} {timing['duration_ms']:>10.3f} {share:>5.1f}%"
+            )
+        verdict = "OVER BUDGET" if self.over_budget(budget_ms) else "OK"
+        lines.append(
+            f"{self.status} in {self.duration_ms:.3f} ms of {budget_ms} ms budget ({verdict})"
+        )
+        return "\n".join(lines)
+
+
+class StateMachine:
+    """
+    Local JSONata state machine.
+    """
+
+    def __init__(self, definition, resources, name="local", sleep=time.sleep):
+        if definition.get("QueryLanguage") != "JSONata":
+            raise ValueError("Only JSONata state machines are supported")
+        self.definition = definition
+        self.resources = resources
+        self.name = name
+        self.sleep = sleep
+
+    @classmethod
+    def load(cls, path, resources, variables=None, **kwargs):
+        """
+        Load and render ``*.asl.yml`` template.
+        """
+        path = Path(path)
+        if not path.exists():
+            path = STATE_MACHINES / f"{path}.asl.yml"
+        name = path.name.removesuffix(".asl.yml")
+        template = render(path.read_text(), {**VARIABLES, **(variables or {})})
+        return cls(yaml.safe_load(template), resources, name, **kwargs)
+
+    def execute(self, payload, name=None):
+        """
+        Run state machine to completion and return ``Execution``.
+        """
+        execution = Execution(name or str(uuid.uuid4()))
+        execution.started = time.perf_counter()
+        context = {
+            "Execution": {
+                "Id": execution.name,
+                "Name": execution.name,
+                "Input": payload,
+            },
+            "StateMachine": {"Name": self.name},
+        }
+        try:
+            execution.output = self.run(
+                self.definition, payload, {}, execution, context, ""
+            )
+            execution.status = "SUCCEEDED"
+        except (ExecutionFailed, TaskError) as err:
+            execution.status = "FAILED"
+            execution.error = err.error
+            execution.cause = err.cause
+        execution.duration_ms = (time.perf_counter() - execution.started) * 1000
+        return execution
+
+    def run(self, graph, payload, variables, execution, context, prefix):
+        state_name = graph["StartAt"]
+        while True:
+            state = graph["States"][state_name]
+            path = f"{prefix}{state_name}"
+            start = time.perf_counter()
+            status = "SUCCEEDED"
+            try:
+                payload, state_name = self.step(
+                    state_name, state, payload, variables, execution, context, path
+                )
+            except (ExecutionFailed, TaskError):
+                status = "FAILED"
+                raise
+            finally:
+                execution.record(
+                    path, state["Type"], start, time.perf_counter(), status
+                )
+            if state_name is None:
+                return payload
+
+    def step(self, state_name, state, payload, variables, execution, context, path):
+        kind = state["Type"]
+        context = {**context, "State": {"Name": state_name}}
+        states = {"input": payload, "context": context}
+
+        if kind == "Choice":
+            for choice in state.get("Choices", []):
+                if evaluate(choice["Condition"], states, variables):
+                    return self.transition(choice, state, states, variables, payload)
+            if "Default" not in state:
+                raise ExecutionFailed("States.NoChoiceMatched", f"{state_name}")
+            return self.transition(state, state, states, variables, payload, "Default")
+
+        if kind == "Fail":
+            raise ExecutionFailed(
+                state.get("Error", "States.Fail"), state.get("Cause", "")
+            )
+
+        if kind == "Wait":
+            seconds = evaluate(state.get("Seconds", 0), states, variables)
+            self.sleep(seconds)
+            return self.transition(state, state, states, variables, payload)
+
+        if kind in ("Pass", "Succeed"):
+            return self.transition(state, state, states, variables, payload)
+
+        if kind == "Task":
+            arguments = evaluate(state.get("Arguments", payload), states, variables)
+            try:
+                result = self.resources.invoke(state["Resource"], arguments)
+            except TaskError as err:
+                return self.catch(state, states, variables, err)
+            states = {**states, "result": result}
+            return self.transition(state, state, states, variables, result)
+
+        if kind == "Parallel":
+            arguments = evaluate(state.get("Arguments", payload), states, variables)
+            branches = state["Branches"]
+            with ThreadPoolExecutor(max_workers=len(branches)) as executor:
+                futures = [
+                    executor.submit(
+                        self.run,
+                        branch,
+                        arguments,
+                        dict(variables),
+                        execution,
+                        context,
+                        f"{path}/{i}/",
+                    )
+                    for i, branch in enumerate(branches)
+                ]
+                try:
+                    result = [future.result() for future in futures]
+                except (ExecutionFailed, TaskError) as err:
+                    return self.catch(state, states, variables, err)
+            states = {**states, "result": result}
+            return self.transition(state, state, states, variables, result)
+
+        raise ExecutionFailed("States.Runtime", f"Unsupported state type: {kind}")
+
+    def catch(self, state, states, variables, err):
+        for catcher in state.get("Catch", []):
+            errors = catcher["ErrorEquals"]
+            if err.error in errors or "States.ALL" in errors:
+                error_output = {"Error": err.error, "Cause": err.cause}
+                states = {**states, "errorOutput": error_output}
+                return self.transition(
+                    catcher, catcher, states, variables, error_output
+                )
+        raise err
+
+    def transition(self, rule, state, states, variables, default, next_key="Next"):
+        if "Assign" in rule:
+            variables.update(evaluate(rule["Assign"], states, variables))
+        output = (
+            evaluate(rule["Output"], states, variables) if "Output" in rule else default
+        )
+        if next_key == "Next" and state.get("End"):
+            return output, None
+        return output, rule.get(next_key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a state machine locally")
+    parser.add_argument("template", help="state machine name or path to *.asl.yml")
+    parser.add_argument(
+        "-i", "--input", default="-", help="input JSON file (default: stdin)"
+    )
+    parser.add_argument(
+        "-b", "--budget", type=float, default=BUDGET_MS, help="budget in ms"
+    )
+    parser.add_argument("--json", action="store_true", help="print execution as JSON")
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="SERVICE=SECONDS",
+        help="simulated overhead per lambda/events/dynamodb/states call",
+    )
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="template variable override",
+    )
+    args = parser.parse_args(argv)
+
+    variables = dict(x.split("=", 1) for x in args.var)
+    latency = {k: float(v) for k, v in (x.split("=", 1) for x in args.latency)}
+    machine = build(args.template, variables, latency)
+
+    with open(args.input) if args.input != "-" else sys.stdin as stream:
+        payload = json.load(stream)
+
+    # Functions write EMF metrics to stdout; keep it for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        execution = machine.execute(payload)
+    if args.json:
+        print(json.dumps(execution.to_dict(), indent=2, default=str))
+    else:
+        print(execution.report(args.budget))
+    failed = execution.status != "SUCCEEDED" or execution.over_budget(args.budget)
+    return 1 if failed else 0
+
+
+def build(template, variables=None, latency=None, handlers=None):
+    """
+    Build a state machine wired to local stand-ins for every function and
+    state machine in the repository.
+    """
+    variables = {**VARIABLES, **(variables or {})}
+    name = variables["name"]
+    resources = Resources(
+        handlers if handlers is not None else discover(name),
+        region=variables["region"],
+        account=variables["account"],
+        latency=latency,
+    )
+    variables.setdefault(
+        "authorizer_function_arn", resources.function_arn(f"{name}-api-authorizer")
+    )
+
+    # The state machines commit and release the authorizer's idempotency
+    # claims directly in its table, so keep the claims in the same one
+    authorizer = resources.functions.handlers.get(f"{name}-api-authorizer")
+    seen = namespace(authorizer).get("seen") if authorizer else None
+    if seen is not None:
+        seen.store = runtime("idempotency").DynamoDBStore(
+            variables["idempotency_table_name"], resources.dynamodb
+        )
+    variables.setdefault(
+        "oauth_function_arn", resources.function_arn(f"{name}-api-oauth")
+    )
+    for path in sorted(STATE_MACHINES.glob("*.asl.yml")):
+        machine = StateMachine.load(path, resources, variables)
+        resources.sfn.register(f"{name}-api-{machine.name}", machine)
+    return StateMachine.load(template, resources, variables)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+Local AWS stand-ins
+
+In-process replacements for the services the state machines integrate with:
+Lambda functions, the EventBridge bus, DynamoDB tables and Step Functions
+executions.
+"""
+
+import json
+import operator
+import re
+import threading
+import time
+import uuid
+from datetime import UTC, datetime
+
+from functions import LambdaContext
+
+# Comparators of DynamoDB condition expressions
+OPERATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class TaskError(Exception):
+    """
+    Task failure carrying an ASL error name.
+    """
+
+    def __init__(self, error, cause=""):
+        super().__init__(error, cause)
+        self.error = error
+        self.cause = cause
+
+
+class Lambda:
+    """
+    Local Lambda service backed by in-process handlers.
+    """
+
+    def __init__(self, handlers=None, timeout=3):
+        self.handlers = dict(handlers or {})
+        self.timeout = timeout
+
+    def invoke(self, function, payload):
+        name = function.split(":")[6] if function.startswith("arn:") else function
+        try:
+            handler = self.handlers[name]
+        except KeyError:
+            raise TaskError(
+                "Lambda.ResourceNotFoundException",
+                f"Function not found: {function}",
+            )
+        context = LambdaContext(name, self.timeout)
+        try:
+            result = handler(json.loads(json.dumps(payload)), context)
+        except Exception as err:  # noqa: BLE001
+            raise TaskError(type(err).__name__, json.dumps({"errorMessage": str(err)}))
+        return json.loads(json.dumps(result, default=str))
+
+    def sdk_invoke(self, arguments):
+        """
+        ``aws-sdk:lambda:invoke`` integration (returns a serialized payload).
+        """
+        function = arguments["FunctionName"]
+        payload = arguments.get("Payload")
+        try:
+            result = self.invoke(function, payload)
+            return {"StatusCode": 200, "Payload": json.dumps(result)}
+        except TaskError as err:
+            if err.error.startswith("Lambda."):
+                raise
+            payload = {"errorType": err.error, **json.loads(err.cause)}
+            return {
+                "StatusCode": 200,
+                "FunctionError": "Unhandled",
+                "Payload": json.dumps(payload),
+            }
+
+
+class EventBus:
+    """
+    In-memory EventBridge bus.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def put_events(self, arguments):
+        entries = []
+        with self.lock:
+            for entry in arguments["Entries"]:
+                event_id = str(uuid.uuid4())
+                detail = entry.get("Detail")
+                if not isinstance(detail, str):
+                    detail = json.dumps(detail)
+                self.events.append({**entry, "Detail": detail, "EventId": event_id})
+                entries.append({"EventId": event_id})
+        return {"Entries": entries, "FailedEntryCount": 0}
+
+
+class ConditionalCheckFailedException(Exception): ...
+
+
+class DynamoDB:
+    """
+    In-memory DynamoDB tables.
+
+    Supports the conditional writes made by the state machines and the
+    runtime layer's stores: conditions of ``attribute_exists()``,
+    ``attribute_not_exists()`` and comparisons joined by ``AND`` or ``OR``,
+    and ``SET`` updates. Methods take the SDK's arguments, so an instance
+    also stands in for a ``boto3`` DynamoDB client.
+    """
+
+    class exceptions:
+        ConditionalCheckFailedException = ConditionalCheckFailedException
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return self.tables.setdefault(name, {})
+
+    @staticmethod
+    def scalar(value):
+        (kind, data), *_ = value.items()
+        return float(data) if kind == "N" else data
+
+    def check(self, item, condition, names, values):
+        def term(text):
+            match = re.fullmatch(r"(attribute_(?:not_)?exists)\((#\w+)\)", text)
+            if match:
+                return (names[match[2]] in item) == (match[1] == "attribute_exists")
+            name, op, value = text.split()
+            if names[name] not in item:
+                return False
+            return OPERATORS[op](
+                self.scalar(item[names[name]]), self.scalar(values[value])
+            )
+
+        if not condition:
+            return True
+        if " OR " in condition:
+            return any(term(x) for x in condition.split(" OR "))
+        return all(term(x) for x in condition.split(" AND "))
+
+    def put_item(self, TableName, Item, ConditionExpression=None, **kwargs):
+        names = kwargs.get("ExpressionAttributeNames") or {}
+        values = kwargs.get("ExpressionAttributeValues") or {}
+        key = json.dumps(Item["key"])
+        with self.lock:
+            table = self.table(TableName)
+            if not self.check(table.get(key, {}), ConditionExpression, names, values):
+                raise ConditionalCheckFailedException(TableName)
+            table[key] = dict(Item)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, **kwargs):
+        names = kwargs.get("ExpressionAttributeNames") or {}
+        values = kwargs.get("ExpressionAttributeValues") or {}
+        condition = kwargs.get("ConditionExpression")
+        key = json.dumps(Key["key"])
+        with self.lock:
+            table = self.table(TableName)
+            item = dict(table.get(key, Key))
+            if not self.check(table.get(key, {}), condition, names, values):
+                raise ConditionalCheckFailedException(TableName)
+            for assignment in UpdateExpression.removeprefix("SET ").split(", "):
+                name, value = assignment.split(" = ")
+                item[names.get(name, name)] = values[value]
+            table[key] = item
+        return {}
+
+    def delete_item(self, TableName, Key, **_):
+        with self.lock:
+            self.table(TableName).pop(json.dumps(Key["key"]), None)
+        return {}
+
+    def get_item(self, TableName, Key, **_):
+        item = self.table(TableName).get(json.dumps(Key["key"]))
+        return {"Item": dict(item)} if item is not None else {}
+
+    def integration(self, method):
+        """
+        Get Step Functions ``dynamodb`` integration calling ``method``.
+        """
+
+        def invoke(arguments):
+            try:
+                return method(**arguments)
+            except ConditionalCheckFailedException as err:
+                raise TaskError(
+                    "DynamoDB.ConditionalCheckFailedException",
+                    f"The conditional request failed: {err}",
+                )
+
+        return invoke
+
+
+class StepFunctions:
+    """
+    In-memory Step Functions executions.
+
+    Executions of registered state machines run on background threads;
+    anything else stays ``RUNNING`` until explicitly stopped.
+    """
+
+    def __init__(self, region, account):
+        self.region = region
+        self.account = account
+        self.machines = {}
+        self.executions = {}
+
+    def register(self, name, machine):
+        self.machines[name] = machine
+
+    def start_execution(self, arguments):
+        arn = arguments["StateMachineArn"]
+        machine_name = arn.split(":")[6]
+        name = arguments.get("Name") or str(uuid.uuid4())
+        execution_arn = f"arn:aws:states:{self.region}:{self.account}:execution:{machine_name}:{name}"
+        self.executions[execution_arn] = record = {
+            "ExecutionArn": execution_arn,
+            "StateMachineArn": arn,
+            "Name": name,
+            "Status": "RUNNING",
+            "StartDate": datetime.now(UTC).isoformat(),
+        }
+        machine = self.machines.get(machine_name)
+        if machine:
+            payload = json.loads(arguments.get("Input") or "{}")
+
+            def run():
+                execution = machine.execute(payload, name=name)
+                record.update(Status=execution.status)
+
+            threading.Thread(target=run, daemon=True).start()
+        return {"ExecutionArn": execution_arn, "StartDate": record["StartDate"]}
+
+    def describe_execution(self, arguments):
+        try:
+            return dict(self.executions[arguments["ExecutionArn"]])
+        except KeyError:
+            raise TaskError(
+                "Sfn.ExecutionDoesNotExistException",
+                f"Execution does not exist: {arguments['ExecutionArn']}",
+            )
+
+
+class Resources:
+    """
+    Resolve ASL Task resources to local stand-ins.
+
+    ``latency`` optionally maps an integration (``lambda``, ``events``,
+    ``dynamodb``, ``states``) to a simulated network overhead in seconds, added to every
+    call, for budgeting the hops that cannot be measured locally.
+    """
+
+    def __init__(
+        self, handlers=None, region="us-east-1", account="123456789012", latency=None
+    ):
+        self.region = region
+        self.account = account
+        self.latency = latency or {}
+        self.functions = Lambda(handlers)
+        self.bus = EventBus()
+        self.dynamodb = DynamoDB()
+        self.sfn = StepFunctions(region, account)
+        self.integrations = {
+            "arn:aws:states:::aws-sdk:lambda:invoke": (
+                "lambda",
+                self.functions.sdk_invoke,
+            ),
+            "arn:aws:states:::aws-sdk:eventbridge:putEvents": (
+                "events",
+                self.bus.put_events,
+            ),
+            "arn:aws:states:::dynamodb:deleteItem": (
+                "dynamodb",
+                self.dynamodb.integration(self.dynamodb.delete_item),
+            ),
+            "arn:aws:states:::dynamodb:updateItem": (
+                "dynamodb",
+                self.dynamodb.integration(self.dynamodb.update_item),
+            ),
+            "arn:aws:states:::aws-sdk:sfn:startExecution": (
+                "states",
+                self.sfn.start_execution,
+            ),
+            "arn:aws:states:::aws-sdk:sfn:describeExecution": (
+                "states",
+                self.sfn.describe_execution,
+            ),
+        }
+
+    def function_arn(self, name):
+        return f"arn:aws:lambda:{self.region}:{self.account}:function:{name}"
+
+    def invoke(self, resource, arguments):
+        if resource.startswith("arn:aws:lambda:"):
+            service, func = "lambda", lambda x: self.functions.invoke(resource, x)
+        else:
+            try:
+                service, func = self.integrations[resource]
+            except KeyError:
+                raise TaskError("States.Runtime", f"Unsupported resource: {resource}")
+        if self.latency.get(service):
+            time.sleep(self.latency[service])
+        return func(arguments)
@@ -0,0 +1,554 @@
+"""
+Benchmarks
+
+Measures the hot path of every handler and the cold-import cost of every
+``index.py`` and compares the results against a stored baseline, failing
+when a case's p50 regresses past its threshold. A single run's p99 rests on
+a handful of samples and swings run to run, so it's only gated on request
+(``--p99``), and then only for cases with enough samples to estimate it.
+
+Absolute timings only hold on the machine that recorded them, so every run
+also times a fixed ``reference()`` workload, and cases are compared by
+their ratio to it. A baseline recorded on a fast laptop still gates a
+slower CI runner, as both scale with the reference.
+
+:Example:
+
+$ PYTHONPATH=src python src/bench.py            # compare against baseline
+$ PYTHONPATH=src python src/bench.py --save     # write new baseline
+$ PYTHONPATH=src python src/bench.py --scale 10 --p99 0.5  # also gate p99
+$ PYTHONPATH=src python src/bench.py --budgets  # check cold-import budgets
+"""
+
+import argparse
+import contextlib
+import hmac
+import json
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import functions
+
+BASELINE = Path(__file__).resolve().parents[1] / "bench" / "baseline.json"
+BODY_SIZES = [1024, 16 * 1024, 256 * 1024]
+P50_TOLERANCE = 0.25
+P99_TOLERANCE = 0.50
+
+# Fewest samples a case needs for its p99 to be gated: at least ten beyond it
+P99_MIN_SAMPLES = 1000
+
+# Cold ``import index`` budget (µs) for each function, checked by the opt-in
+# ``--budgets`` gate: about 1.5x its best-of-3 time when last set, compiled
+# from source as on Lambda (no bytecode is cached in the read-only task and
+# layer directories). Raise one deliberately, never to make the gate pass
+IMPORT_BUDGETS = {
+    "authorizer": 40_000,
+    "block_actions": 90_000,
+    "block_suggestion": 70_000,
+    "oauth": 70_000,
+    "slash_command": 90_000,
+}
+
+# Iterations of the reference workload timed by each run
+REFERENCE_ITERATIONS = 5000
+
+# Slack-like payload serialized, signed and parsed by the reference workload
+REFERENCE_PAYLOAD = {
+    "type": "block_actions",
+    "actions": [{"action_id": f"action{i}", "value": "x" * 32} for i in range(16)],
+}
+
+CASES = {}
+SOURCES = sorted(
+    [
+        *functions.FUNCTIONS.glob("*/src"),
+        *functions.RESPONDERS.glob("*/src"),
+    ]
+)
+
+
+def case(name, iterations=1000):
+    """
+    Register benchmark case.
+
+    The decorated function is called once to set up and must return the
+    zero-argument callable to time.
+    """
+
+    def decorator(func):
+        CASES[name] = (func, iterations)
+        return func
+
+    return decorator
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, reference=None):
+    """
+    Summarize samples (in microseconds), with their p50 and p99 as ratios
+    of the ``reference`` p50 if given.
+    """
+    summary = {
+        "n": len(samples),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "p50_us": round(percentile(samples, 50), 3),
+        "p99_us": round(percentile(samples, 99), 3),
+    }
+    if reference:
+        summary["p50_ratio"] = round(summary["p50_us"] / reference, 4)
+        summary["p99_ratio"] = round(summary["p99_us"] / reference, 4)
+    return summary
+
+
+def measure(func, iterations, warmup=None):
+    """
+    Time ``func`` for ``iterations`` calls and return samples in µs.
+    """
+    for _ in range(warmup if warmup is not None else max(1, iterations // 10)):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def reference(scale=1.0):
+    """
+    Get p50 (µs) of the reference workload: encode, sign and decode a small
+    JSON payload, the same mix of work as the handlers.
+    """
+
+    def work():
+        data = json.dumps(REFERENCE_PAYLOAD).encode()
+        hmac.new(b"reference", data, sha256).digest()
+        json.loads(data)
+
+    iterations = max(100, int(REFERENCE_ITERATIONS * scale))
+    return percentile(measure(work, iterations), 50)
+
+
+def run(pattern=None, scale=1.0):
+    """
+    Run registered cases matching ``pattern`` and return their summaries,
+    relative to this run's reference.
+    """
+    base = reference(scale)
+    results = {}
+    for name, (setup, iterations) in CASES.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        iterations = max(1, int(iterations * scale))
+        with contextlib.ExitStack() as stack:
+            func = setup(stack)
+            samples = func(iterations) if getattr(func, "samples", False) else None
+            if samples is None:
+                samples = measure(func, iterations)
+        results[name] = summarize(samples, base)
+    return results
+
+
+def compare(results, baseline, p50=P50_TOLERANCE, p99=None):
+    """
+    Compare results' reference ratios with baseline and return list of
+    regressions. The p99 is only compared if a ``p99`` tolerance is given,
+    for cases of at least ``P99_MIN_SAMPLES`` samples.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        gates = [("p50_ratio", p50)]
+        if p99 is not None and result.get("n", 0) >= P99_MIN_SAMPLES:
+            gates.append(("p99_ratio", p99))
+        for key, tolerance in gates:
+            if key not in base or key not in result:
+                continue
+            limit = base[key] * (1 + tolerance)
+            if result[key] > limit:
+                regressions.append(
+                    f"{name} {key} {result[key]:.3f} > {limit:.3f} "
+                    f"(baseline {base[key]:.3f} +{tolerance:.0%})"
+                )
+    return regressions
+
+
+def report(results, baseline=None):
+    baseline = baseline or {}
+    header = (
+        f"{'CASE':<44} {'P50 µs':>12} {'P99 µs':>12} "
+        f"{'P50 ×REF':>10} {'BASE ×REF':>10} {'Δ':>8}"
+    )
+    lines = [header]
+    for name, result in results.items():
+        ratio = result.get("p50_ratio")
+        base = baseline.get(name, {}).get("p50_ratio")
+        delta = f"{ratio / base - 1:+.0%}" if ratio and base else "-"
+        ratio = f"{ratio:.3f}" if ratio else "-"
+        base = f"{base:.3f}" if base else "-"
+        lines.append(
+            f"{name:<44} {result['p50_us']:>12.3f} {result['p99_us']:>12.3f} "
+            f"{ratio:>10} {base:>10} {delta:>8}"
+        )
+    return "\n".join(lines)
+
+
+###############
+#   HELPERS   #
+###############
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Send slackbot log and metrics output to /dev/null while benchmarking.
+    """
+    logger = logging.getLogger("slackbot")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        streams = [(x, x.setStream(devnull)) for x in logger.handlers]
+        try:
+            yield
+        finally:
+            for handler, stream in streams:
+                handler.setStream(stream)
+
+
+@contextlib.contextmanager
+def serve(routes):
+    """
+    Serve ``{path: (content_type, bytes)}`` from a local HTTP server.
+
+    Each body carries an ``ETag``; a matching ``If-None-Match`` gets a 304.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        disable_nagle_algorithm = True
+        protocol_version = "HTTP/1.1"
+
+        def respond(self):
+            length = int(self.headers.get("content-length") or 0)
+            self.rfile.read(length)
+            content_type, body = routes[self.path.split("?")[0]]
+            etag = f'"{sha256(body).hexdigest()[:16]}"'
+            if self.headers.get("if-none-match") == etag:
+                self.send_response(304)
+                self.send_header("etag", etag)
+                self.send_header("content-length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("content-type", content_type)
+            self.send_header("content-length", str(len(body)))
+            self.send_header("etag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = respond
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def signed(secret, body):
+    ts = str(int(time.time()))
+    digest = hmac.new(secret.encode(), f"v0:{ts}:{body}".encode(), sha256).hexdigest()
+    return {"body": body, "signature": f"v0={digest}", "ts": ts}
+
+
+def scopes_page(count=400, padding=800):
+    """
+    Build a stand-in for https://api.slack.com/scopes of realistic size.
+    """
+    rows = []
+    for i in range(count):
+        name = f"scope{i:03d}:{'read' if i % 2 else 'write'}"
+        rows.append(
+            f"<tr data-scope=&quot;name&quot;:&quot;{name}&quot;>"
+            f"<td>{name}</td><td>{'x' * padding}</td></tr>"
+        )
+    return f"<html><body><table>{''.join(rows)}</table></body></html>".encode()
+
+
+def importtime(src):
+    """
+    Measure cumulative ``import index`` time (µs) in a fresh interpreter.
+    """
+    path = os.pathsep.join([str(src), str(functions.RUNTIME)])
+    env = {**os.environ, **functions.ENVIRON, "PYTHONPATH": path}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import index"],
+        capture_output=True,
+        check=True,
+        cwd=src,
+        env=env,
+        text=True,
+    )
+    for line in proc.stderr.splitlines():
+        parts = [x.strip() for x in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[2] == "index":
+            return float(parts[1])
+    raise RuntimeError(f"index not found in importtime output for {src}")
+
+
+def over_budget(src, samples=3):
+    """
+    Get best-of-``samples`` import time of function if it is over budget.
+    """
+    best = min(importtime(src) for _ in range(samples))
+    budget = IMPORT_BUDGETS[Path(src).parent.name]
+    return best if best > budget else None
+
+
+def budgets(samples=3):
+    """
+    Check cold-import time of every function against its budget.
+
+    Import time depends on the machine and whether bytecode is cached, so
+    this is an explicit gate (``--budgets``) rather than a unit test.
+    """
+    over = []
+    for src in SOURCES:
+        name = src.parent.name
+        best = over_budget(src, samples)
+        status = "ok" if best is None else f"{best / 1000:.1f} ms"
+        print(f"{name:<20} {IMPORT_BUDGETS[name] / 1000:>6.1f} ms  {status}")
+        if best is not None:
+            over.append(f"{name} import {best / 1000:.1f} ms over budget")
+    return over
+
+
+#############
+#   CASES   #
+#############
+
+
+def authorizer(stack):
+    index = functions.load(functions.FUNCTIONS / "authorizer" / "src")
+    stack.enter_context(quiet())
+    return index
+
+
+for size in BODY_SIZES:
+
+    @case(f"authorizer.handler[{size}]", iterations=max(50, 200_000 // size))
+    def _(stack, size=size):
+        index = authorizer(stack)
+        event = signed(index.secrets[0], "x" * size)
+        return lambda: index.handler(event)
+
+    @case(f"authorizer.sign[{size}]", iterations=max(50, 200_000 // size))
+    def _(stack, size=size):
+        signature = functions.runtime("signature")
+        body = "x" * size
+        return lambda: signature.sign("FIZZ", body, "1234567890")
+
+
+for label, event in {
+    "small": {"type": "block_actions", "actions": [{"action_id": "fizz"}]},
+    "large": {
+        "type": "view_submission",
+        "view": {
+            "state": {
+                "values": {
+                    f"block{i}": {
+                        "input": {"type": "plain_text_input", "value": "x" * 200}
+                    }
+                    for i in range(200)
+                }
+            }
+        },
+    },
+}.items():
+
+    @case(f"logger.bind[{label}]", iterations=2000)
+    def _(stack, event=event):
+        index = authorizer(stack)
+        handler = index.logger.bind(lambda event, context: {"statusCode": 200})
+        return lambda: handler(event)
+
+
+@case("oauth.handler", iterations=200)
+def _(stack):
+    response = json.dumps({"ok": True, "access_token": "xoxb-fizz"}).encode()
+    url = stack.enter_context(
+        serve({"/api/oauth.v2.access": ("application/json", response)})
+    )
+    index = functions.load(functions.FUNCTIONS / "oauth" / "src")
+    stack.enter_context(quiet())
+    # Tier 4 pacing would dominate 200 back-to-back calls; time the client
+    # with a bucket that never runs dry
+    index.slack = index.Slack(url, tiers={4: (6e9, 1e9)})
+    stack.callback(index.slack.close)
+    event = {"code": "fizz", "redirect_uri": "https://example.com/oauth"}
+    return lambda: index.handler(event)
+
+
+def block_actions(stack):
+    url = stack.enter_context(serve({"/actions/T1/1/fizz": ("text/plain", b"")}))
+    index = functions.load(functions.RESPONDERS / "block_actions" / "src")
+    stack.enter_context(quiet())
+    stack.callback(index.executor.shutdown)
+    stack.callback(index.slack.close)
+    # Time the send path, not the debounce window
+    index.coalescer.window = 0
+    option = {"value": "chat:write", "text": {"type": "plain_text", "text": "x"}}
+    select = {"slack_oauth_scopes": {"selected_option": option}}
+    event = {
+        "actions": [{"action_id": "slack_oauth_scopes"}] * 4,
+        "response_url": f"{url}/actions/T1/1/fizz",
+        "state": {"values": {"slack_oauth_scopes": select}},
+    }
+    return index, event
+
+
+@case("block_actions.handler[4]", iterations=2000)
+def _(stack):
+    index, event = block_actions(stack)
+    messages = index.lazy.queue.messages
+    return lambda: (index.handler(event), messages.clear())
+
+
+@case("block_actions.respond[4]", iterations=200)
+def _(stack):
+    index, event = block_actions(stack)
+    return lambda: index.respond(event)
+
+
+@case("blocks.render", iterations=5000)
+def _(stack):
+    index, event = block_actions(stack)
+    scope = event["state"]["values"]["slack_oauth_scopes"]["slack_oauth_scopes"]
+    option = scope["selected_option"]
+    return lambda: index.SCOPE.render(scope=option, value=option["value"])
+
+
+for label in ("memory", "sqlite"):
+
+    @case(f"coalesce.send[{label}]", iterations=5000)
+    def _(stack, label=label):
+        coalesce = functions.runtime("coalesce")
+        if label == "sqlite":
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            store = coalesce.SQLiteStore(f"{tmp}/coalesce.db")
+        else:
+            store = coalesce.MemoryStore()
+        coalescer = coalesce.Coalescer(store, window=0)
+        versions = iter(range(1, 10**9))
+        return lambda: coalescer.send("message:C1:1", next(versions), lambda: None)
+
+
+for routes in (10, 1000):
+
+    @case(f"router.dispatch[{routes}]", iterations=5000)
+    def _(stack, routes=routes):
+        router = functions.runtime("router").Router()
+        for i in range(routes):
+            router.action(f"action{i}", lambda event: None)
+            router.action(re.compile(f"pattern{i}:[0-9]+"), lambda event: None)
+        events = [{"action_id": f"action{routes - 1}"}, {"action_id": "pattern0:1"}]
+        return lambda: [router.dispatch(event) for event in events]
+
+
+def block_suggestion(stack, ttl):
+    url = stack.enter_context(serve({"/scopes": ("text/html", scopes_page())}))
+    tmp = stack.enter_context(tempfile.TemporaryDirectory())
+    index = functions.load(functions.RESPONDERS / "block_suggestion" / "src")
+    stack.enter_context(quiet())
+    index.catalog = index.Catalog(f"{url}/scopes", f"{tmp}/scopes.json", ttl=ttl)
+    index.catalog.get()
+    return index
+
+
+@case("block_suggestion.slack_oauth_scopes", iterations=2000)
+def _(stack):
+    index = block_suggestion(stack, ttl=3600)
+    return lambda: index.slack_oauth_scopes("scope1")
+
+
+@case("block_suggestion.revalidate", iterations=200)
+def _(stack):
+    index = block_suggestion(stack, ttl=0)
+    return lambda: index.slack_oauth_scopes("scope1")
+
+
+for src in SOURCES:
+
+    @case(f"importtime.{src.parent.name}", iterations=10)
+    def _(stack, src=src):
+        def samples(iterations):
+            return [importtime(src) for _ in range(iterations)]
+
+        samples.samples = True
+        return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run benchmarks")
+    parser.add_argument("-k", "--filter", help="regex of cases to run")
+    parser.add_argument("-b", "--baseline", default=BASELINE, type=Path)
+    parser.add_argument("--save", action="store_true", help="write results as baseline")
+    parser.add_argument("--scale", type=float, default=1.0, help="iteration multiplier")
+    parser.add_argument(
+        "--p50", type=float, default=P50_TOLERANCE, help="p50 tolerance"
+    )
+    parser.add_argument(
+        "--p99",
+        type=float,
+        nargs="?",
+        const=P99_TOLERANCE,
+        help=f"also gate p99 of cases with {P99_MIN_SAMPLES}+ samples (tolerance)",
+    )
+    parser.add_argument(
+        "--budgets", action="store_true", help="check cold-import budgets only"
+    )
+    args = parser.parse_args(argv)
+
+    if args.budgets:
+        over = budgets()
+        for message in over:
+            print(f"OVER BUDGET {message}", file=sys.stderr)
+        return 1 if over else 0
+
+    results = run(args.filter, args.scale)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print(report(results, baseline))
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2) + "\n")
+        return 0
+
+    regressions = compare(results, baseline, args.p50, args.p99)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Local Lambda functions
+
+Loads the ``index.py`` of each function source directory as an isolated
+module so several functions (each with its own ``index`` and ``logger``
+modules) can be called side by side in one process.
+"""
+
+import importlib
+import inspect
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+FUNCTIONS = ROOT / "functions"
+RESPONDERS = ROOT / "example" / "functions"
+RUNTIME = ROOT / "runtime" / "python"
+
+ENVIRON = {
+    "CLIENT_ID": "CLIENT_ID",
+    "CLIENT_SECRET": "CLIENT_SECRET",
+    "SIGNING_SECRET": "SIGNING_SECRET",
+}
+
+
+def runtime(module=None):
+    """
+    Put the shared ``slackbot`` runtime package on the path and import
+    ``slackbot.<module>`` (or just the package).
+    """
+    if str(RUNTIME) not in sys.path:
+        sys.path.append(str(RUNTIME))
+    name = f"slackbot.{module}" if module else "slackbot"
+    return importlib.import_module(name)
+
+
+def load(src, module="index", environ=None):
+    """
+    Import module (``index`` by default) from function source directory.
+
+    Modules imported from ``src`` are removed from ``sys.modules`` afterwards
+    (and any same-named modules restored) so the next function can be loaded
+    without clashing. The ``slackbot`` runtime package is shared by every
+    function, as it is when deployed as a Lambda layer.
+    """
+    src = str(Path(src).resolve())
+    runtime()
+    for key, value in {**ENVIRON, **(environ or {})}.items():
+        os.environ.setdefault(key, value)
+    shadowed = {}
+    for name in list(sys.modules):
+        if (Path(src) / f"{name}.py").exists():
+            shadowed[name] = sys.modules.pop(name)
+    sys.path.insert(0, src)
+    try:
+        return importlib.import_module(module)
+    finally:
+        sys.path.remove(src)
+        for name, loaded in list(sys.modules.items()):
+            if (getattr(loaded, "__file__", None) or "").startswith(src + os.sep):
+                del sys.modules[name]
+        sys.modules.update(shadowed)
+
+
+def discover(name, environ=None):
+    """
+    Load built-in and example responder functions keyed by function name.
+
+    :Example:
+
+    >>> discover("slackbot")
+    {'slackbot-api-authorizer': <function handler ...>, ...}
+    """
+    handlers = {}
+    for base in (FUNCTIONS, RESPONDERS):
+        for index in sorted(base.glob("*/src/index.py")):
+            key = index.parent.parent.name
+            handlers[f"{name}-api-{key}"] = load(index.parent, environ=environ).handler
+    return handlers
+
+
+def namespace(handler):
+    """
+    Get module globals of the ``index.py`` defining (decorated) ``handler``.
+    """
+    return inspect.unwrap(handler).__globals__
+
+
+def queues(handler):
+    """
+    Get the in-memory queues of lazy functions deferred by ``handler``.
+
+    Outside Lambda, ``slackbot.lazy.get_queue()`` holds deferred messages
+    in memory until they are delivered, e.g. by invoking the handler again
+    as Lambda's asynchronous invocation would.
+    """
+    lazy = runtime("lazy")
+    return [
+        value.queue
+        for value in namespace(handler).values()
+        if isinstance(value, lazy.Lazy) and isinstance(value.queue, lazy.MemoryQueue)
+    ]
+
+
+class LambdaContext:
+    """
+    Stand-in for the Lambda runtime context object.
+    """
+
+    def __init__(self, function_name, timeout=3):
+        self.aws_request_id = str(uuid.uuid4())
+        self.function_name = function_name
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
@@ -0,0 +1,699 @@
+"""
+JSONata
+
+A small JSONata interpreter covering the subset of the language used by the
+state machine templates: paths, indexing, literals, array and object
+constructors, string concatenation, comparisons, boolean operators, blocks,
+variable binding, lambdas, regex literals, function chaining (``~>``) and the
+Step Functions built-in functions they call.
+
+:Example:
+
+>>> evaluate("$states.input.body ~> $base64decode", {"states": {...}})
+'fizz=buzz'
+"""
+
+import base64
+import json
+import math
+import re
+import time
+import uuid
+from urllib.parse import quote, unquote
+
+
+class JSONataError(Exception): ...
+
+
+class Undefined:
+    """
+    JSONata ``undefined`` (distinct from JSON ``null``).
+    """
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "undefined"
+
+
+undefined = Undefined()
+
+###############
+#   LEXER     #
+###############
+
+OPERATORS = [
+    ":=",
+    "~>",
+    "!=",
+    "<=",
+    ">=",
+    "..",
+    ".",
+    "[",
+    "]",
+    "{",
+    "}",
+    "(",
+    ")",
+    ",",
+    ":",
+    ";",
+    "?",
+    "&",
+    "=",
+    "<",
+    ">",
+    "+",
+    "-",
+    "*",
+    "/",
+    "%",
+]
+
+# Operators after which a ``/`` starts a regex literal rather than a division
+OPERAND_EXPECTED = {*OPERATORS, "and", "or", "in"} - {")", "]", "}"}
+
+TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<variable>\$[A-Za-z0-9_]*)
+  | (?P<name>`[^`]*`|[A-Za-z_][A-Za-z0-9_]*)
+    """,
+    re.VERBOSE,
+)
+
+
+def unescape(value):
+    def replace(match):
+        if match[1] is None:
+            return '\\"'
+        return "'" if match[1] == "'" else match[0]
+
+    return json.loads('"' + re.sub(r'\\(.)|"', replace, value) + '"')
+
+
+def tokenize(expr):
+    tokens = []
+    pos = 0
+    while pos < len(expr):
+        last = tokens[-1] if tokens else ("operator", "(")
+        if expr[pos] == "/" and last[0] == "operator" and last[1] in OPERAND_EXPECTED:
+            match = re.compile(r"/((?:[^/\\]|\\.)*)/([im]*)").match(expr, pos)
+            if not match:
+                raise JSONataError(f"Unterminated regex at {pos}")
+            flags = (re.IGNORECASE if "i" in match[2] else 0) | (
+                re.MULTILINE if "m" in match[2] else 0
+            )
+            tokens.append(("regex", re.compile(match[1], flags)))
+            pos = match.end()
+            continue
+        match = TOKEN.match(expr, pos)
+        if match:
+            kind = match.lastgroup
+            value = match[kind]
+            if kind == "number":
+                tokens.append(("number", float(value) if "." in value else int(value)))
+            elif kind == "string":
+                tokens.append(("string", unescape(value[1:-1])))
+            elif kind == "variable":
+                tokens.append(("variable", value[1:]))
+            elif kind == "name" and value in ("and", "or", "in"):
+                tokens.append(("operator", value))
+            elif kind == "name":
+                tokens.append(("name", value.strip("`")))
+            pos = match.end()
+            continue
+        for op in OPERATORS:
+            if expr.startswith(op, pos):
+                tokens.append(("operator", op))
+                pos += len(op)
+                break
+        else:
+            raise JSONataError(f"Unexpected character {expr[pos]!r} at {pos}")
+    tokens.append(("end", None))
+    return tokens
+
+
+###############
+#   PARSER    #
+###############
+
+BINDING = {
+    ":=": 10,
+    "?": 20,
+    "or": 25,
+    "and": 30,
+    "=": 40,
+    "!=": 40,
+    "<": 40,
+    "<=": 40,
+    ">": 40,
+    ">=": 40,
+    "in": 40,
+    "~>": 40,
+    "&": 50,
+    "+": 50,
+    "-": 50,
+    "*": 60,
+    "/": 60,
+    "%": 60,
+    ".": 75,
+    "[": 80,
+    "(": 80,
+}
+
+
+class Parser:
+    def __init__(self, expr):
+        self.tokens = tokenize(expr)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, op):
+        kind, value = self.next()
+        if kind != "operator" or value != op:
+            raise JSONataError(f"Expected {op!r}, got {value!r}")
+
+    def at(self, op):
+        kind, value = self.peek()
+        return kind == "operator" and value == op
+
+    def parse(self):
+        ast = self.expression(0)
+        if self.peek()[0] != "end":
+            raise JSONataError(f"Unexpected token {self.peek()[1]!r}")
+        return ast
+
+    def expression(self, rbp):
+        left = self.prefix()
+        while True:
+            kind, op = self.peek()
+            if kind != "operator" or BINDING.get(op, 0) <= rbp:
+                return left
+            self.next()
+            left = self.infix(op, left)
+
+    def prefix(self):
+        kind, value = self.next()
+        if kind in ("number", "string", "regex"):
+            return ("value", value)
+        if kind == "variable":
+            return ("variable", value)
+        if kind == "name":
+            if value == "true":
+                return ("value", True)
+            if value == "false":
+                return ("value", False)
+            if value == "null":
+                return ("value", None)
+            if value in ("function", "λ") and self.at("("):
+                return self.function()
+            return ("name", value)
+        if kind == "operator":
+            if value == "-":
+                return ("negate", self.expression(70))
+            if value == "(":
+                exprs = []
+                while not self.at(")"):
+                    exprs.append(self.expression(0))
+                    if not self.at(";"):
+                        break
+                    self.next()
+                self.expect(")")
+                return ("block", exprs)
+            if value == "[":
+                items = self.items("]")
+                return ("array", items)
+            if value == "{":
+                pairs = []
+                while not self.at("}"):
+                    key = self.expression(0)
+                    self.expect(":")
+                    pairs.append((key, self.expression(0)))
+                    if not self.at(","):
+                        break
+                    self.next()
+                self.expect("}")
+                return ("object", pairs)
+        raise JSONataError(f"Unexpected token {value!r}")
+
+    def items(self, close):
+        items = []
+        while not self.at(close):
+            items.append(self.expression(0))
+            if not self.at(","):
+                break
+            self.next()
+        self.expect(close)
+        return items
+
+    def function(self):
+        self.expect("(")
+        params = []
+        while not self.at(")"):
+            kind, value = self.next()
+            if kind != "variable":
+                raise JSONataError(f"Invalid parameter {value!r}")
+            params.append(value)
+            if not self.at(","):
+                break
+            self.next()
+        self.expect(")")
+        self.expect("{")
+        body = self.expression(0)
+        self.expect("}")
+        return ("lambda", params, body)
+
+    def infix(self, op, left):
+        if op == ".":
+            return ("path", left, self.expression(75))
+        if op == "[":
+            index = self.expression(0)
+            self.expect("]")
+            return ("index", left, index)
+        if op == "(":
+            return ("call", left, self.items(")"))
+        if op == ":=":
+            if left[0] != "variable":
+                raise JSONataError("Left side of := must be a variable")
+            return ("bind", left[1], self.expression(BINDING[op] - 1))
+        if op == "?":
+            then = self.expression(0)
+            otherwise = ("value", undefined)
+            if self.at(":"):
+                self.next()
+                otherwise = self.expression(0)
+            return ("condition", left, then, otherwise)
+        return ("binary", op, left, self.expression(BINDING[op]))
+
+
+#################
+#   EVALUATOR   #
+#################
+
+
+class Lambda:
+    def __init__(self, params, body, env):
+        self.params = params
+        self.body = body
+        self.env = env
+
+    @property
+    def arity(self):
+        return len(self.params)
+
+    def __call__(self, *args):
+        env = Environment(self.env)
+        for param, arg in zip(self.params, args, strict=False):
+            env.bind(param, arg)
+        return evaluate_ast(self.body, undefined, env)
+
+
+class Builtin:
+    def __init__(self, func, arity):
+        self.func = func
+        self.arity = arity
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+
+class Environment:
+    def __init__(self, parent=None, bindings=None):
+        self.parent = parent
+        self.bindings = dict(bindings or {})
+
+    def bind(self, name, value):
+        self.bindings[name] = value
+
+    def lookup(self, name):
+        env = self
+        while env is not None:
+            if name in env.bindings:
+                return env.bindings[name]
+            env = env.parent
+        return undefined
+
+
+def sequence(values):
+    """
+    Collapse a result sequence the way JSONata does.
+    """
+    values = [x for x in values if x is not undefined]
+    if not values:
+        return undefined
+    if len(values) == 1:
+        return values[0]
+    return values
+
+
+def step(value, func):
+    if isinstance(value, list):
+        results = []
+        for item in value:
+            result = func(item)
+            if isinstance(result, list):
+                results.extend(result)
+            else:
+                results.append(result)
+        return sequence(results)
+    return func(value)
+
+
+def string(value):
+    if value is undefined:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return json.dumps(value, separators=(",", ":"))
+
+
+def boolean(value):
+    if isinstance(value, list):
+        return any(boolean(x) for x in value)
+    if isinstance(value, dict):
+        return bool(value)
+    return bool(value) and value is not undefined
+
+
+def evaluate_ast(ast, context, env):
+    kind = ast[0]
+
+    if kind == "value":
+        return ast[1]
+
+    if kind == "variable":
+        return context if ast[1] == "" else env.lookup(ast[1])
+
+    if kind == "name":
+        name = ast[1]
+        return step(
+            context,
+            lambda x: x.get(name, undefined) if isinstance(x, dict) else undefined,
+        )
+
+    if kind == "path":
+        left = evaluate_ast(ast[1], context, env)
+        if left is undefined:
+            return undefined
+        return step(left, lambda x: evaluate_ast(ast[2], x, env))
+
+    if kind == "index":
+        left = evaluate_ast(ast[1], context, env)
+        if left is undefined:
+            return undefined
+        index = evaluate_ast(ast[2], context, env)
+        if not isinstance(index, int | float) or isinstance(index, bool):
+            raise JSONataError("Only numeric array indexes are supported")
+        items = left if isinstance(left, list) else [left]
+        index = math.floor(index)
+        try:
+            return items[index]
+        except IndexError:
+            return undefined
+
+    if kind == "array":
+        values = []
+        for item in ast[1]:
+            value = evaluate_ast(item, context, env)
+            if value is undefined:
+                continue
+            if item[0] == "array" or not isinstance(value, list):
+                values.append(value)
+            else:
+                values.extend(value)
+        return values
+
+    if kind == "object":
+        obj = {}
+        for key, value in ast[1]:
+            key = evaluate_ast(key, context, env)
+            value = evaluate_ast(value, context, env)
+            if not isinstance(key, str):
+                raise JSONataError(f"Object key must be a string: {key!r}")
+            if value is not undefined:
+                obj[key] = value
+        return obj
+
+    if kind == "block":
+        scope = Environment(env)
+        result = undefined
+        for expr in ast[1]:
+            result = evaluate_ast(expr, context, scope)
+        return result
+
+    if kind == "bind":
+        value = evaluate_ast(ast[2], context, env)
+        env.bind(ast[1], value)
+        return value
+
+    if kind == "lambda":
+        return Lambda(ast[1], ast[2], env)
+
+    if kind == "negate":
+        return -evaluate_ast(ast[1], context, env)
+
+    if kind == "condition":
+        if boolean(evaluate_ast(ast[1], context, env)):
+            return evaluate_ast(ast[2], context, env)
+        return evaluate_ast(ast[3], context, env)
+
+    if kind == "call":
+        func = evaluate_ast(ast[1], context, env)
+        args = [evaluate_ast(x, context, env) for x in ast[2]]
+        return apply(func, args)
+
+    if kind == "binary":
+        return binary(ast[1], ast[2], ast[3], context, env)
+
+    raise JSONataError(f"Unknown expression {kind}")  # pragma: no cover
+
+
+def apply(func, args):
+    if not callable(func):
+        raise JSONataError(f"{func!r} is not a function")
+    return func(*args)
+
+
+def binary(op, left, right, context, env):
+    if op == "~>":
+        value = evaluate_ast(left, context, env)
+        if right[0] == "call":
+            func = evaluate_ast(right[1], context, env)
+            args = [evaluate_ast(x, context, env) for x in right[2]]
+            return apply(func, [value, *args])
+        return apply(evaluate_ast(right, context, env), [value])
+
+    if op == "and":
+        return boolean(evaluate_ast(left, context, env)) and boolean(
+            evaluate_ast(right, context, env)
+        )
+    if op == "or":
+        return boolean(evaluate_ast(left, context, env)) or boolean(
+            evaluate_ast(right, context, env)
+        )
+
+    lhs = evaluate_ast(left, context, env)
+    rhs = evaluate_ast(right, context, env)
+
+    if op == "&":
+        return string(lhs) + string(rhs)
+    if op == "=":
+        return lhs is not undefined and rhs is not undefined and lhs == rhs
+    if op == "!=":
+        return lhs is not undefined and rhs is not undefined and lhs != rhs
+    if op == "in":
+        return lhs in (rhs if isinstance(rhs, list) else [rhs])
+    if lhs is undefined or rhs is undefined:
+        return undefined
+    if op == "<":
+        return lhs < rhs
+    if op == "<=":
+        return lhs <= rhs
+    if op == ">":
+        return lhs > rhs
+    if op == ">=":
+        return lhs >= rhs
+    if op == "+":
+        return lhs + rhs
+    if op == "-":
+        return lhs - rhs
+    if op == "*":
+        return lhs * rhs
+    if op == "/":
+        return lhs / rhs
+    if op == "%":
+        return lhs % rhs
+    raise JSONataError(f"Unknown operator {op}")  # pragma: no cover
+
+
+#################
+#   FUNCTIONS   #
+#################
+
+
+def _args(func, *args):
+    arity = getattr(func, "arity", len(args))
+    return args[:arity]
+
+
+def _array(value):
+    if value is undefined:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _append(a, b):
+    if a is undefined:
+        return b
+    if b is undefined:
+        return a
+    return _array(a) + _array(b)
+
+
+def _map(array, func):
+    array = _array(array)
+    return sequence([func(*_args(func, x, i, array)) for i, x in enumerate(array)])
+
+
+def _filter(array, func):
+    array = _array(array)
+    return sequence(
+        [x for i, x in enumerate(array) if boolean(func(*_args(func, x, i, array)))]
+    )
+
+
+def _merge(objects):
+    merged = {}
+    for obj in _array(objects):
+        merged.update(obj)
+    return merged
+
+
+def _lookup(obj, key):
+    return step(
+        obj, lambda x: x.get(key, undefined) if isinstance(x, dict) else undefined
+    )
+
+
+def _split(value, separator, limit=None):
+    if value is undefined:
+        return undefined
+    if isinstance(separator, re.Pattern):
+        parts = separator.split(value)
+    else:
+        parts = value.split(separator) if separator else list(value)
+    return parts if limit is None else parts[: int(limit)]
+
+
+def _join(array, separator=""):
+    return separator.join(_array(array))
+
+
+def _substring(value, start, length=None):
+    start = int(start)
+    end = None if length is None else start + int(length)
+    return value[start:end]
+
+
+def _contains(value, pattern):
+    if isinstance(pattern, re.Pattern):
+        return bool(pattern.search(value))
+    return pattern in value
+
+
+def _number(value):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _base64decode(value):
+    return base64.b64decode(value).decode()
+
+
+def _base64encode(value):
+    return base64.b64encode(value.encode()).decode()
+
+
+def _parse(value):
+    return json.loads(value)
+
+
+def _count(value):
+    return len(_array(value))
+
+
+def _exists(value):
+    return value is not undefined
+
+
+def _keys(obj):
+    return sequence(list(obj.keys())) if isinstance(obj, dict) else undefined
+
+
+def _string(value):
+    return string(value)
+
+
+BUILTINS = {
+    "append": Builtin(_append, 2),
+    "base64decode": Builtin(_base64decode, 1),
+    "base64encode": Builtin(_base64encode, 1),
+    "contains": Builtin(_contains, 2),
+    "count": Builtin(_count, 1),
+    "decodeUrlComponent": Builtin(unquote, 1),
+    "encodeUrlComponent": Builtin(lambda x: quote(x, safe="-_.!~*'()"), 1),
+    "exists": Builtin(_exists, 1),
+    "filter": Builtin(_filter, 2),
+    "floor": Builtin(math.floor, 1),
+    "join": Builtin(_join, 2),
+    "keys": Builtin(_keys, 1),
+    "lookup": Builtin(_lookup, 2),
+    "lowercase": Builtin(str.lower, 1),
+    "map": Builtin(_map, 2),
+    "merge": Builtin(_merge, 1),
+    "millis": Builtin(lambda: time.time_ns() // 1_000_000, 0),
+    "number": Builtin(_number, 1),
+    "parse": Builtin(_parse, 1),
+    "split": Builtin(_split, 3),
+    "string": Builtin(_string, 1),
+    "substring": Builtin(_substring, 3),
+    "uppercase": Builtin(str.upper, 1),
+    "uuid": Builtin(lambda: str(uuid.uuid4()), 0),
+}
+
+_cache = {}
+
+
+def compile(expr):
+    """
+    Parse JSONata expression into an AST (cached).
+    """
+    try:
+        return _cache[expr]
+    except KeyError:
+        ast = _cache[expr] = Parser(expr).parse()
+        return ast
+
+
+def evaluate(expr, variables=None, context=undefined):
+    """
+    Evaluate JSONata expression with the given ``$variable`` bindings.
+    """
+    env = Environment(Environment(bindings=BUILTINS), variables)
+    return evaluate_ast(compile(expr), context, env)
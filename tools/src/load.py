@@ -0,0 +1,481 @@
+"""
+Load generator
+
+Drives correctly signed Slack requests at a deployed API or the local
+server, drawn from a weighted corpus of representative payloads, and
+reports latency histograms, error rates and 3 s deadline violations per
+route. Requests run at a fixed rate (open loop), at a fixed concurrency
+(closed loop) or as a replay of captured JSONL traffic.
+
+In open-loop runs latency is measured from when each request was due, not
+when a worker got round to sending it, so a saturated target can't hide
+its queueing delay.
+
+:Example:
+
+$ PYTHONPATH=src python src/load.py http://127.0.0.1:8000 --rps 200 --duration 30
+$ PYTHONPATH=src python src/load.py http://127.0.0.1:8000 --concurrency 64
+$ PYTHONPATH=src python src/load.py https://slack.example.com --replay traffic.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlencode, urlsplit
+
+import functions
+from bench import percentile
+
+DEADLINE = 3.0
+TIMEOUT = 10.0
+CONCURRENCY = 16
+DURATION = 10.0
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2000, 3000, 5000)
+
+CORPUS = {}
+
+
+def payload(name, path, weight=1, size=0):
+    """
+    Register corpus payload.
+
+    The decorated function takes a unique ``n`` and the padding ``size`` in
+    bytes and returns the request body. Unique IDs keep the authorizer's
+    idempotency check from acking repeats as retries.
+    """
+
+    def decorator(func):
+        CORPUS[name] = (path, weight, lambda n: func(n, size))
+        return func
+
+    return decorator
+
+
+def form(payload):
+    return urlencode({"payload": json.dumps(payload)}, quote_via=quote)
+
+
+def padding(size):
+    return "x" * max(0, size)
+
+
+def route(path):
+    """
+    Get route key (as in ``DetailType``) of request path.
+    """
+    path = path.split("?")[0].rstrip("/")
+    return "POST /slash" if path.startswith("/slash/") else f"POST {path}"
+
+
+###############
+#   CORPUS    #
+###############
+
+
+@payload("slash_command", "/slash", weight=4)
+@payload("slash_command.1kb", "/slash", weight=1, size=1024)
+def slash_command(n, size):
+    return urlencode(
+        {
+            "command": "/test",
+            "text": padding(size),
+            "team_id": "T0001",
+            "user_id": "U0001",
+            "trigger_id": f"{n}.load",
+        }
+    )
+
+
+@payload("block_actions", "/callback", weight=4)
+@payload("block_actions.4kb", "/callback", weight=1, size=4 * 1024)
+def block_actions(n, size):
+    return form(
+        {
+            "type": "block_actions",
+            "trigger_id": f"{n}.load",
+            "team": {"id": "T0001"},
+            "user": {"id": "U0001"},
+            "actions": [{"action_id": "load_test", "value": str(n)}],
+            "message": {"text": padding(size)},
+        }
+    )
+
+
+@payload("view_submission", "/callback", weight=2, size=1024)
+@payload("view_submission.32kb", "/callback", weight=1, size=32 * 1024)
+def view_submission(n, size):
+    return form(
+        {
+            "type": "view_submission",
+            "trigger_id": f"{n}.load",
+            "team": {"id": "T0001"},
+            "user": {"id": "U0001"},
+            "view": {
+                "callback_id": "load_test",
+                "state": {"values": {"input": {"input": {"value": padding(size)}}}},
+            },
+        }
+    )
+
+
+@payload("block_suggestion", "/menu", weight=3)
+def block_suggestion(n, size):
+    return form(
+        {
+            "type": "block_suggestion",
+            "action_id": "load_test",
+            "team": {"id": "T0001"},
+            "user": {"id": "U0001"},
+            "value": f"scope{n % 100}",
+        }
+    )
+
+
+@payload("url_verification", "/event", weight=1)
+def url_verification(n, size):
+    return json.dumps({"type": "url_verification", "challenge": f"load{n}"})
+
+
+@payload("message", "/event", weight=4, size=256)
+@payload("message.4kb", "/event", weight=2, size=4 * 1024)
+@payload("message.32kb", "/event", weight=1, size=32 * 1024)
+def message(n, size):
+    return json.dumps(
+        {
+            "type": "event_callback",
+            "team_id": "T0001",
+            "event_id": f"Ev{n:012d}",
+            "event_time": int(time.time()),
+            "event": {"type": "message", "user": "U0001", "text": padding(size)},
+        }
+    )
+
+
+###############
+#   TRAFFIC   #
+###############
+
+
+def mix(pattern=None, seed=None):
+    """
+    Yield ``(name, path, body)`` drawn at random from the corpus, weighted.
+    """
+    names = [x for x in CORPUS if not pattern or re.search(pattern, x)]
+    if not names:
+        raise ValueError(f"No corpus payloads match {pattern!r}")
+    weights = [CORPUS[x][1] for x in names]
+    rng = random.Random(seed)
+    for n in itertools.count():
+        (name,) = rng.choices(names, weights)
+        path, _, build = CORPUS[name]
+        yield name, path, build(n)
+
+
+def paced(requests, rps=None, duration=None, count=None):
+    """
+    Yield ``(offset, request)`` pairs, due every ``1/rps`` seconds (or as
+    soon as a worker is free if ``rps`` is not set), until ``duration``
+    seconds or ``count`` requests.
+    """
+    start = time.monotonic()
+    for i, request in enumerate(requests):
+        if count is not None and i >= count:
+            return
+        offset = i / rps if rps else None
+        elapsed = offset if offset is not None else time.monotonic() - start
+        if duration is not None and elapsed >= duration:
+            return
+        yield offset, request
+
+
+def replay(path, speedup=1.0, keep_ids=False):
+    """
+    Yield ``(offset, request)`` pairs from captured JSONL traffic.
+
+    Each line has the request's ``path`` and ``body`` and the ``time`` it
+    was sent (seconds); gaps between requests are divided by ``speedup``.
+    Events get a fresh ``event_id`` per replay (unless ``keep_ids``), so
+    the target doesn't ack them as retries without handling them.
+    """
+    first = None
+    run = os.urandom(4).hex().upper()
+    with open(path) as stream:
+        for n, line in enumerate(filter(str.strip, stream)):
+            record = json.loads(line)
+            first = record["time"] if first is None else first
+            offset = (record["time"] - first) / speedup
+            name = record.get("name") or route(record["path"])
+            body = record["body"]
+            if not keep_ids:
+                body = reissue(body, f"Ev{run}{n:08d}")
+            yield offset, (name, record["path"], body)
+
+
+def reissue(body, event_id):
+    """
+    Replace the ``event_id`` of a JSON event body, if it has one.
+    """
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(event, dict) or "event_id" not in event:
+        return body
+    return json.dumps({**event, "event_id": event_id})
+
+
+###############
+#    STATS    #
+###############
+
+
+class Stats:
+    """
+    Latencies and errors per route.
+    """
+
+    def __init__(self, deadline=DEADLINE, buckets=BUCKETS_MS):
+        self.deadline = deadline
+        self.buckets = buckets
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def add(self, route, latency, error=None):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(latency)
+            if error:
+                errors = self.errors.setdefault(route, {})
+                errors[error] = errors.get(error, 0) + 1
+
+    def histogram(self, samples):
+        over = f">={self.buckets[-1]}ms"
+        counts = dict.fromkeys([*(f"<{x}ms" for x in self.buckets), over], 0)
+        for sample in samples:
+            ms = sample * 1000
+            bucket = next((x for x in self.buckets if ms < x), None)
+            counts[f"<{bucket}ms" if bucket else over] += 1
+        return counts
+
+    def summarize(self, samples, errors):
+        failed = sum(errors.values())
+        return {
+            "n": len(samples),
+            "errors": failed,
+            "error_rate": round(failed / len(samples), 4),
+            "over_deadline": sum(x > self.deadline for x in samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p90_ms": round(percentile(samples, 90) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "max_ms": round(max(samples) * 1000, 3),
+            "histogram": self.histogram(samples),
+            "error_kinds": dict(errors),
+        }
+
+    def to_dict(self):
+        with self.lock:
+            results = {
+                route: self.summarize(samples, self.errors.get(route, {}))
+                for route, samples in sorted(self.latencies.items())
+            }
+            samples = [y for x in self.latencies.values() for y in x]
+            if samples:
+                errors = {}
+                for kinds in self.errors.values():
+                    for kind, count in kinds.items():
+                        errors[kind] = errors.get(kind, 0) + count
+                results["TOTAL"] = self.summarize(samples, errors)
+        return results
+
+
+def report(results, elapsed=None):
+    header = (
+        f"{'ROUTE':<16} {'N':>8} {'ERR %':>7} {'>3S':>6} "
+        f"{'P50 MS':>10} {'P90 MS':>10} {'P99 MS':>10} {'MAX MS':>10}"
+    )
+    lines = [header]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<16} {result['n']:>8} {result['error_rate']:>7.2%} "
+            f"{result['over_deadline']:>6} {result['p50_ms']:>10.3f} "
+            f"{result['p90_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['max_ms']:>10.3f}"
+        )
+    for name, result in results.items():
+        lines.append(f"\n{name}")
+        peak = max(result["histogram"].values()) or 1
+        for bucket, count in result["histogram"].items():
+            bar = "#" * round(40 * count / peak)
+            lines.append(f"  {bucket:>9} {count:>8} {bar}".rstrip())
+        for kind, count in result["error_kinds"].items():
+            lines.append(f"  {'ERROR':>9} {count:>8} {kind}")
+    if elapsed and "TOTAL" in results:
+        lines.append(
+            f"\n{results['TOTAL']['n'] / elapsed:.1f} req/s over {elapsed:.1f}s"
+        )
+    return "\n".join(lines)
+
+
+###############
+#    LOAD     #
+###############
+
+
+class Load:
+    """
+    Send signed requests to ``url`` from ``concurrency`` worker threads.
+
+    Each worker keeps its own keep-alive connection, and signs each body
+    just before sending so replays and long runs stay inside the
+    authorizer's five-minute window.
+    """
+
+    def __init__(self, url, secret, concurrency=CONCURRENCY, timeout=TIMEOUT):
+        self.url = url
+        self.base = urlsplit(url).path.rstrip("/")
+        self.secret = secret
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.client = functions.runtime("client")
+        self.signature = functions.runtime("signature")
+
+    def headers(self, path, body):
+        ts = str(int(time.time()))
+        content_type = (
+            "application/json"
+            if path == "/event"
+            else "application/x-www-form-urlencoded"
+        )
+        return {
+            "content-type": content_type,
+            "x-slack-request-timestamp": ts,
+            "x-slack-signature": self.signature.sign(self.secret, body, ts),
+        }
+
+    def send(self, client, path, body):
+        """
+        Send request and return the error, if any.
+        """
+        headers = self.headers(path, body)
+        deadline = time.monotonic() + self.timeout
+        try:
+            client.post(f"{self.base}{path}", body.encode(), headers, deadline)
+        except self.client.HTTPError as err:
+            return f"HTTP {err.response.status}"
+        except Exception as err:  # noqa: BLE001
+            return type(err).__name__
+        return None
+
+    def run(self, schedule, stats=None, capture=None):
+        """
+        Send each ``(offset, (name, path, body))`` of ``schedule``, at
+        ``offset`` seconds from the start if it has one, and return the
+        ``Stats`` and elapsed seconds.
+        """
+        stats = stats or Stats()
+        pending = queue.Queue(maxsize=self.concurrency * 2)
+        lock = threading.Lock()
+        start = time.monotonic()
+
+        def worker():
+            client = self.client.Client(self.url, retries=0)
+            try:
+                while (item := pending.get()) is not None:
+                    offset, (name, path, body) = item
+                    due = start + offset if offset is not None else time.monotonic()
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    error = self.send(client, path, body)
+                    stats.add(route(path), time.monotonic() - due, error)
+                    if capture:
+                        record = {"time": due - start, "name": name}
+                        with lock:
+                            capture.write(
+                                json.dumps({**record, "path": path, "body": body})
+                                + "\n"
+                            )
+            finally:
+                client.close()
+
+        workers = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in workers:
+            thread.start()
+        for item in schedule:
+            pending.put(item)
+        for _ in workers:
+            pending.put(None)
+        for thread in workers:
+            thread.join()
+        return stats, time.monotonic() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send signed Slack requests")
+    parser.add_argument("url", help="target URL, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, help="fixed request rate (open loop)")
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help="worker threads (closed loop unless --rps or --replay)",
+    )
+    parser.add_argument("-d", "--duration", type=float, help="seconds to run")
+    parser.add_argument("-n", "--requests", type=int, help="requests to send")
+    parser.add_argument("-k", "--filter", help="regex of corpus payloads to send")
+    parser.add_argument("--seed", type=int, help="corpus mix random seed")
+    parser.add_argument("--replay", type=Path, help="captured JSONL traffic")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay speed")
+    parser.add_argument(
+        "--keep-event-ids",
+        action="store_true",
+        help="replay captured event_ids as-is (exercises deduplication)",
+    )
+    parser.add_argument("--capture", type=Path, help="write sent traffic as JSONL")
+    parser.add_argument("--secret", help="signing secret ($SIGNING_SECRET)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args(argv)
+
+    secret = args.secret or os.getenv("SIGNING_SECRET")
+    secret = secret or functions.ENVIRON["SIGNING_SECRET"]
+    secret = functions.runtime("signature").split_secrets(secret)[0]
+    if args.replay:
+        schedule = replay(args.replay, args.speedup, args.keep_event_ids)
+    else:
+        duration = args.duration
+        if duration is None and args.requests is None:
+            duration = DURATION
+        requests = mix(args.filter, args.seed)
+        schedule = paced(requests, args.rps, duration, args.requests)
+
+    load = Load(args.url, secret, args.concurrency, args.timeout)
+    if args.capture:
+        with args.capture.open("w") as capture:
+            stats, elapsed = load.run(schedule, capture=capture)
+    else:
+        stats, elapsed = load.run(schedule)
+
+    results = stats.to_dict()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(report(results, elapsed))
+    total = results.get("TOTAL", {})
+    return 1 if total.get("errors") or total.get("over_deadline") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
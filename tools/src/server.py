@@ -0,0 +1,393 @@
+"""
+Single-process server
+
+Serves the Slack-facing routes from one asyncio process: requests are
+verified and parsed by the authorizer handler, events are published to a
+pluggable sink and responders are called in-process, following the same
+steps as the ``state-machines/*.asl.yml`` pipelines without the API
+Gateway, Step Functions and Lambda hops.
+
+:Example:
+
+$ PYTHONPATH=src python src/server.py --port 8000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from asl import VARIABLES
+from functions import LambdaContext, discover, queues
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_WORKERS = 64
+
+log = logging.getLogger("server")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+
+class Acknowledged(Exception):
+    """
+    Request was already handled (e.g. an Events API retry) and is only acked.
+    """
+
+
+class MemorySink:
+    """
+    In-memory event sink.
+
+    Any object with a ``put(entry)`` method taking a ``PutEvents`` entry can
+    be used instead, e.g. the runtime layer's batched ``slackbot.publisher.Publisher``.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def put(self, entry):
+        self.events.append(entry)
+
+
+def response(status, headers=None, body=None):
+    """
+    Build API Gateway style response.
+    """
+    return {"statusCode": status, "headers": headers or {}, "body": body}
+
+
+def encode(result):
+    """
+    Encode API Gateway style result as HTTP status, headers and body.
+    """
+    result = result if isinstance(result, dict) else {}
+    status = int(result.get("statusCode") or 200)
+    headers = {k.lower(): str(v) for k, v in (result.get("headers") or {}).items()}
+    body = result.get("body")
+    if body is None:
+        body = b""
+    elif isinstance(body, (dict, list)):
+        body = json.dumps(body).encode()
+        headers.setdefault("content-type", "application/json")
+    else:
+        body = str(body).encode()
+        kind = "application/json" if body[:1] in (b"{", b"[") else "text/plain"
+        headers.setdefault("content-type", kind)
+    return status, headers, body
+
+
+class Server:
+    """
+    Slackbot pipeline served over HTTP/1.1 with keep-alive.
+
+    Handlers are keyed by function name as in ``functions.discover()``.
+    Blocking work (the authorizer, the OAuth exchange, responders, the
+    sink) runs on a thread pool so the event loop keeps accepting requests.
+    Messages a responder defers to a lazy function are delivered after its
+    ack, in the background, as asynchronous Lambda invocations would be.
+    """
+
+    def __init__(self, handlers=None, sink=None, variables=None, max_workers=None):
+        self.variables = {**VARIABLES, **(variables or {})}
+        self.name = self.variables["name"]
+        self.handlers = handlers if handlers is not None else discover(self.name)
+        self.sink = sink if sink is not None else MemorySink()
+        self.executor = ThreadPoolExecutor(max_workers or MAX_WORKERS)
+        self.deferred = set()
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/install"): self.install,
+            ("GET", "/oauth"): self.oauth,
+            ("POST", "/callback"): self.interaction,
+            ("POST", "/event"): self.event,
+            ("POST", "/menu"): self.interaction,
+            ("POST", "/slash"): self.interaction,
+        }
+
+    def close(self):
+        self.executor.shutdown()
+
+    ###############
+    #   HELPERS   #
+    ###############
+
+    def function(self, key):
+        return self.handlers.get(f"{self.name}-api-{key}")
+
+    def invoke(self, key, event):
+        """
+        Call function handler in the calling thread.
+        """
+        handler = self.function(key)
+        return handler(event, LambdaContext(f"{self.name}-api-{key}"))
+
+    async def call(self, key, event):
+        """
+        Call function handler on the thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.invoke, key, event)
+
+    async def publish(self, route, detail):
+        entry = {
+            "EventBusName": self.variables["event_bus_name"],
+            "Source": self.variables["domain_name"],
+            "DetailType": route,
+            "Detail": json.dumps(detail),
+        }
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.sink.put, entry)
+
+    async def publish_claimed(self, route, headers, event):
+        """
+        Publish event whose request the authorizer claimed, then commit its
+        idempotency key, or release it if publishing fails so a retry of
+        the request is published.
+        """
+        request = {
+            "signature": headers.get("x-slack-signature"),
+            "ts": headers.get("x-slack-request-timestamp"),
+            "event": event,
+        }
+        try:
+            await self.publish(route, event)
+        except Exception:
+            await self.call("authorizer", {"action": "release_request", **request})
+            raise
+        await self.call("authorizer", {"action": "commit_request", **request})
+
+    async def deliver(self, key):
+        """
+        Invoke function again with each message it deferred, on the thread
+        pool.
+        """
+        for queue in queues(self.function(key)):
+            while queue.messages:
+                try:
+                    message = queue.messages.pop(0)
+                except IndexError:  # taken by a concurrent delivery
+                    break
+                try:
+                    await self.call(key, message)
+                except Exception:
+                    log.exception("DEFERRED %s FAILED", key)
+
+    def defer(self, key):
+        """
+        Deliver messages deferred by function in the background.
+        """
+        task = asyncio.create_task(self.deliver(key))
+        self.deferred.add(task)
+        task.add_done_callback(self.deferred.discard)
+
+    async def authorize(self, headers, body, parse=None, dedupe=False):
+        event = {
+            "signature": headers.get("x-slack-signature"),
+            "ts": headers.get("x-slack-request-timestamp"),
+            "body": body,
+        }
+        if parse:
+            event["parse"] = parse
+        if dedupe:
+            event["dedupe"] = True
+        try:
+            return await self.call("authorizer", event)
+        except Exception as err:
+            if type(err).__name__ == "Forbidden":
+                raise HTTPError(HTTPStatus.FORBIDDEN, str(err))
+            if type(err).__name__ == "Duplicate":
+                raise Acknowledged from err
+            raise
+
+    def redirect(self, location):
+        return response(302, {"location": location})
+
+    ##############
+    #   ROUTES   #
+    ##############
+
+    async def health(self, route, headers, query, body):
+        return response(200)
+
+    async def install(self, route, headers, query, body):
+        result = await self.call("authorizer", {"action": "issue_state"})
+        state = result["state"]
+        v = self.variables
+        return self.redirect(
+            f"https://slack.com/oauth/v2/authorize?client_id={v['slack_client_id']}"
+            f"&scope={v['slack_scope']}&user_scope={v['slack_user_scope']}"
+            f"&state={state}&redirect_uri=https://{v['domain_name']}/oauth"
+        )
+
+    async def oauth(self, route, headers, query, body):
+        error = self.redirect(self.variables["slack_error_uri"])
+        try:
+            event = {"action": "verify_state", "state": query.get("state")}
+            await self.call("authorizer", event)
+        except Exception:  # noqa: BLE001
+            return error
+        event = {
+            "redirect_uri": f"https://{self.variables['domain_name']}/oauth",
+            "code": query.get("code"),
+        }
+        try:
+            result = await self.call("oauth", event)
+        except Exception:
+            log.exception("OAUTH FAILED")
+            return error
+        if result.get("ok") is not True:
+            return error
+        await self.publish(route, result)
+        return self.redirect(self.variables["slack_success_uri"])
+
+    async def event(self, route, headers, query, body):
+        event = await self.authorize(headers, body, "json", dedupe=True)
+        if event.get("type") == "url_verification":
+            return response(200, body={"challenge": event.get("challenge")})
+        await self.publish_claimed(route, headers, event)
+        return response(200)
+
+    async def interaction(self, route, headers, query, body):
+        parse = "slash_command" if route == "POST /slash" else "payload"
+        dedupe = route == "POST /callback"
+        event = await self.authorize(headers, body, parse, dedupe=dedupe)
+        if dedupe:
+            publish = self.publish_claimed(route, headers, event)
+        else:
+            publish = self.publish(route, event)
+        if self.function(event.get("type")) is None:
+            await publish
+            return response(200)
+        _, result = await asyncio.gather(publish, self.call(event["type"], event))
+        self.defer(event["type"])
+        return result
+
+    ##############
+    #   SERVER   #
+    ##############
+
+    async def dispatch(self, method, target, headers, body):
+        """
+        Route request and return HTTP status, headers and body.
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if path.startswith("/slash/"):
+            path = "/slash"
+        try:
+            route = self.routes.get((method, path))
+            if route is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"{method} {path}")
+            query = dict(parse_qsl(url.query))
+            result = await route(f"{method} {path}", headers, query, body.decode())
+        except Acknowledged:
+            result = response(200)
+        except HTTPError as err:
+            result = response(err.status, body=err.message)
+        except Exception:
+            log.exception("%s %s FAILED", method, path)
+            result = response(500, body="Internal Server Error")
+        return encode(result)
+
+    async def handle(self, reader, writer):
+        """
+        Serve requests on one keep-alive connection.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\n")
+                    writer.write(b"content-length: 0\r\nconnection: close\r\n\r\n")
+                    return
+                line, *lines = head.decode("latin-1").split("\r\n")
+                method, target, version = line.split(" ", 2)
+                headers = {}
+                for header in filter(None, lines):
+                    key, _, value = header.partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status, rheaders, body = 413, {}, b""
+                else:
+                    body = await reader.readexactly(length)
+                    status, rheaders, body = await self.dispatch(
+                        method, target, headers, body
+                    )
+                close = (
+                    headers.get("connection", "").lower() == "close"
+                    or version == "HTTP/1.0"
+                    or status == 413
+                )
+                reason = HTTPStatus(status).phrase
+                rheaders["content-length"] = str(len(body))
+                if close:
+                    rheaders["connection"] = "close"
+                head = "".join(f"{k}: {v}\r\n" for k, v in rheaders.items())
+                writer.write(f"HTTP/1.1 {status} {reason}\r\n{head}\r\n".encode())
+                writer.write(body)
+                await writer.drain()
+                if close:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def serve(self, host="127.0.0.1", port=8000, backlog=4096):
+        return await asyncio.start_server(
+            self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=backlog
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Slackbot locally")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address")
+    parser.add_argument("-p", "--port", type=int, default=8000, help="bind port")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="threads")
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="template variable override",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    variables = dict(x.split("=", 1) for x in args.var)
+    server = Server(variables=variables, max_workers=args.workers)
+
+    async def run():
+        httpd = await server.serve(args.host, args.port)
+        log.info("Serving on http://%s:%d", args.host, args.port)
+        async with httpd:
+            await httpd.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+import base64
+import contextlib
+import hmac
+import json
+import os
+import time
+from hashlib import sha256
+from urllib.parse import quote, urlencode
+
+import pytest
+
+import asl
+from aws import Resources, TaskError
+from functions import discover
+
+
+def request(route, body):
+    ts = str(int(time.time()))
+    secret = os.environ["SIGNING_SECRET"].split(",")[0].encode()
+    digest = hmac.new(secret, f"v0:{ts}:{body}".encode(), sha256).hexdigest()
+    return {
+        "routeKey": f"POST /{route}",
+        "signature": f"v0={digest}",
+        "ts": ts,
+        "body": base64.b64encode(body.encode()).decode(),
+    }
+
+
+def interaction(payload):
+    return urlencode({"payload": json.dumps(payload)}, quote_via=quote)
+
+
+def unavailable(*_):
+    raise TaskError("EventBridge.InternalException", "down")
+
+
+def failed_entry(*_):
+    return {"Entries": [{"ErrorCode": "InternalFailure"}], "FailedEntryCount": 1}
+
+
+@contextlib.contextmanager
+def publishing(machine, put_events):
+    """
+    Swap the bus's ``PutEvents`` integration while in context.
+    """
+    integrations = machine.resources.integrations
+    resource = "arn:aws:states:::aws-sdk:eventbridge:putEvents"
+    original = integrations[resource]
+    integrations[resource] = ("events", put_events)
+    try:
+        yield
+    finally:
+        integrations[resource] = original
+
+
+@pytest.fixture(scope="module")
+def handlers():
+    return discover("slackbot")
+
+
+class TestPipelines:
+    def test_slash(self, handlers):
+        machine = asl.build("slash", handlers=handlers)
+        body = urlencode({"command": "/test", "text": "fizz buzz"})
+        execution = machine.execute(request("slash", body))
+        assert execution.status == "SUCCEEDED"
+        assert execution.output["statusCode"] == "200"
+        assert not execution.over_budget()
+        (event,) = machine.resources.bus.events
+        assert event["DetailType"] == "POST /slash"
+        detail = json.loads(event["Detail"])
+        assert detail.pop("_trace")["correlation_id"] == execution.name
+        assert detail == {
+            "command": "/test",
+            "text": "fizz buzz",
+            "type": "slash_command",
+        }
+        assert sorted(x["state"] for x in execution.timings) == [
+            "AuthorizeAndTransform",
+            "PublishEventAndRespond",
+            "PublishEventAndRespond/0/PublishEvent",
+            "PublishEventAndRespond/1/Respond",
+        ]
+
+    def test_callback(self, handlers):
+        machine = asl.build("callback", handlers=handlers)
+        body = interaction({"type": "block_actions", "actions": []})
+        execution = machine.execute(request("callback", body))
+        assert execution.status == "SUCCEEDED"
+        assert execution.output == {"statusCode": 200}
+
+    def test_callback_no_responder(self, handlers):
+        machine = asl.build("callback", handlers=handlers)
+        body = interaction({"type": "view_submission"})
+        execution = machine.execute(request("callback", body))
+        assert execution.status == "SUCCEEDED"
+        assert execution.output == {"statusCode": 200}
+        assert "PublishEventAndRespond/1/Default" in [
+            x["state"] for x in execution.timings
+        ]
+
+    def test_callback_responder_error(self, handlers):
+        machine = asl.build(
+            "callback", handlers={**handlers, "slackbot-api-block_actions": fail}
+        )
+        body = interaction({"type": "block_actions"})
+        execution = machine.execute(request("callback", body))
+        assert execution.status == "SUCCEEDED"
+        assert execution.output == {"errorType": "ValueError", "errorMessage": "fizz"}
+
+    def test_forbidden(self, handlers):
+        machine = asl.build("menu", handlers=handlers)
+        payload = request("menu", interaction({"type": "block_suggestion"}))
+        payload.update(signature="v0=00")
+        execution = machine.execute(payload)
+        assert execution.status == "FAILED"
+        assert execution.error == "Forbidden"
+        assert execution.timings[0]["status"] == "FAILED"
+
+    def test_event_challenge(self, handlers):
+        machine = asl.build("event", handlers=handlers)
+        body = json.dumps({"type": "url_verification", "challenge": "fizz"})
+        execution = machine.execute(request("event", body))
+        assert execution.output == {"statusCode": 200, "body": {"challenge": "fizz"}}
+        assert machine.resources.bus.events == []
+
+    def test_event_callback(self, handlers):
+        machine = asl.build("event", handlers=handlers)
+        body = json.dumps({"type": "event_callback", "event": {"type": "app_mention"}})
+        execution = machine.execute(request("event", body))
+        assert execution.output == {"statusCode": 200}
+        assert len(machine.resources.bus.events) == 1
+
+    def test_event_retry(self, handlers):
+        machine = asl.build("event", handlers=handlers)
+        body = json.dumps({"type": "event_callback", "event_id": "EvRETRY"})
+        assert machine.execute(request("event", body)).output == {"statusCode": 200}
+        execution = machine.execute(request("event", body))
+        assert execution.status == "SUCCEEDED"
+        assert execution.output == {"statusCode": 200}
+        assert len(machine.resources.bus.events) == 1
+
+    @pytest.mark.parametrize(
+        ("event_id", "failure"),
+        [
+            ("EvERROR", unavailable),
+            ("EvFAILED", failed_entry),
+        ],
+    )
+    def test_event_publish_failure_retry(self, handlers, event_id, failure):
+        machine = asl.build("event", handlers=handlers)
+        body = json.dumps({"type": "event_callback", "event_id": event_id})
+        payload = request("event", body)
+        with publishing(machine, failure):
+            execution = machine.execute(payload)
+        assert execution.status == "FAILED"
+        assert execution.error == "PublishFailed"
+        assert "Release" in [x["state"] for x in execution.timings]
+
+        # Slack's retry is published, not acked as a duplicate
+        execution = machine.execute(payload)
+        assert execution.status == "SUCCEEDED"
+        assert execution.output == {"statusCode": 200}
+        assert "Commit" in [x["state"] for x in execution.timings]
+        assert len(machine.resources.bus.events) == 1
+        table = machine.resources.dynamodb.tables["slackbot-idempotency"]
+        (item,) = [x for x in table.values() if x["key"]["S"] == f"event:{event_id}"]
+        assert float(item["expires"]["N"]) > time.time() + 3000
+
+        # ... and once committed, later retries are
+        execution = machine.execute(payload)
+        assert execution.output == {"statusCode": 200}
+        assert len(machine.resources.bus.events) == 1
+
+    def test_callback_publish_failure_retry(self, handlers):
+        machine = asl.build("callback", handlers=handlers)
+        body = interaction({"type": "view_submission", "view": {"id": "FLAKY"}})
+        payload = request("callback", body)
+        with publishing(machine, unavailable):
+            execution = machine.execute(payload)
+        assert execution.status == "FAILED"
+        assert execution.error == "PublishFailed"
+
+        execution = machine.execute(payload)
+        assert execution.status == "SUCCEEDED"
+        assert len(machine.resources.bus.events) == 1
+        assert machine.execute(payload).output == {"statusCode": 200}
+        assert len(machine.resources.bus.events) == 1
+
+    def test_install_oauth(self, handlers):
+        handlers = {**handlers, "slackbot-api-oauth": lambda *_: {"ok": True}}
+        install = asl.build("install", handlers=handlers)
+        execution = install.execute({"routeKey": "GET /install"})
+        location = execution.output["headers"]["location"]
+        state = location.split("state=")[1].split("&")[0]
+        assert execution.output["statusCode"] == 302
+
+        oauth = install.resources.sfn.machines["slackbot-api-oauth"]
+        execution = oauth.execute(
+            {"routeKey": "GET /oauth", "code": "fizz", "state": state}
+        )
+        assert execution.output["headers"]["location"] == "slack://open"
+        assert len(install.resources.bus.events) == 1
+        assert not install.resources.sfn.executions
+
+        execution = oauth.execute(
+            {"routeKey": "GET /oauth", "code": "fizz", "state": state}
+        )
+        assert execution.output["headers"]["location"] == "https://example.com/error"
+
+        execution = oauth.execute(
+            {"routeKey": "GET /oauth", "code": "fizz", "state": "buzz"}
+        )
+        assert execution.output["headers"]["location"] == "https://example.com/error"
+
+    def test_install_oauth_error(self, handlers):
+        handlers = {**handlers, "slackbot-api-oauth": fail}
+        install = asl.build("install", handlers=handlers)
+        execution = install.execute({"routeKey": "GET /install"})
+        location = execution.output["headers"]["location"]
+        state = location.split("state=")[1].split("&")[0]
+        oauth = install.resources.sfn.machines["slackbot-api-oauth"]
+        execution = oauth.execute(
+            {"routeKey": "GET /oauth", "code": "fizz", "state": state}
+        )
+        assert execution.status == "SUCCEEDED"
+        assert execution.output["headers"]["location"] == "https://example.com/error"
+        assert not install.resources.bus.events
+
+    def test_latency(self, handlers):
+        machine = asl.build("slash", handlers=handlers, latency={"events": 0.05})
+        body = urlencode({"command": "/test"})
+        execution = machine.execute(request("slash", body))
+        (timing,) = [
+            x for x in execution.timings if x["state"].endswith("PublishEvent")
+        ]
+        assert timing["duration_ms"] >= 50
+
+
+class TestStateMachine:
+    def machine(self, states, **kwargs):
+        definition = {"QueryLanguage": "JSONata", "StartAt": "Start", "States": states}
+        return asl.StateMachine(definition, Resources(), **kwargs)
+
+    def test_jsonpath(self):
+        with pytest.raises(ValueError):
+            asl.StateMachine({"StartAt": "Start", "States": {}}, Resources())
+
+    def test_render(self):
+        assert asl.render("${a}-${b}", {"a": 1, "b": "2"}) == "1-2"
+        with pytest.raises(KeyError):
+            asl.render("${missing}", {})
+
+    def test_pass_wait(self):
+        slept = []
+        machine = self.machine(
+            {
+                "Start": {
+                    "Type": "Pass",
+                    "Next": "Wait",
+                    "Assign": {"x": "{% $states.input.x + 1 %}"},
+                    "Output": {"y": "{% $x %}", "z": "plain"},
+                },
+                "Wait": {"Type": "Wait", "Seconds": 5, "End": True},
+            },
+            sleep=slept.append,
+        )
+        execution = machine.execute({"x": 1})
+        assert execution.output == {"y": 2, "z": "plain"}
+        assert slept == [5]
+
+    def test_fail(self):
+        machine = self.machine(
+            {"Start": {"Type": "Fail", "Error": "Fizz", "Cause": "Buzz"}}
+        )
+        execution = machine.execute({})
+        assert (execution.status, execution.error, execution.cause) == (
+            "FAILED",
+            "Fizz",
+            "Buzz",
+        )
+
+    def test_no_choice(self):
+        machine = self.machine(
+            {
+                "Start": {
+                    "Type": "Choice",
+                    "Choices": [{"Condition": "{% false %}", "Next": "X"}],
+                }
+            }
+        )
+        assert machine.execute({}).error == "States.NoChoiceMatched"
+
+    def test_unsupported_state(self):
+        machine = self.machine({"Start": {"Type": "Map", "End": True}})
+        assert machine.execute({}).error == "States.Runtime"
+
+    def test_unsupported_resource(self):
+        machine = self.machine(
+            {"Start": {"Type": "Task", "Resource": "arn:fizz", "End": True}}
+        )
+        assert machine.execute({}).error == "States.Runtime"
+
+    def test_parallel_catch(self):
+        machine = self.machine(
+            {
+                "Start": {
+                    "Type": "Parallel",
+                    "Next": "Done",
+                    "Branches": [
+                        {
+                            "StartAt": "Boom",
+                            "States": {"Boom": {"Type": "Fail", "Error": "Boom"}},
+                        }
+                    ],
+                    "Catch": [{"ErrorEquals": ["States.ALL"], "Next": "Done"}],
+                },
+                "Done": {"Type": "Succeed", "Output": "{% $states.input.Error %}"},
+            }
+        )
+        assert machine.execute({}).output == "Boom"
+
+
+class TestResources:
+    def test_sdk_invoke_error(self):
+        resources = Resources({"fizz": fail})
+        result = resources.invoke(
+            "arn:aws:states:::aws-sdk:lambda:invoke",
+            {"FunctionName": "fizz", "Payload": {}},
+        )
+        assert result["FunctionError"] == "Unhandled"
+        assert json.loads(result["Payload"]) == {
+            "errorType": "ValueError",
+            "errorMessage": "fizz",
+        }
+
+    def test_dynamodb(self):
+        resources = Resources()
+        key = {"key": {"S": "fizz"}}
+        update = {
+            "TableName": "fizz",
+            "Key": key,
+            "UpdateExpression": "SET #e = :expires",
+            "ConditionExpression": "attribute_exists(#k)",
+            "ExpressionAttributeNames": {"#k": "key", "#e": "expires"},
+            "ExpressionAttributeValues": {":expires": {"N": "100"}},
+        }
+        with pytest.raises(TaskError) as err:
+            resources.invoke("arn:aws:states:::dynamodb:updateItem", update)
+        assert err.value.error == "DynamoDB.ConditionalCheckFailedException"
+
+        resources.dynamodb.put_item(
+            TableName="fizz", Item={**key, "expires": {"N": "1"}}
+        )
+        resources.invoke("arn:aws:states:::dynamodb:updateItem", update)
+        assert resources.dynamodb.get_item(TableName="fizz", Key=key)["Item"] == {
+            **key,
+            "expires": {"N": "100"},
+        }
+        resources.invoke(
+            "arn:aws:states:::dynamodb:deleteItem", {"TableName": "fizz", "Key": key}
+        )
+        assert resources.dynamodb.get_item(TableName="fizz", Key=key) == {}
+
+    def test_describe_missing(self):
+        resources = Resources()
+        with pytest.raises(TaskError):
+            resources.invoke(
+                "arn:aws:states:::aws-sdk:sfn:describeExecution",
+                {"ExecutionArn": "fizz"},
+            )
+
+
+class TestMain:
+    def test_main(self, tmp_path, capsys):
+        path = tmp_path / "input.json"
+        path.write_text(
+            json.dumps(request("event", json.dumps({"type": "url_verification"})))
+        )
+        assert asl.main(["event", "--input", str(path), "--latency", "events=0"]) == 0
+        assert "SUCCEEDED" in capsys.readouterr().out
+
+    def test_main_json_over_budget(self, tmp_path, capsys):
+        path = tmp_path / "input.json"
+        path.write_text(
+            json.dumps(request("event", json.dumps({"type": "url_verification"})))
+        )
+        assert asl.main(["event", "-i", str(path), "--json", "--budget", "0"]) == 1
+        assert json.loads(capsys.readouterr().out)["status"] == "SUCCEEDED"
+
+
+def fail(*_):
+    raise ValueError("fizz")
@@ -0,0 +1,203 @@
+import contextlib
+import json
+import re
+from unittest import mock
+
+import pytest
+
+import bench
+import functions
+
+
+class TestStats:
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        assert bench.percentile(samples, 50) == 50
+        assert bench.percentile(samples, 99) == 99
+        assert bench.percentile([5], 99) == 5
+
+    def test_summarize(self):
+        assert bench.summarize([1, 2, 3, 4]) == {
+            "n": 4,
+            "mean_us": 2.5,
+            "p50_us": 2,
+            "p99_us": 4,
+        }
+
+    def test_summarize_reference(self):
+        summary = bench.summarize([1, 2, 3, 4], reference=4)
+        assert (summary["p50_ratio"], summary["p99_ratio"]) == (0.5, 1.0)
+
+    def test_measure(self):
+        calls = []
+        samples = bench.measure(lambda: calls.append(1), 10, warmup=2)
+        assert len(samples) == 10
+        assert len(calls) == 12
+
+    def test_reference(self):
+        assert bench.reference(scale=0.01) > 0
+
+
+class TestCompare:
+    def setup_method(self):
+        self.baseline = {"fizz": {"p50_ratio": 10.0, "p99_ratio": 20.0}}
+
+    def test_ok(self):
+        results = {"fizz": {"p50_ratio": 12.0, "p99_ratio": 29.0}, "buzz": {}}
+        assert bench.compare(results, self.baseline) == []
+
+    def test_regression(self):
+        results = {"fizz": {"p50_ratio": 13.0, "p99_ratio": 31.0}}
+        regressions = bench.compare(results, self.baseline)
+        assert regressions == ["fizz p50_ratio 13.000 > 12.500 (baseline 10.000 +25%)"]
+
+    def test_p99(self):
+        results = {"fizz": {"n": 1000, "p50_ratio": 12.0, "p99_ratio": 31.0}}
+        assert bench.compare(results, self.baseline) == []
+        regressions = bench.compare(results, self.baseline, p99=0.5)
+        assert regressions == ["fizz p99_ratio 31.000 > 30.000 (baseline 20.000 +50%)"]
+
+    def test_p99_min_samples(self):
+        results = {"fizz": {"n": 999, "p50_ratio": 12.0, "p99_ratio": 31.0}}
+        assert bench.compare(results, self.baseline, p99=0.5) == []
+
+    def test_hardware(self):
+        # Twice as slow across the board is not a regression
+        results = {
+            "fizz": bench.summarize([20.0], reference=2.0),
+            "buzz": bench.summarize([40.0], reference=2.0),
+        }
+        baseline = {
+            "fizz": bench.summarize([10.0], reference=1.0),
+            "buzz": bench.summarize([10.0], reference=1.0),
+        }
+        regressions = bench.compare(results, baseline)
+        assert regressions == ["buzz p50_ratio 20.000 > 12.500 (baseline 10.000 +25%)"]
+
+    def test_absolute_baseline(self):
+        results = {"fizz": {"p50_ratio": 13.0, "p99_ratio": 31.0}}
+        assert bench.compare(results, {"fizz": {"p50_us": 1.0}}) == []
+
+    def test_report(self):
+        results = {
+            "fizz": {"p50_us": 12.0, "p99_us": 29.0, "p50_ratio": 12.0},
+            "buzz": bench.summarize([1]),
+        }
+        lines = bench.report(results, self.baseline).splitlines()
+        assert lines[1].split()[-1] == "+20%"
+        assert lines[2].split()[-1] == "-"
+
+
+class TestCases:
+    def test_run(self):
+        results = bench.run(r"^(authorizer\.sign\[1024\]|logger\.bind)", scale=0.01)
+        assert sorted(results) == [
+            "authorizer.sign[1024]",
+            "logger.bind[large]",
+            "logger.bind[small]",
+        ]
+
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "oauth.handler",
+            "block_actions.handler[4]",
+            "block_actions.respond[4]",
+            "block_suggestion.slack_oauth_scopes",
+            "block_suggestion.revalidate",
+        ],
+    )
+    def test_http_cases(self, name):
+        results = bench.run(f"^{re.escape(name)}$", scale=0.02)
+        assert results[name]["n"] >= 1
+
+    def test_block_actions_lazy(self):
+        with contextlib.ExitStack() as stack:
+            index, event = bench.block_actions(stack)
+            assert index.handler(event) == {"statusCode": 200}
+            (message,) = index.lazy.queue.messages
+            assert message.pop("_trace")["correlation_id"]
+            assert message == {"_lazy": "respond", "event": event}
+            results = index.handler(message)
+            assert index.lazy.flush() == [results]
+        assert results == [{"action_id": "slack_oauth_scopes", "ok": True}] * 4
+
+    def test_block_suggestion_warm(self):
+        with contextlib.ExitStack() as stack:
+            index = bench.block_suggestion(stack, ttl=3600)
+            index.catalog.refresh = mock.MagicMock()
+            groups = index.slack_oauth_scopes("scope00")
+            index.catalog.refresh.assert_not_called()
+        values = [y["value"] for x in groups for y in x["options"]]
+        assert values[:2] == ["scope001:read", "scope003:read"]
+        assert all(x.startswith("scope00") for x in values[:10])
+        assert not any(x.startswith("scope00") for x in values[10:])
+
+    def test_block_suggestion_revalidate(self):
+        with contextlib.ExitStack() as stack:
+            index = bench.block_suggestion(stack, ttl=0)
+            catalog = index.catalog.index
+            etag = index.catalog.etag
+            index.slack_oauth_scopes("scope1")
+            assert index.catalog.index is catalog
+            assert index.catalog.etag == etag is not None
+
+    def test_importtime(self):
+        assert bench.importtime(functions.FUNCTIONS / "authorizer" / "src") > 0
+
+    @mock.patch("bench.subprocess.run")
+    def test_importtime_missing(self, mock_run):
+        mock_run.return_value.stderr = "import time: 1 | 2 | json\n"
+        with pytest.raises(RuntimeError):
+            bench.importtime(functions.FUNCTIONS / "authorizer" / "src")
+
+    def test_import_budgets(self):
+        assert set(bench.IMPORT_BUDGETS) == {x.parent.name for x in bench.SOURCES}
+
+    @mock.patch("bench.importtime", return_value=1e9)
+    def test_import_over_budget(self, _):
+        src = functions.FUNCTIONS / "authorizer" / "src"
+        assert bench.over_budget(src) == 1e9
+
+    def test_baseline(self):
+        baseline = json.loads(bench.BASELINE.read_text())
+        assert set(baseline) == set(bench.CASES)
+        assert all("p50_ratio" in x and "p99_ratio" in x for x in baseline.values())
+
+
+class TestMain:
+    def test_save_and_compare(self, tmp_path, capsys):
+        path = tmp_path / "baseline.json"
+        argv = ["-k", r"^authorizer\.sign\[1024\]$", "--scale", "0.05", "-b", str(path)]
+        assert bench.main([*argv, "--save"]) == 0
+        assert list(json.loads(path.read_text())) == ["authorizer.sign[1024]"]
+        assert bench.main([*argv, "--p50", "100", "--p99", "100"]) == 0
+
+    def test_regression(self, tmp_path, capsys):
+        path = tmp_path / "baseline.json"
+        path.write_text(
+            json.dumps(
+                {"authorizer.sign[1024]": {"p50_ratio": 0.001, "p99_ratio": 0.001}}
+            )
+        )
+        argv = ["-k", r"^authorizer\.sign\[1024\]$", "--scale", "0.05", "-b", str(path)]
+        assert bench.main(argv) == 1
+        assert "REGRESSION" in capsys.readouterr().err
+
+    def test_p99_flag(self, tmp_path, capsys):
+        path = tmp_path / "baseline.json"
+        path.write_text(
+            json.dumps({"authorizer.sign[1024]": {"p50_ratio": 1e9, "p99_ratio": 1e-9}})
+        )
+        argv = ["-k", r"^authorizer\.sign\[1024\]$", "--scale", "6", "-b", str(path)]
+        assert bench.main(argv) == 0
+        assert bench.main([*argv, "--p99"]) == 1
+        assert "p99_ratio" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(("importtime", "code"), [(1, 0), (1e9, 1)])
+    def test_budgets(self, capsys, importtime, code):
+        with mock.patch("bench.importtime", return_value=importtime):
+            assert bench.main(["--budgets"]) == code
+        out, err = capsys.readouterr()
+        assert len(out.splitlines()) == len(bench.SOURCES)
+        assert err.count("OVER BUDGET") == (len(bench.SOURCES) if code else 0)
@@ -0,0 +1,132 @@
+import base64
+import time
+
+import pytest
+
+import jsonata
+
+STATES = {
+    "states": {
+        "input": {
+            "body": base64.b64encode(b"command=%2Ftest&text=fizz").decode(),
+            "routeKey": "POST /slash",
+        },
+        "result": [True, {"type": "block_actions"}],
+    }
+}
+
+
+class TestEvaluate:
+    @pytest.mark.parametrize(
+        ("expr", "expected"),
+        [
+            ("$states.input.routeKey", "POST /slash"),
+            ("$states.input.missing", None),
+            ("$states.result[1]", {"type": "block_actions"}),
+            ("$states.result[-1].type", "block_actions"),
+            ("$states.result[5]", None),
+            ("[$states.input.routeKey]", ["POST /slash"]),
+            ("[[1, 2], 3]", [[1, 2], 3]),
+            ("{'fizz': 'buzz', 'jazz': $missing}", {"fizz": "buzz"}),
+            ("$states.input.body ~> $base64decode()", "command=%2Ftest&text=fizz"),
+            ("$states.input.body ~> $base64decode", "command=%2Ftest&text=fizz"),
+            ("'a' & 1 & true & $missing & 2.0", "a1true2"),
+            ("$states.result[1].type = 'block_actions'", True),
+            ("$states.result[1].type != 'block_actions'", False),
+            ("$missing = 1", False),
+            ("1 < 2 and (2 >= 3 or 4 > 3)", True),
+            ("(1 + 2) * 3 - 4 / 2 % 3", 7),
+            ("-1 <= 0", True),
+            ("$missing < 1", None),
+            ("true ? 'yes' : 'no'", "yes"),
+            ("false ? 'yes'", None),
+            ("false ? 'yes' : 'no'", "no"),
+            ("2 in [1, 2]", True),
+            ("null", None),
+            ("$split('a:b:c:d:e:f:g:h', ':')[7]", "h"),
+            ("$split('abc', '')", ["a", "b", "c"]),
+            ("$split('a-b-c', '-', 2)", ["a", "b"]),
+            ("$split('a=b=c', /^.*?=/)[1]", "b=c"),
+            ("$join(['a', 'b'], '-')", "a-b"),
+            ("$append([1], 2)", [1, 2]),
+            ("$append($missing, 2)", 2),
+            ("$append(1, $missing)", 1),
+            ("$count([1, 2, 3])", 3),
+            ("$count($missing)", 0),
+            ("$exists($states.input)", True),
+            ("$keys({'a': 1})", "a"),
+            ("$keys(1)", None),
+            ("$lookup({'a': 1}, 'a')", 1),
+            ("$merge([{'a': 1}, {'a': 2, 'b': 3}])", {"a": 2, "b": 3}),
+            ("$map([1, 2], function($v) { $v * 2 })", [2, 4]),
+            ("$map([1, 2], function($v, $i) { $i })", [0, 1]),
+            ("$filter([1, 2, 3], function($v) { $v > 1 })", [2, 3]),
+            ("$string({'a': [1]})", '{"a":[1]}'),
+            ("$string(false)", "false"),
+            ("$number('1.5') + $number('1')", 2.5),
+            ("$string($floor(3.7) + 1)", "4"),
+            ("$substring('fizzbuzz', 4)", "buzz"),
+            ("$substring('fizzbuzz', 0, 4)", "fizz"),
+            ("$contains('fizzbuzz', 'zb')", True),
+            ("$contains('fizzbuzz', /Z+B/i)", True),
+            ("$uppercase('a') & $lowercase('B')", "Ab"),
+            ("$decodeUrlComponent('%2Ftest')", "/test"),
+            ("$encodeUrlComponent('/test')", "%2Ftest"),
+            ("$base64encode('fizz') ~> $base64decode", "fizz"),
+            ("$parse('{\"a\": 1}').a", 1),
+            ("($x := 2; $y := $x + 1; $y)", 3),
+            ('"dou\\"ble"', 'dou"ble'),
+            ("`weird key`", None),
+        ],
+    )
+    def test_evaluate(self, expr, expected):
+        returned = jsonata.evaluate(expr, STATES)
+        assert (None if returned is jsonata.undefined else returned) == expected
+
+    def test_context(self):
+        assert jsonata.evaluate("$.fizz", context={"fizz": "buzz"}) == "buzz"
+
+    def test_uuid(self):
+        assert len(jsonata.evaluate("$uuid()")) == 36
+
+    def test_millis(self):
+        start = time.time_ns() // 1_000_000
+        assert start <= jsonata.evaluate("$millis()") <= time.time_ns() // 1_000_000
+
+    def test_transform(self):
+        expr = """(
+        $objectify := function($v, $i, $a) {{ $split($v, /=/)[0]: $split($v, /^.*?=/)[1] }};
+        $states.input.body
+        ~> $base64decode
+        ~> $split('&')
+        ~> $append('type=slash_command')
+        ~> $map($decodeUrlComponent)
+        ~> $map($objectify)
+        ~> $merge
+        )"""
+        assert jsonata.evaluate(expr, STATES) == {
+            "command": "/test",
+            "text": "fizz",
+            "type": "slash_command",
+        }
+
+    @pytest.mark.parametrize(
+        "expr",
+        [
+            "$x(",
+            "1 +",
+            "{'a' 1}",
+            "(1",
+            "1 1",
+            "/abc",
+            "#",
+            "function(a) { 1 }",
+            "1 := 2",
+            "'a'()",
+            "[1, 2]['a']",
+            "{1: 2}",
+        ],
+    )
+    def test_error(self, expr):
+        with pytest.raises(jsonata.JSONataError):
+            jsonata.evaluate(expr)
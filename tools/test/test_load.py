@@ -0,0 +1,173 @@
+import io
+import itertools
+import json
+import re
+from unittest import mock
+from urllib.parse import parse_qs
+
+import pytest
+
+import load
+from functions import discover
+
+from .test_server import Running
+
+
+@pytest.fixture(scope="module")
+def handlers():
+    return discover("slackbot")
+
+
+@pytest.fixture
+def running(handlers):
+    # Keep the server's spans and metrics out of the CLI's stdout
+    logger = load.functions.runtime("logger").logger
+    with mock.patch.object(logger, "metrics_stream", io.StringIO()):
+        running = Running(handlers)
+        yield running
+        running.close()
+
+
+def secret():
+    return load.functions.ENVIRON["SIGNING_SECRET"]
+
+
+class TestCorpus:
+    @pytest.mark.parametrize("name", list(load.CORPUS))
+    def test_payload(self, name):
+        path, weight, build = load.CORPUS[name]
+        body = build(1)
+        assert weight > 0
+        assert body != build(2)
+        if path == "/event":
+            assert json.loads(body)["type"]
+        else:
+            assert parse_qs(body)
+
+    def test_size(self):
+        _, _, build = load.CORPUS["message.32kb"]
+        assert len(build(1)) > 32 * 1024
+
+    def test_mix(self):
+        names = {name for name, _, _ in itertools.islice(load.mix("^message"), 100)}
+        assert names == {"message", "message.4kb", "message.32kb"}
+
+    def test_mix_no_match(self):
+        with pytest.raises(ValueError):
+            next(load.mix("^fizz$"))
+
+    @pytest.mark.parametrize(
+        ("path", "route"),
+        [
+            ("/slash", "POST /slash"),
+            ("/slash/test", "POST /slash"),
+            ("/menu", "POST /menu"),
+        ],
+    )
+    def test_route(self, path, route):
+        assert load.route(path) == route
+
+
+class TestSchedule:
+    def test_rps(self):
+        schedule = list(load.paced(iter("abcdef"), rps=2, duration=2))
+        assert schedule == [(0, "a"), (0.5, "b"), (1, "c"), (1.5, "d")]
+
+    def test_count(self):
+        assert list(load.paced(iter("abc"), count=2)) == [(None, "a"), (None, "b")]
+
+    def test_replay(self, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        lines = [
+            {"time": 100.0, "path": "/slash", "body": "command=%2Ftest"},
+            {"time": 104.0, "path": "/event", "body": "{}", "name": "message"},
+        ]
+        path.write_text("\n".join(map(json.dumps, lines)) + "\n")
+        assert list(load.replay(path, speedup=4)) == [
+            (0.0, ("POST /slash", "/slash", "command=%2Ftest")),
+            (1.0, ("message", "/event", "{}")),
+        ]
+
+    def test_replay_event_ids(self, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        body = json.dumps({"type": "event_callback", "event_id": "Ev1"})
+        lines = [{"time": 100.0, "path": "/event", "body": body}] * 2
+        path.write_text("\n".join(map(json.dumps, lines)) + "\n")
+
+        def event_ids(**kwargs):
+            requests = load.replay(path, **kwargs)
+            return [json.loads(body)["event_id"] for _, (_, _, body) in requests]
+
+        first, second = event_ids(), event_ids()
+        assert len(set(first + second)) == 4
+        assert event_ids(keep_ids=True) == ["Ev1", "Ev1"]
+
+
+class TestStats:
+    def test_to_dict(self):
+        stats = load.Stats()
+        for latency in (0.001, 0.02, 0.02, 3.5):
+            stats.add("POST /slash", latency)
+        stats.add("POST /menu", 0.2, "HTTP 500")
+        results = stats.to_dict()
+        slash = results["POST /slash"]
+        assert (slash["n"], slash["errors"], slash["over_deadline"]) == (4, 0, 1)
+        assert slash["histogram"]["<5ms"] == 1
+        assert slash["histogram"]["<25ms"] == 2
+        assert slash["histogram"][">=5000ms"] == 0
+        assert slash["histogram"]["<5000ms"] == 1
+        assert results["POST /menu"]["error_rate"] == 1.0
+        assert results["TOTAL"]["n"] == 5
+        assert results["TOTAL"]["error_kinds"] == {"HTTP 500": 1}
+        assert "POST /menu" in load.report(results, elapsed=1.0)
+
+
+class TestLoad:
+    def test_run(self, running):
+        url = f"http://127.0.0.1:{running.port}"
+        schedule = load.paced(load.mix(seed=1), count=100)
+        capture = io.StringIO()
+        stats, _ = load.Load(url, secret(), concurrency=8).run(
+            schedule, capture=capture
+        )
+        results = stats.to_dict()
+        assert results["TOTAL"]["n"] == 100
+        assert results["TOTAL"]["errors"] == 0
+        assert set(results) <= {
+            "POST /callback",
+            "POST /event",
+            "POST /menu",
+            "POST /slash",
+            "TOTAL",
+        }
+        published = len(running.server.sink.events)
+        challenges = capture.getvalue().count('"url_verification"')
+        assert published == 100 - challenges
+
+    def test_forbidden(self, running):
+        url = f"http://127.0.0.1:{running.port}"
+        schedule = load.paced(load.mix("^slash_command$"), count=5)
+        stats, _ = load.Load(url, "wrong").run(schedule)
+        assert stats.to_dict()["TOTAL"]["error_kinds"] == {"HTTP 403": 5}
+
+    def test_main_replay(self, running, tmp_path, capsys):
+        url = f"http://127.0.0.1:{running.port}"
+        capture = tmp_path / "traffic.jsonl"
+        argv = [
+            url,
+            "-n",
+            "20",
+            "--rps",
+            "200",
+            "-k",
+            "^block_",
+            "--capture",
+            str(capture),
+        ]
+        assert load.main(argv) == 0
+        assert "POST /callback" in capsys.readouterr().out
+        argv = [url, "--replay", str(capture), "--speedup", "10", "--json"]
+        assert load.main(argv) == 0
+        results = json.loads(capsys.readouterr().out)
+        assert results["TOTAL"]["n"] == 20
+        assert re.match(r"POST /(callback|menu)", next(iter(results)))
@@ -0,0 +1,120 @@
+import base64
+import json
+from urllib.parse import quote, urlencode
+
+import pytest
+
+import functions
+import jsonata
+
+payload = functions.runtime("payload")
+
+# Output of the Transform branch that ``slackbot.payload`` replaced in the
+# callback and menu state machines
+TRANSFORM_PAYLOAD = """(
+$objectify := function($v, $i, $a) {{ $split($v, /=/)[0]: $split($v, /^.*?=/)[1] }};
+$states.input.body
+~> $base64decode
+~> $split('&')
+~> $map($decodeUrlComponent)
+~> $map($objectify)
+~> $merge
+~> $lookup('payload')
+~> $parse
+)"""
+
+# ... and in the slash state machine
+TRANSFORM_SLASH = """(
+$objectify := function($v, $i, $a) {{ $split($v, /=/)[0]: $split($v, /^.*?=/)[1] }};
+$states.input.body
+~> $base64decode
+~> $split('&')
+~> $append('type=slash_command')
+~> $map($decodeUrlComponent)
+~> $map($objectify)
+~> $merge
+)"""
+
+SLASH = {
+    "token": "gIkuvaNzQIHg97ATvDxqgjtO",
+    "team_id": "T0001",
+    "channel_id": "C2147483705",
+    "user_id": "U2147483697",
+    "command": "/test",
+    "text": "94070",
+    "response_url": "https://hooks.slack.com/commands/1234/5678",
+    "trigger_id": "13345224609.738474920.8088930838d88f008e0",
+}
+
+BLOCK_ACTIONS = {
+    "type": "block_actions",
+    "user": {"id": "U2147483697", "name": "jane"},
+    "response_url": "https://hooks.slack.com/actions/T0001/1234/5678",
+    "actions": [
+        {
+            "action_id": "slack_oauth_scopes",
+            "block_id": "slack_oauth_scopes",
+            "selected_option": {"value": "chat:write"},
+        }
+    ],
+}
+
+BLOCK_SUGGESTION = {
+    "type": "block_suggestion",
+    "action_id": "slack_oauth_scopes",
+    "block_id": "slack_oauth_scopes",
+    "value": "chat",
+}
+
+
+def encode(data):
+    return urlencode(data, quote_via=quote)
+
+
+def transform(expr, body):
+    """
+    Evaluate a Transform expression against a request body.
+    """
+    encoded = base64.b64encode(body.encode()).decode()
+    return jsonata.evaluate(expr, {"states": {"input": {"body": encoded}}})
+
+
+class TestEquivalence:
+    @pytest.mark.parametrize(
+        "data",
+        [
+            SLASH,
+            {**SLASH, "text": "fizz buzz"},
+            {**SLASH, "text": "a=b&c"},
+            {**SLASH, "type": "fizz"},
+        ],
+    )
+    def test_slash_command(self, data):
+        body = encode(data)
+        returned = payload.parse(body, "slash_command")
+        assert returned == transform(TRANSFORM_SLASH, body)
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            BLOCK_ACTIONS,
+            BLOCK_SUGGESTION,
+            {**BLOCK_SUGGESTION, "value": "a=b&c+d é"},
+        ],
+    )
+    def test_payload(self, data):
+        body = encode({"payload": json.dumps(data)})
+        returned = payload.parse(body, "payload")
+        assert returned == transform(TRANSFORM_PAYLOAD, body)
+
+
+class TestDivergence:
+    def test_encoded_plus(self):
+        body = "command=%2Ftest&text=fizz+buzz"
+        assert payload.parse(body, "slash_command")["text"] == "fizz buzz"
+        assert transform(TRANSFORM_SLASH, body)["text"] == "fizz+buzz"
+
+    def test_encoded_key(self):
+        body = "command=%2Ftest&fizz%3Dbuzz=jazz"
+        assert payload.parse(body, "slash_command")["fizz=buzz"] == "jazz"
+        assert transform(TRANSFORM_SLASH, body)["fizz"] == "buzz=jazz"
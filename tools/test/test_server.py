@@ -0,0 +1,279 @@
+import asyncio
+import hmac
+import http.client
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from unittest import mock
+from urllib.parse import quote, urlencode
+
+import pytest
+
+import server as srv
+from functions import discover, queues
+
+RESPONSE_URL = "https://hooks.slack.com/commands/T1/1/fizz"
+
+
+def sign(body):
+    ts = str(int(time.time()))
+    secret = os.environ["SIGNING_SECRET"].split(",")[0].encode()
+    digest = hmac.new(secret, f"v0:{ts}:{body}".encode(), sha256).hexdigest()
+    return {"x-slack-signature": f"v0={digest}", "x-slack-request-timestamp": ts}
+
+
+def interaction(payload):
+    return urlencode({"payload": json.dumps(payload)}, quote_via=quote)
+
+
+def fail(*_):
+    raise ValueError("fizz")
+
+
+class FlakySink:
+    def put(self, entry):
+        raise ConnectionError("down")
+
+
+@pytest.fixture(scope="module")
+def handlers():
+    return discover("slackbot")
+
+
+@pytest.fixture
+def replies(handlers):
+    """
+    Replies the slash command responder posts to response URLs.
+    """
+    replies = queue.Queue()
+    handler = handlers["slackbot-api-slash_command"]
+    slack = inspect.unwrap(handler).__globals__["slack"]
+
+    def respond(url, message, deadline=None):
+        replies.put((url, json.loads(message)))
+
+    with mock.patch.object(slack, "respond", respond):
+        yield replies
+
+
+class Running:
+    """
+    Server running on its own event loop in a background thread.
+    """
+
+    def __init__(self, handlers):
+        self.server = srv.Server(handlers)
+        self.loop = asyncio.new_event_loop()
+        self.httpd = self.loop.run_until_complete(self.server.serve(port=0))
+        self.port = self.httpd.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body=None, headers=None, conn=None):
+        conn = conn or http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request(method, path, body, headers or {})
+        res = conn.getresponse()
+        return res.status, dict(res.getheaders()), res.read()
+
+    def post(self, path, body, **kwargs):
+        return self.request("POST", path, body, sign(body), **kwargs)
+
+    async def shutdown(self):
+        self.httpd.close()
+        self.httpd.close_clients()
+        await self.httpd.wait_closed()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.server.close()
+
+
+@pytest.fixture
+def running(handlers):
+    running = Running(handlers)
+    yield running
+    running.close()
+
+
+class TestEncode:
+    def test_json(self):
+        status, headers, body = srv.encode({"statusCode": "200", "body": {"a": 1}})
+        assert (status, headers, body) == (
+            200,
+            {"content-type": "application/json"},
+            b'{"a": 1}',
+        )
+
+    def test_text(self):
+        status, headers, body = srv.encode({"statusCode": 404, "body": "nope"})
+        assert (status, headers["content-type"], body) == (404, "text/plain", b"nope")
+
+    def test_empty(self):
+        assert srv.encode(None) == (200, {}, b"")
+
+
+class TestServer:
+    def test_slash(self, running, replies):
+        body = urlencode(
+            {
+                "command": "/test",
+                "response_url": RESPONSE_URL,
+                "text": "fizz buzz",
+                "trigger_id": "1.2",
+            }
+        )
+        status, headers, data = running.post("/slash/test", body)
+        assert status == 200
+        assert headers["content-type"] == "application/json"
+        assert json.loads(data) == {"text": "Loading…"}
+        url, message = replies.get(timeout=5)
+        assert url == RESPONSE_URL
+        assert message["replace_original"] is True
+        assert message["blocks"][1]["block_id"] == "slack_oauth_scopes"
+        handler = running.server.function("slash_command")
+        assert all(x.messages == [] for x in queues(handler))
+        (entry,) = running.server.sink.events
+        assert entry["DetailType"] == "POST /slash"
+        detail = json.loads(entry["Detail"])
+        assert detail.pop("_trace")["correlation_id"] == "1.2"
+        assert detail == {
+            "command": "/test",
+            "response_url": RESPONSE_URL,
+            "text": "fizz buzz",
+            "trigger_id": "1.2",
+            "type": "slash_command",
+        }
+
+    def test_callback_no_responder(self, running):
+        body = interaction({"type": "view_submission"})
+        assert running.post("/callback", body) == (
+            200,
+            {"content-length": "0"},
+            b"",
+        )
+        assert len(running.server.sink.events) == 1
+
+    def test_responder_error(self, handlers):
+        running = Running({**handlers, "slackbot-api-block_actions": fail})
+        try:
+            body = interaction({"type": "block_actions"})
+            status, _, _ = running.post("/callback", body)
+            assert status == 500
+        finally:
+            running.close()
+
+    def test_forbidden(self, running):
+        body = interaction({"type": "block_suggestion"})
+        headers = {**sign(body), "x-slack-signature": "v0=00"}
+        status, _, _ = running.request("POST", "/menu", body, headers)
+        assert status == 403
+        assert running.server.sink.events == []
+
+    def test_event_challenge(self, running):
+        body = json.dumps({"type": "url_verification", "challenge": "fizz"})
+        status, _, data = running.post("/event", body)
+        assert (status, json.loads(data)) == (200, {"challenge": "fizz"})
+        assert running.server.sink.events == []
+
+    def test_event_callback(self, running):
+        body = json.dumps({"type": "event_callback", "event": {"type": "app_mention"}})
+        status, _, _ = running.post("/event", body)
+        assert status == 200
+        assert running.server.sink.events[0]["DetailType"] == "POST /event"
+
+    def test_event_retry(self, running):
+        body = json.dumps({"type": "event_callback", "event_id": "EvRETRY"})
+        assert running.post("/event", body)[0] == 200
+        assert running.post("/event", body)[0] == 200
+        assert len(running.server.sink.events) == 1
+
+    def test_event_publish_failure_retry(self, running):
+        sink = running.server.sink
+        running.server.sink = FlakySink()
+        body = json.dumps({"type": "event_callback", "event_id": "EvFLAKY"})
+        assert running.post("/event", body)[0] == 500
+        running.server.sink = sink
+        assert running.post("/event", body)[0] == 200
+        assert running.post("/event", body)[0] == 200
+        assert len(sink.events) == 1
+
+    def test_install_oauth(self, handlers):
+        running = Running({**handlers, "slackbot-api-oauth": lambda *_: {"ok": True}})
+        try:
+            status, headers, _ = running.request("GET", "/install")
+            assert status == 302
+            state = headers["location"].split("state=")[1].split("&")[0]
+
+            status, headers, _ = running.request("GET", f"/oauth?code=a&state={state}")
+            assert (status, headers["location"]) == (302, "slack://open")
+            assert running.server.sink.events[0]["DetailType"] == "GET /oauth"
+
+            status, headers, _ = running.request("GET", f"/oauth?code=a&state={state}")
+            assert headers["location"] == "https://example.com/error"
+        finally:
+            running.close()
+
+    def test_oauth_error(self, handlers):
+        running = Running({**handlers, "slackbot-api-oauth": fail})
+        try:
+            _, headers, _ = running.request("GET", "/install")
+            state = headers["location"].split("state=")[1].split("&")[0]
+            _, headers, _ = running.request("GET", f"/oauth?code=a&state={state}")
+            assert headers["location"] == "https://example.com/error"
+            assert running.server.sink.events == []
+        finally:
+            running.close()
+
+    def test_not_found(self, running):
+        assert running.request("GET", "/fizz")[0] == 404
+        assert running.request("GET", "/health")[0] == 200
+
+    def test_keep_alive(self, running):
+        conn = http.client.HTTPConnection("127.0.0.1", running.port, timeout=5)
+        for _ in range(3):
+            assert running.request("GET", "/health", conn=conn)[0] == 200
+        conn.close()
+
+    def test_concurrency(self, running, replies):
+        body = urlencode({"command": "/test", "response_url": RESPONSE_URL})
+
+        def post(_):
+            return running.post("/slash", body)[0]
+
+        with ThreadPoolExecutor(32) as executor:
+            statuses = list(executor.map(post, range(200)))
+        assert statuses == [200] * 200
+        assert len(running.server.sink.events) == 200
+        for _ in range(200):
+            replies.get(timeout=5)
+        assert replies.empty()
+
+    def test_authorize_concurrency(self, handlers):
+        authorizer = handlers["slackbot-api-authorizer"]
+
+        def slow(event, context=None):
+            time.sleep(0.5)
+            return authorizer(event, context)
+
+        running = Running({**handlers, "slackbot-api-authorizer": slow})
+        try:
+            body = json.dumps({"type": "url_verification", "challenge": "fizz"})
+
+            def post(_):
+                return running.post("/event", body)[0]
+
+            start = time.monotonic()
+            with ThreadPoolExecutor(2) as executor:
+                statuses = list(executor.map(post, range(2)))
+            assert statuses == [200, 200]
+            assert time.monotonic() - start < 0.9
+        finally:
+            running.close()
@@ -94,7 +94,7 @@ variable "lambda_snap_start_enabled" {
 #############
 
 variable "slack_signing_secret" {
-  description = "Slackbot signing secret SSM parameter name"
+  description = "Slackbot signing secret SSM parameter name (comma-separated to rotate secrets)"
   type        = string
   sensitive   = true
 }